@@ -1,8 +1,11 @@
 from fastapi import APIRouter
 
-from app.api.routes import health, message
+from app.api.routes import category, expense, health, message, metrics
 from app.core.config import settings
 
 api_router = APIRouter()
 api_router.include_router(health.router, prefix="", tags=["health"])
-api_router.include_router(message.router, prefix="/messages", tags=["messages"]) 
\ No newline at end of file
+api_router.include_router(message.router, prefix="/messages", tags=["messages"]) 
+api_router.include_router(category.router, prefix="/categories", tags=["categories"])
+api_router.include_router(expense.router, prefix="/expenses", tags=["expenses"])
+api_router.include_router(metrics.router, prefix="", tags=["metrics"])
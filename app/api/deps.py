@@ -0,0 +1,56 @@
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, Request
+
+from app.services.ai_service import AIService
+from app.services.analysis_job_worker import AnalysisJobWorker
+from app.services.category_cache import CategoryCache
+from app.services.expense_read_cache import ExpenseReadCache
+from app.services.registry import ServiceRegistry
+from app.services.user_resolver import UserResolver
+
+
+def get_services(request: Request) -> ServiceRegistry:
+    """Return the process-wide service registry built in the application lifespan."""
+    return request.app.state.services
+
+
+def get_ai_service(services: ServiceRegistry = Depends(get_services)) -> AIService:
+    """Return the shared AI service."""
+    return services.ai_service
+
+
+def get_category_cache(services: ServiceRegistry = Depends(get_services)) -> CategoryCache:
+    """Return the shared category catalog cache."""
+    return services.category_cache
+
+
+def get_expense_read_cache(services: ServiceRegistry = Depends(get_services)) -> ExpenseReadCache:
+    """Return the shared cache of serialized expense query results."""
+    return services.expense_read_cache
+
+
+def get_job_worker(services: ServiceRegistry = Depends(get_services)) -> Optional[AnalysisJobWorker]:
+    """Return the background analysis worker pool, or None if async analysis is disabled."""
+    return services.job_worker
+
+
+def get_user_resolver(services: ServiceRegistry = Depends(get_services)) -> UserResolver:
+    """Return the shared telegram_id -> user ID cache."""
+    return services.user_resolver
+
+
+async def get_user_id(
+    user_id: Optional[int] = Query(None, description="The user whose expenses to use"),
+    telegram_id: Optional[str] = Query(None, max_length=64, description="The user's Telegram ID, instead of user_id"),
+    resolver: UserResolver = Depends(get_user_resolver),
+) -> int:
+    """Resolve the user_id or telegram_id query parameter of read endpoints (unknown accounts are 404)."""
+    if (user_id is None) == (telegram_id is None):
+        raise HTTPException(status_code=422, detail="Exactly one of user_id and telegram_id is required")
+    if user_id is not None:
+        return user_id
+    resolved = await resolver.lookup(telegram_id)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Unknown telegram_id")
+    return resolved
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_category_cache
+from app.schemas.category import CategoryCatalog
+from app.services.category_cache import CategoryCache, CategorySnapshot
+
+router = APIRouter()
+
+
+def _to_catalog(snapshot: CategorySnapshot) -> CategoryCatalog:
+    return CategoryCatalog(categories=sorted(snapshot.names), version=snapshot.version)
+
+
+@router.get("/", response_model=CategoryCatalog)
+async def list_categories(category_cache: CategoryCache = Depends(get_category_cache)):
+    """
+    Return the category catalog currently used for message analysis.
+    """
+    return _to_catalog(await category_cache.get())
+
+
+@router.post("/reload", response_model=CategoryCatalog)
+async def reload_categories(category_cache: CategoryCache = Depends(get_category_cache)):
+    """
+    Reload the category catalog from the database without restarting the service.
+    """
+    return _to_catalog(await category_cache.reload())
@@ -0,0 +1,181 @@
+from datetime import date
+from typing import AsyncIterator, Awaitable, Callable, Hashable, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.api.deps import get_ai_service, get_expense_read_cache, get_user_id
+from app.core.config import settings
+from app.schemas.expense import Expense, ExpensePage, ExpenseSummary
+from app.schemas.expense_filter import ExpenseFilter
+from app.schemas.expense_import import ExpenseImportReport
+from app.services.ai_service import AIService
+from app.services.expense_import import ExpenseImport, ExpenseImporter, ExpenseSign
+from app.services.expense_read_cache import ExpenseReadCache, etag_matches
+from app.services.expense_rollup_service import AsyncExpenseRollupService, SummaryGrouping
+from app.services.expense_service import AsyncExpenseService
+
+router = APIRouter()
+
+
+async def _ndjson_lines(user_id: int, filters: ExpenseFilter) -> AsyncIterator[str]:
+    async for expense in AsyncExpenseService.stream_expenses(user_id, filters):
+        yield Expense.model_validate(expense).model_dump_json() + "\n"
+
+
+class _ImportProgressResponse(StreamingResponse):
+    """
+    StreamingResponse that doesn't watch the request for a disconnect: that would
+    consume the upload the import is still reading. A client that goes away makes
+    the upload fail instead, which ends the import and the stream.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+async def _progress_lines(job: ExpenseImport) -> AsyncIterator[str]:
+    async for report in job.progress():
+        yield ExpenseImportReport(**report).model_dump_json() + "\n"
+
+
+async def _read_version(
+    request: Request, cache: ExpenseReadCache, user_id: int, query: Hashable
+) -> tuple[Optional[int], dict, bool]:
+    """
+    The user's data version, the validator headers for a query's result, and whether
+    the client's If-None-Match already names it. The version is read before the query
+    runs, so a result is never tagged with a version newer than the data it reflects.
+    """
+    version = await cache.version(user_id)
+    if version is None:
+        return None, {}, False
+    headers = {"ETag": cache.etag(user_id, version, query), "Cache-Control": "private, no-cache"}
+    return version, headers, etag_matches(request.headers.get("if-none-match"), headers["ETag"])
+
+
+async def _cached_json(
+    request: Request,
+    cache: ExpenseReadCache,
+    user_id: int,
+    query: Hashable,
+    load: Callable[[], Awaitable[BaseModel]],
+) -> Response:
+    """Answer a read with 304, the cached body, or the freshly loaded and serialized result."""
+    version, headers, not_modified = await _read_version(request, cache, user_id, query)
+    if not_modified:
+        cache.not_modified()
+        return Response(status_code=304, headers=headers)
+    
+    async def serialize() -> bytes:
+        return (await load()).model_dump_json().encode()
+    
+    body = await serialize() if version is None else await cache.get_or_load(user_id, version, query, serialize)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get("", response_model=ExpensePage)
+async def list_expenses(
+    request: Request,
+    user_id: int = Depends(get_user_id),
+    filters: ExpenseFilter = Depends(),
+    limit: int = Query(settings.EXPENSES_PAGE_SIZE, ge=1, le=settings.EXPENSES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    read_cache: ExpenseReadCache = Depends(get_expense_read_cache),
+):
+    """
+    List a user's expenses, newest first.
+    
+    - **user_id** or **telegram_id**: The user whose expenses to list
+    - **start_date**, **end_date**, **category**, **min_amount**, **max_amount**: Optional filters
+    - **limit**, **cursor**: Page size and the `next_cursor` of the previous page
+    - **format**: `json` for one page, or `ndjson` to stream every matching expense (one per line)
+    
+    Responses carry an ETag that changes whenever the user's expenses do; send it back
+    in `If-None-Match` to get `304 Not Modified` instead of the same data again.
+    """
+    if format == "ndjson":
+        _, headers, not_modified = await _read_version(
+            request, read_cache, user_id, ("ndjson", filters.model_dump_json())
+        )
+        if not_modified:
+            read_cache.not_modified()
+            return Response(status_code=304, headers=headers)
+        return StreamingResponse(_ndjson_lines(user_id, filters), media_type="application/x-ndjson", headers=headers)
+    
+    async def page() -> ExpensePage:
+        try:
+            expenses, next_cursor = await AsyncExpenseService.get_expenses_page(user_id, filters, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return ExpensePage(items=expenses, next_cursor=next_cursor)
+    
+    return await _cached_json(request, read_cache, user_id, ("page", filters.model_dump_json(), limit, cursor), page)
+
+
+
+@router.get("/summary", response_model=ExpenseSummary)
+async def summarize_expenses(
+    request: Request,
+    user_id: int = Depends(get_user_id),
+    group_by: SummaryGrouping = "month",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None,
+    read_cache: ExpenseReadCache = Depends(get_expense_read_cache),
+):
+    """
+    Total a user's spending from the daily rollups, so the cost does not grow with history.
+    
+    - **user_id** or **telegram_id**: The user whose spending to total
+    - **group_by**: `day`, `week`, `month` or `category`
+    - **start_date**, **end_date**: Optional inclusive date range (UTC days)
+    - **category**: Only include this category
+    
+    Supports `If-None-Match` like the listing.
+    """
+    async def summary() -> ExpenseSummary:
+        buckets = await AsyncExpenseRollupService.summarize(user_id, group_by, start_date, end_date, category)
+        return ExpenseSummary(
+            group_by=group_by,
+            buckets=buckets,
+            total=sum(bucket['total'] for bucket in buckets),
+            count=sum(bucket['count'] for bucket in buckets),
+        )
+    
+    query = ("summary", group_by, start_date, end_date, category)
+    return await _cached_json(request, read_cache, user_id, query, summary)
+
+
+@router.post("/import", response_model=ExpenseImportReport)
+async def import_expenses(
+    request: Request,
+    user_id: int = Depends(get_user_id),
+    date_format: Optional[str] = None,
+    expense_sign: Optional[ExpenseSign] = None,
+    format: Literal["json", "ndjson"] = "json",
+    ai_service: AIService = Depends(get_ai_service),
+):
+    """
+    Import a bank statement sent as the raw CSV request body (`Content-Type: text/csv`).
+    
+    The header must name a description (or memo, details, payee...) and an amount column;
+    optional category and date columns are used when present.
+    
+    - **user_id** or **telegram_id**: The user the expenses belong to
+    - **date_format**: `strptime` format of the date column (default: ISO 8601)
+    - **expense_sign**: `negative` or `positive`, the sign of expenses in the file; rows with the
+      other sign (income, refunds) are skipped. Default: `positive` for a debit column, else `negative`
+    - **format**: `json` for the final report, or `ndjson` to stream a progress report after every batch,
+      starting while the file is still being uploaded
+    """
+    try:
+        job = await ExpenseImporter(ai_service).start(user_id, request.stream(), date_format, expense_sign)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if format == "ndjson":
+        return _ImportProgressResponse(_progress_lines(job), media_type="application/x-ndjson")
+    return await job.wait()
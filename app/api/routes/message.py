@@ -1,41 +1,156 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import Optional 
+import math
+from typing import Optional
 
-from app.schemas.message import MessageRequest, MessageResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.api.deps import get_ai_service, get_job_worker, get_user_resolver
+from app.core.config import settings
+from app.schemas.analysis_job import AnalysisJobAccepted, AnalysisJobStatus
+from app.schemas.message import (
+    AnalysisStats,
+    BatchMessageRequest,
+    BatchMessageResponse,
+    MessageRequest,
+    MessageResponse,
+    UserReference,
+)
 from app.services.ai_service import AIService
+from app.services.analysis_job_service import AsyncAnalysisJobService
+from app.services.analysis_job_worker import AnalysisJobWorker
+from app.services.user_resolver import UserResolver
 
 router = APIRouter()
 
-# Dependency to get the AI service
-def get_ai_service():
-    return AIService()
+
+async def _resolve_user_id(request: UserReference, resolver: UserResolver) -> int:
+    """The request's user_id, or the ID of its telegram_id (registered on first sight)."""
+    if request.user_id is not None:
+        return request.user_id
+    try:
+        return await resolver.resolve(request.telegram_id)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="Could not resolve telegram_id")
 
 
-# Request model
-class MessageRequest(BaseModel):
-    message: str
-    user_id: int
-@router.post("/analyze", response_model=MessageResponse)
+@router.post(
+    "/analyze",
+    response_model=MessageResponse,
+    responses={202: {"model": AnalysisJobAccepted, "description": "Queued for background analysis"}},
+)
 async def analyze_message(
     request: MessageRequest,
-    ai_service: AIService = Depends(get_ai_service)
+    ai_service: AIService = Depends(get_ai_service),
+    job_worker: Optional[AnalysisJobWorker] = Depends(get_job_worker),
+    user_resolver: UserResolver = Depends(get_user_resolver),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    run_async: bool = Query(False, alias="async", description="Queue the message and return 202 with a job ID"),
 ):
     """
     Analyze a message using OpenAI and extract structured expense data.
     
     - **message**: The message to be analyzed
+    - **user_id** or **telegram_id**: Who the expense belongs to
+    - **Idempotency-Key** (header): Optional key; retries with the same key return the original result
+    - **async**: Return 202 with a job ID right away; poll GET /messages/jobs/{job_id} for the result
     
     Returns structured data: amount, category, description.
     """
     if not request.message or request.message.strip() == "":
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     
+    user_id = await _resolve_user_id(request, user_resolver)
+    if run_async:
+        return await _enqueue_analysis(request.message, user_id, job_worker, idempotency_key)
+    
     # Get structured response
-    response = await ai_service.process_message(request.message, request.user_id)
+    response = await ai_service.process_message(request.message, user_id, idempotency_key)
     
+    if response.get("idempotency_conflict"):
+        raise HTTPException(status_code=422, detail=response["error"])
+    if "retry_after" in response:
+        # The LLM queue is full or the provider keeps throttling us: tell the client when to come back
+        raise HTTPException(
+            status_code=503,
+            detail=response["error"],
+            headers={"Retry-After": str(math.ceil(response["retry_after"]))}
+        )
     if "error" in response:
         raise HTTPException(status_code=500, detail=response["error"])
     
     return MessageResponse(**response)
+
+
+async def _enqueue_analysis(
+    message: str, user_id: int, job_worker: Optional[AnalysisJobWorker], idempotency_key: Optional[str]
+) -> JSONResponse:
+    """Store the message in the job queue and answer 202 with where to find the result."""
+    if job_worker is None:
+        raise HTTPException(status_code=400, detail="Async analysis is not enabled")
+    
+    job = await AsyncAnalysisJobService.enqueue(user_id, message, idempotency_key)
+    if job is None:
+        raise HTTPException(status_code=500, detail="Failed to queue message")
+    if job.message != message:
+        raise HTTPException(status_code=422, detail="Idempotency key was already used for a different request")
+    job_worker.notify()
+    
+    status_url = f"{settings.API_V1_STR}/messages/jobs/{job.id}"
+    accepted = AnalysisJobAccepted(job_id=job.id, status=job.status, status_url=status_url)
+    return JSONResponse(status_code=202, content=accepted.model_dump(), headers={"Location": status_url})
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobStatus)
+async def get_analysis_job(job_id: str):
+    """
+    Report the status of a message queued with POST /messages/analyze?async=true,
+    and its result once the job has succeeded.
+    """
+    job = await AsyncAnalysisJobService.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return AnalysisJobStatus(
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        result=job.result,
+        error=job.error,
+    )
+
+
+@router.post("/analyze/batch", response_model=BatchMessageResponse)
+async def analyze_message_batch(
+    request: BatchMessageRequest,
+    ai_service: AIService = Depends(get_ai_service),
+    user_resolver: UserResolver = Depends(get_user_resolver),
+):
+    """
+    Analyze many messages at once, e.g. when replaying a chat backlog.
+    
+    - **messages**: The messages to be analyzed
+    
+    Messages are sent to OpenAI in chunks and all valid expenses are saved together.
+    Returns one result per message with either the saved expense or an error.
+    """
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="Messages cannot be empty")
+    if len(request.messages) > settings.BATCH_ANALYZE_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_ANALYZE_MAX_MESSAGES} messages can be analyzed per batch"
+        )
+    
+    results = await ai_service.process_batch(request.messages, await _resolve_user_id(request, user_resolver))
+    return BatchMessageResponse(results=results)
+
+
+@router.get("/stats", response_model=AnalysisStats)
+async def analysis_stats(ai_service: AIService = Depends(get_ai_service)):
+    """
+    Report how many messages were answered by the rule-based parser and the LLM result cache.
+    """
+    return ai_service.stats()
@@ -0,0 +1,31 @@
+import argparse
+import sys
+
+from app.core.database import create_schema, missing_tables
+
+
+def main() -> None:
+    """
+    Create missing tables, columns and indexes.
+
+    Usage:
+        python -m app.commands.migrate [--check]
+    """
+    parser = argparse.ArgumentParser(description="Create missing tables, columns and indexes.")
+    parser.add_argument("--check", action="store_true", help="Only report missing tables; exit 1 if any")
+    args = parser.parse_args()
+
+    if args.check:
+        missing = missing_tables()
+        if missing:
+            print(f"Missing tables: {', '.join(missing)}")
+            sys.exit(1)
+        print("Schema is up to date")
+        return
+
+    created = create_schema()
+    print(f"Created: {', '.join(created)}" if created else "Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+
+from app.services.expense_amount_migration import ExpenseAmountMigration
+
+
+def main() -> None:
+    """
+    Convert expenses.amount from MONEY to NUMERIC(14, 2) while the service keeps running.
+
+    Usage:
+        python -m app.commands.migrate_amounts [--batch-size N] [--pause-ms MS]
+        python -m app.commands.migrate_amounts --swap
+    """
+    parser = argparse.ArgumentParser(description="Convert expenses.amount from MONEY to NUMERIC in batches.")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Ids per UPDATE")
+    parser.add_argument("--pause-ms", type=float, default=0.0, help="Pause between batches")
+    parser.add_argument("--swap", action="store_true",
+                        help="Finish by replacing the column (run when deploying the code that expects numeric)")
+    args = parser.parse_args()
+
+    amount_type = ExpenseAmountMigration.amount_type()
+    if amount_type is None or amount_type.startswith("numeric"):
+        print(f"expenses.amount is already {amount_type or 'missing'}; nothing to do")
+        return
+
+    ExpenseAmountMigration.prepare()
+    updated = ExpenseAmountMigration.backfill(
+        args.batch_size,
+        args.pause_ms / 1000,
+        progress=lambda rows, last_id: print(f"  {rows} rows converted (through id {last_id})", flush=True),
+    )
+    ExpenseAmountMigration.validate()
+    print(f"Backfilled {updated} rows; new rows are converted by a trigger")
+
+    if not args.swap:
+        print("Run again with --swap when deploying the code that reads numeric amounts")
+        return
+    ExpenseAmountMigration.swap()
+    print("expenses.amount is now numeric(14,2)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import sys
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.services.expense_partition_service import ExpensePartitionService, month_start, partitions_to_archive
+
+
+def main() -> None:
+    """
+    Manage monthly partitions of the expenses table.
+
+    Usage:
+        python -m app.commands.partition_expenses convert [--months-ahead N]
+        python -m app.commands.partition_expenses ensure [--months-ahead N]
+        python -m app.commands.partition_expenses list
+        python -m app.commands.partition_expenses archive --keep-months N
+                                                  [--schema archive | --drop] [--tablespace NAME] [--dry-run]
+    """
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the expenses table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("convert", "Turn expenses into a partitioned table (the current table becomes its oldest partition)"),
+        ("ensure", "Create the partitions for this month and the coming ones"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--months-ahead", type=int, default=settings.EXPENSE_PARTITION_MONTHS_AHEAD)
+    commands.add_parser("list", help="Show the partitions and their ranges")
+    archive = commands.add_parser("archive", help="Detach partitions older than the retention period")
+    archive.add_argument("--keep-months", type=int, required=True,
+                         help="Keep this many months before the current one attached")
+    archive.add_argument("--schema", default="archive", help="Schema detached partitions are moved to")
+    archive.add_argument("--tablespace", help="Also move detached partitions to this (e.g. cheaper) tablespace")
+    archive.add_argument("--drop", action="store_true", help="Drop detached partitions instead of keeping them")
+    archive.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "convert":
+            cutover = ExpensePartitionService.convert(args.months_ahead)
+            print(f"expenses is now partitioned; rows before {cutover:%Y-%m-%d} stay in expenses_legacy")
+        elif args.command == "ensure":
+            created = ExpensePartitionService.ensure_partitions(args.months_ahead)
+            print(f"Created: {', '.join(created)}" if created else "All partitions exist")
+        elif args.command == "list":
+            for partition in ExpensePartitionService.list_partitions():
+                start = f"{partition.start:%Y-%m-%d}" if partition.start else "-"
+                end = f"{partition.end:%Y-%m-%d}" if partition.end else "-"
+                print(f"{partition.name:<24} {start:>10} .. {end}")
+        else:
+            before = month_start(datetime.now(timezone.utc).date(), -args.keep_months)
+            if args.dry_run:
+                old = partitions_to_archive(ExpensePartitionService.list_partitions(), before)
+                print(f"Would detach: {', '.join(partition.name for partition in old)}" if old else "Nothing to archive")
+                return
+            detached = ExpensePartitionService.archive(
+                before, schema=None if args.drop else args.schema, tablespace=args.tablespace, drop=args.drop
+            )
+            action = "Dropped" if args.drop else f"Moved to {args.schema}"
+            print(f"{action}: {', '.join(detached)}" if detached else f"No partition ends before {before:%Y-%m-%d}")
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import argparse
+
+from app.services.expense_rollup_service import ExpenseRollupService
+
+
+def main() -> None:
+    """
+    Backfill the daily spending rollups from the expenses table.
+
+    Usage:
+        python -m app.commands.rebuild_rollups [--user-id ID]
+    """
+    parser = argparse.ArgumentParser(description="Rebuild expense_daily_rollups from expenses.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    rows = ExpenseRollupService.rebuild(args.user_id)
+    scope = f"user {args.user_id}" if args.user_id is not None else "all users"
+    print(f"Rebuilt {rows} rollup rows for {scope}")
+
+
+if __name__ == "__main__":
+    main()
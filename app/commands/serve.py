@@ -0,0 +1,144 @@
+import argparse
+import importlib.util
+import os
+import sys
+from typing import Optional
+
+from app.core.config import settings
+
+
+def worker_count(configured: Optional[int] = settings.SERVER_WORKERS) -> int:
+    """The configured number of workers, or one per CPU this process may run on."""
+    if configured:
+        return configured
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def pool_sizes(
+    workers: int,
+    max_connections: Optional[int] = settings.DB_MAX_CONNECTIONS,
+    pool_size: int = settings.DB_POOL_SIZE,
+    max_overflow: int = settings.DB_MAX_OVERFLOW,
+) -> tuple[int, int]:
+    """
+    Per-worker DB_POOL_SIZE and DB_MAX_OVERFLOW that keep all workers within max_connections.
+
+    One connection per worker is left for the sync engine (startup schema checks).
+    The configured sizes are kept when they fit; otherwise the overflow shrinks
+    first, then the pool itself.
+
+    Raises:
+        ValueError: If max_connections leaves a worker no connection for requests
+    """
+    if max_connections is None:
+        return pool_size, max_overflow
+    per_worker = max_connections // workers - 1
+    if per_worker < 1:
+        raise ValueError(
+            f"DB_MAX_CONNECTIONS={max_connections} is too small for {workers} workers "
+            f"(each needs at least 2 connections)"
+        )
+    pool = min(pool_size, per_worker)
+    return pool, min(max_overflow, per_worker - pool)
+
+
+def worker_environment(workers: int) -> dict[str, str]:
+    """
+    Settings overrides for the worker processes, which read them from the environment on import.
+
+    The database pool is split so the deployment stays under DB_MAX_CONNECTIONS, and
+    the per-minute OpenAI quotas (which are per account, not per process) are divided
+    between the workers.
+    """
+    pool_size, max_overflow = pool_sizes(workers)
+    environment = {'DB_POOL_SIZE': str(pool_size), 'DB_MAX_OVERFLOW': str(max_overflow)}
+    for name in ("LLM_REQUESTS_PER_MINUTE", "LLM_TOKENS_PER_MINUTE"):
+        quota = getattr(settings, name)
+        if quota:
+            environment[name] = str(max(quota // workers, 1))
+    return environment
+
+
+def serve(
+    app: str = "app.main:app",
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    workers: Optional[int] = None,
+    loop: str = "auto",
+    http: str = "auto",
+    factory: bool = False,
+    access_log: bool = True,
+    log_level: Optional[str] = None,
+) -> None:
+    """
+    Run `app` in `workers` uvicorn processes sharing one listening socket.
+
+    Workers are spawned, not forked, so each one imports the app and builds its own
+    database engines, OpenAI client and caches in its lifespan. On SIGTERM every
+    worker stops accepting connections, gives in-flight requests
+    SERVER_GRACEFUL_TIMEOUT seconds, then runs the app's shutdown (draining
+    background jobs and pending writes).
+
+    Raises:
+        ValueError: If DB_MAX_CONNECTIONS can't accommodate the workers
+    """
+    import uvicorn
+
+    workers = worker_count(workers)
+    os.environ.update(worker_environment(workers))
+    uvicorn.run(
+        app,
+        host=host,
+        port=port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        factory=factory,
+        access_log=access_log,
+        log_level=log_level,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+    )
+
+
+def main() -> None:
+    """
+    Run the API with one worker process per CPU (or SERVER_WORKERS).
+
+    Usage:
+        python -m app.commands.serve [--host HOST] [--port PORT] [--workers N]
+                                     [--loop auto|asyncio|uvloop] [--http auto|h11|httptools]
+    """
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")), help="Default: $PORT or 8000")
+    parser.add_argument("--workers", type=int, default=None, help="Default: SERVER_WORKERS, or one per CPU")
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default="auto",
+                        help="auto uses uvloop when it is installed")
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default="auto",
+                        help="auto uses httptools when it is installed")
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args()
+
+    workers = worker_count(args.workers)
+    try:
+        pool_size, max_overflow = pool_sizes(workers)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    loop = args.loop if args.loop != "auto" else ("uvloop" if importlib.util.find_spec("uvloop") else "asyncio")
+    http = args.http if args.http != "auto" else ("httptools" if importlib.util.find_spec("httptools") else "h11")
+    print(
+        f"Starting {workers} workers on {args.host}:{args.port} ({loop} loop, {http} parser, "
+        f"database pool {pool_size}+{max_overflow} per worker)"
+    )
+    serve(
+        host=args.host, port=args.port, workers=workers,
+        loop=args.loop, http=args.http, access_log=args.access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
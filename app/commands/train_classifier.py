@@ -0,0 +1,66 @@
+import argparse
+import random
+import sys
+import time
+
+from app.core.config import settings
+from app.services.category_classifier import CategoryClassifier, evaluate
+from app.services.expense_service import ExpenseService
+
+
+def split_holdout(examples: list, holdout: float, seed: int = 0) -> tuple[list, list]:
+    """Shuffle the examples deterministically and split off the last `holdout` fraction."""
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    cut = len(examples) - int(len(examples) * holdout)
+    return examples[:cut], examples[cut:]
+
+
+def main() -> None:
+    """
+    Train the local category classifier from categorized expenses and save it.
+
+    Usage:
+        python -m app.commands.train_classifier [--output PATH] [--per-user] [--user-id ID] [--limit N]
+    """
+    parser = argparse.ArgumentParser(description="Train the local category classifier from the expenses table.")
+    parser.add_argument(
+        "--output", default=settings.CATEGORY_CLASSIFIER_PATH or "category_classifier.json.gz",
+        help="Model file (default: CATEGORY_CLASSIFIER_PATH)",
+    )
+    parser.add_argument("--per-user", action="store_true", help="Learn per-user word weights on top of the shared ones")
+    parser.add_argument("--user-id", type=int, default=None, help="Only train on this user's expenses")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the newest N expenses")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--holdout", type=float, default=0.1, help="Fraction held out for the accuracy report")
+    parser.add_argument("--min-confidence", type=float, default=settings.CATEGORY_CLASSIFIER_MIN_CONFIDENCE)
+    args = parser.parse_args()
+
+    examples = ExpenseService.get_labeled_descriptions(args.user_id, args.limit)
+    if len({category for _, _, category in examples}) < 2:
+        print(f"Need expenses in at least two categories to train, found {len(examples)} expenses")
+        sys.exit(1)
+
+    train, holdout = split_holdout(examples, args.holdout)
+    if holdout:
+        report = evaluate(CategoryClassifier.train(train, args.per_user, args.epochs), holdout, args.min_confidence)
+        confident_accuracy = report['confident_accuracy']
+        print(
+            f"Held-out accuracy {report['accuracy']:.1%} on {report['examples']} expenses; "
+            f"{report['coverage']:.1%} at confidence >= {args.min_confidence} "
+            f"({'n/a' if confident_accuracy is None else f'{confident_accuracy:.1%}'} correct), "
+            f"{report['predict_microseconds']:.0f} µs per prediction"
+        )
+
+    # The saved model is refitted on every example, held-out ones included
+    started = time.perf_counter()
+    classifier = CategoryClassifier.train(examples, args.per_user, args.epochs)
+    classifier.save(args.output)
+    print(
+        f"Trained on {len(examples)} expenses in {time.perf_counter() - started:.1f}s "
+        f"({len(classifier.categories)} categories, {len(classifier.weights)} weights); saved to {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine, inspect
+from typing import Optional
+
+from sqlalchemy import Engine, create_engine, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.schema import CreateColumn
+from app.core import metrics
 from app.core.config import settings
 import os
 
@@ -12,17 +17,160 @@ DATABASE_URL = settings.DATABASE_URL
 if DATABASE_URL.startswith('postgresql://') and not DATABASE_URL.startswith('postgresql+psycopg://'):
     DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+psycopg://')
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# psycopg 3 serves both the sync and the async engine; SQLite needs its async driver
+ASYNC_DATABASE_URL = DATABASE_URL
+if ASYNC_DATABASE_URL.startswith('sqlite://'):
+    ASYNC_DATABASE_URL = ASYNC_DATABASE_URL.replace('sqlite://', 'sqlite+aiosqlite://')
+
+
+def engine_options(url: str) -> dict:
+    """Pool and connection options from settings, for the drivers that support them."""
+    if url.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+    }
+    # psycopg disables server-side prepares with None, which an environment variable can't express
+    prepare_threshold = settings.DB_PREPARE_THRESHOLD if settings.DB_PREPARE_THRESHOLD >= 0 else None
+    connect_args = {'prepare_threshold': prepare_threshold}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args['options'] = f'-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}'
+    options['connect_args'] = connect_args
+    return options
+
+
+# Engines are created on first use, so importing this module never touches the database
+_engine: Optional[Engine] = None
+_sessionmaker = sessionmaker(autocommit=False, autoflush=False)
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_engine() -> Engine:
+    """Return the process-wide engine, creating it on first use (no connection is opened)."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+        _sessionmaker.configure(bind=_engine)
+    return _engine
+
+
+def SessionLocal() -> Session:
+    """Open a new Session bound to the engine."""
+    get_engine()
+    return _sessionmaker()
+
+
+def get_async_engine() -> AsyncEngine:
+    """Return the process-wide async engine, creating it on first use."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+        _async_sessionmaker = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """Open a new AsyncSession bound to the async engine."""
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+def missing_tables() -> list[str]:
+    """Tables declared by the models that do not exist in the database."""
+    import app.models  # noqa: F401  (registers every model on Base.metadata)
+    existing_tables = set(inspect(get_engine()).get_table_names())
+    return [table for table in Base.metadata.tables if table not in existing_tables]
 
-# Check if tables exist before creating them
-inspector = inspect(engine)
-existing_tables = inspector.get_table_names()
 
-# Only create tables that don't exist
-for table in Base.metadata.tables:
-    if table not in existing_tables:
-        Base.metadata.tables[table].create(bind=engine)
+def create_schema() -> list[str]:
+    """
+    Create missing tables, and missing columns and indexes on existing tables.
+    
+    Columns are added with their server default (a catalog-only change on PostgreSQL 11+),
+    so only nullable columns or columns with a server_default can be added this way.
+    
+    Returns:
+        The names of the tables, columns (table.column) and indexes that were created
+    """
+    import app.models  # noqa: F401  (registers every model on Base.metadata)
+    engine = get_engine()
+    created = missing_tables()
+    Base.metadata.create_all(bind=engine, checkfirst=True)
+    
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if table.name in created:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                with engine.begin() as connection:
+                    connection.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}"
+                    ))
+                created.append(f"{table.name}.{column.name}")
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=engine)
+                created.append(index.name)
+    return created
+
+
+DB_POOL_CONNECTIONS = metrics.gauge(
+    "db_pool_connections", "Pooled database connections by engine and state", ("engine", "state")
+)
+
+
+def _sample_pool_gauges() -> None:
+    """Copy the current pool occupancy of the engines created so far into gauges."""
+    for name, engine in (("sync", _engine), ("async", _async_engine)):
+        pool = engine.pool if engine is not None else None
+        if pool is None or not hasattr(pool, "checkedout"):
+            continue
+        DB_POOL_CONNECTIONS.labels(name, "size").set(pool.size())
+        DB_POOL_CONNECTIONS.labels(name, "checked_out").set(pool.checkedout())
+        DB_POOL_CONNECTIONS.labels(name, "idle").set(pool.checkedin())
+        DB_POOL_CONNECTIONS.labels(name, "overflow").set(max(pool.overflow(), 0))
+
+
+metrics.REGISTRY.add_collect_hook(_sample_pool_gauges)
+
+
+async def dispose_engines() -> None:
+    """Close all pooled connections of both engines."""
+    global _engine, _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+
+def _forget_engines_after_fork() -> None:
+    """
+    Give a forked child (e.g. gunicorn with --preload) its own pools. The inherited
+    connections belong to the parent, so they are dropped without being closed.
+    """
+    global _engine, _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+        _async_engine = None
+        _async_sessionmaker = None
+    if _engine is not None:
+        _engine.dispose(close=False)
+        _engine = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_engines_after_fork)
 
 # Dependency
 def get_db():
@@ -30,4 +178,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,18 +1,78 @@
+import asyncio
+import logging
+import signal
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.api import api_router
 from app.core.config import settings
+from app.core.database import create_schema, dispose_engines, missing_tables
+from app.core.observability import RequestContextMiddleware, configure_logging
+from app.services.registry import ServiceRegistry, preload_langchain
+
+logger = logging.getLogger(__name__)
+
+
+def _install_reload_signal(services: ServiceRegistry) -> None:
+    """
+    Invalidate cached reference data on SIGHUP, where the platform and thread allow it.
+    """
+    if not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, services.category_cache.invalidate)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass
+
+
+async def _prepare_database() -> None:
+    """
+    Optionally create or verify the schema before serving requests.
+    """
+    if settings.DB_CREATE_SCHEMA_ON_STARTUP:
+        created = await run_in_threadpool(create_schema)
+        if created:
+            logger.info("schema_created", extra={'objects': created})
+    elif settings.DB_CHECK_SCHEMA_ON_STARTUP:
+        missing = await run_in_threadpool(missing_tables)
+        if missing:
+            logger.warning("schema_tables_missing", extra={'tables': missing, 'hint': "python -m app.commands.migrate"})
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """
+    Build process-wide services on startup and release them on shutdown.
+    Database engines are created lazily; schema checks only run when enabled in settings.
+    """
+    await _prepare_database()
+    application.state.services = ServiceRegistry.build()
+    application.state.services.start()
+    _install_reload_signal(application.state.services)
+    preload = asyncio.create_task(run_in_threadpool(preload_langchain)) if settings.LLM_PRELOAD_ON_STARTUP else None
+    try:
+        yield
+    finally:
+        if preload is not None:
+            await asyncio.gather(preload, return_exceptions=True)
+        await application.state.services.aclose()
+        await dispose_engines()
+
 
 def create_application() -> FastAPI:
     """
     Initialize and configure the FastAPI application.
     """
+    configure_logging()
     application = FastAPI(
         title=settings.PROJECT_NAME,
         description=settings.PROJECT_DESCRIPTION,
         version=settings.VERSION,
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        lifespan=lifespan,
     )
 
     # Set up CORS middleware
@@ -22,8 +82,12 @@ def create_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Request-ID"],
     )
 
+    # Outermost: request ID for logs and the response, plus request duration metrics
+    application.add_middleware(RequestContextMiddleware)
+
     # Include API router
     application.include_router(api_router, prefix=settings.API_V1_STR)
 
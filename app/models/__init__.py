@@ -2,5 +2,7 @@
 from app.models.user import User
 from app.models.expense import Expense
 from app.models.expense_category import ExpenseCategory
+from app.models.expense_rollup import ExpenseDailyRollup
+from app.models.analysis_job import AnalysisJob
 
-__all__ = ["User", "Expense", "ExpenseCategory"] 
\ No newline at end of file
+__all__ = ["User", "Expense", "ExpenseCategory", "ExpenseDailyRollup", "AnalysisJob"] 
\ No newline at end of file
@@ -0,0 +1,38 @@
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, Integer, String, Text, text
+from app.core.database import Base
+from datetime import datetime
+
+# Job lifecycle: queued -> running -> succeeded | failed (running jobs whose lease expired are queued again)
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class AnalysisJob(Base):
+    """A message waiting for (or done with) background analysis; the table is the job queue."""
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        # Serves the worker's "next available job" scan
+        Index("ix_analysis_jobs_status_available_at", "status", "available_at"),
+        # One job per client idempotency key
+        Index(
+            "ux_analysis_jobs_user_id_idempotency_key", "user_id", "idempotency_key",
+            unique=True, postgresql_where=text("idempotency_key IS NOT NULL"),
+        ),
+    )
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    message = Column(Text, nullable=False)
+    idempotency_key = Column(String(255), nullable=True)
+    status = Column(String(16), nullable=False, default=JOB_QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True)
+    # Written in the same transaction as the expense, so a retried job never saves it twice
+    expense_id = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    available_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,15 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import MONEY
+from sqlalchemy import Column, Integer, Numeric, String, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 from datetime import datetime
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Serves per-user listings ordered by (added_at, id) and date-range filters
+        Index("ix_expenses_user_id_added_at", "user_id", "added_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     description = Column(String, nullable=False)
-    amount = Column(MONEY, nullable=False)
+    amount = Column(Numeric(14, 2), nullable=False)
     category = Column(String, nullable=False)
     added_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow) 
\ No newline at end of file
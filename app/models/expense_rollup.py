@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric, String
+from app.core.database import Base
+
+class ExpenseDailyRollup(Base):
+    """Per-user, per-category, per-day (UTC) spending totals, kept up to date by every expense insert."""
+    __tablename__ = "expense_daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
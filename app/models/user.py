@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import BigInteger, Column, Integer, String
 from app.core.database import Base
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    telegram_id = Column(String, unique=True, nullable=False) 
\ No newline at end of file
+    telegram_id = Column(String, unique=True, nullable=False)
+    # Bumped by every write to the user's expenses; versions cached reads (see ExpenseReadCache)
+    data_version = Column(BigInteger, nullable=False, default=0, server_default="0")
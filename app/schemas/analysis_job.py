@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from app.schemas.message import MessageResponse
+
+
+class AnalysisJobAccepted(BaseModel):
+    """Response to a message queued for background analysis."""
+    job_id: str
+    status: str
+    status_url: str = Field(..., description="Poll this URL for the result")
+
+
+class AnalysisJobStatus(BaseModel):
+    """State of a background analysis job."""
+    job_id: str
+    status: str = Field(..., description="'queued', 'running', 'succeeded' or 'failed'")
+    attempts: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    result: Optional[MessageResponse] = None
+    error: Optional[str] = None
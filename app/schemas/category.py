@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class CategoryCatalog(BaseModel):
+    """Model for the cached category catalog."""
+    categories: list[str]
+    version: str
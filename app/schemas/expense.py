@@ -1,9 +1,25 @@
 from datetime import datetime
-from pydantic import BaseModel, Field
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Annotated, Optional
+
+from pydantic import AfterValidator, BaseModel, Field, PlainSerializer, WithJsonSchema
+
+CENTS = Decimal("0.01")
+# The largest value NUMERIC(14, 2) holds; larger amounts are rejected here instead of failing the insert
+MAX_AMOUNT = Decimal("999999999999.99")
+
+# Exact to the cent inside the app, like the NUMERIC(14, 2) column; JSON (and the LLM tool schema) show a number
+Amount = Annotated[
+    Decimal,
+    Field(ge=0, le=MAX_AMOUNT),
+    AfterValidator(lambda value: value.quantize(CENTS, rounding=ROUND_HALF_UP)),
+    PlainSerializer(float, return_type=float, when_used="json"),
+    WithJsonSchema({"type": "number", "minimum": 0, "maximum": float(MAX_AMOUNT)}),
+]
 
 class ExpenseBase(BaseModel):
     description: str
-    amount: float = Field(ge=0)
+    amount: Amount
     category: str
 
 class ExpenseCreate(ExpenseBase):
@@ -15,4 +31,25 @@ class Expense(ExpenseBase):
     added_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+
+class ExpensePage(BaseModel):
+    """A page of expenses; pass next_cursor back to get the following page."""
+    items: list[Expense]
+    next_cursor: Optional[str] = None
+
+
+class SummaryBucket(BaseModel):
+    """Spending total for one day, week, month or category."""
+    key: str
+    total: float
+    count: int
+
+
+class ExpenseSummary(BaseModel):
+    """Spending totals for a user, grouped by day, week, month or category."""
+    group_by: str
+    buckets: list[SummaryBucket]
+    total: float
+    count: int
\ No newline at end of file
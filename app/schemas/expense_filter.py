@@ -1,5 +1,6 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import ClassVar, Optional
 from pydantic import BaseModel, Field
 
 class ExpenseFilter(BaseModel):
@@ -8,19 +9,46 @@ class ExpenseFilter(BaseModel):
     category: Optional[str] = None
     min_amount: Optional[float] = Field(None, ge=0)
     max_amount: Optional[float] = Field(None, ge=0)
+
+    FIELDS: ClassVar[tuple[str, ...]] = ("start_date", "end_date", "category", "min_amount", "max_amount")
+
+    def shape(self) -> tuple[bool, ...]:
+        """Which filters are set, in FIELDS order. There are at most 32 distinct shapes."""
+        return (
+            bool(self.start_date),
+            bool(self.end_date),
+            bool(self.category),
+            self.min_amount is not None,
+            self.max_amount is not None,
+        )
+
+    def to_sql_params(self) -> dict:
+        """
+        Bind parameters for the filters that are set. Amounts are exact decimals, like the amount column.
+        Dates without a timezone are UTC, like stored added_at values; binding them as timestamptz
+        lets PostgreSQL prune expense partitions while planning.
+        """
+        params = {name: getattr(self, name) for name, active in zip(self.FIELDS, self.shape()) if active}
+        for name in ("start_date", "end_date"):
+            if name in params and params[name].tzinfo is None:
+                params[name] = params[name].replace(tzinfo=timezone.utc)
+        for name in ("min_amount", "max_amount"):
+            if name in params:
+                params[name] = Decimal(str(params[name]))
+        return params
     
     def to_sql_where_clause(self) -> str:
-        """Convert filter to SQL WHERE clause."""
+        """Convert filter to a SQL WHERE clause with bound parameters; values come from to_sql_params()."""
         conditions = []
         if self.start_date:
-            conditions.append(f"added_at >= '{self.start_date.isoformat()}'")
+            conditions.append("added_at >= :start_date")
         if self.end_date:
-            conditions.append(f"added_at <= '{self.end_date.isoformat()}'")
+            conditions.append("added_at <= :end_date")
         if self.category:
-            conditions.append(f"category = '{self.category}'")
+            conditions.append("category = :category")
         if self.min_amount is not None:
-            conditions.append(f"amount >= {self.min_amount}")
+            conditions.append("amount >= :min_amount")
         if self.max_amount is not None:
-            conditions.append(f"amount <= {self.max_amount}")
+            conditions.append("amount <= :max_amount")
         
-        return " AND ".join(conditions) if conditions else "1=1" 
\ No newline at end of file
+        return " AND ".join(conditions) if conditions else "1=1"
@@ -0,0 +1,23 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ImportRowError(BaseModel):
+    """A statement line that was not imported, and why."""
+    line: int
+    error: str
+
+
+class ExpenseImportReport(BaseModel):
+    """Progress, and once finished the outcome, of a statement import."""
+    import_id: str
+    status: str
+    rows: int
+    processed: int
+    imported: int
+    skipped: int = 0
+    failed: int
+    errors: list[ImportRowError]
+    errors_truncated: bool = False
+    elapsed_seconds: Optional[float] = None
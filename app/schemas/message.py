@@ -1,6 +1,23 @@
-from pydantic import BaseModel, Field
+from typing import Optional
 
-class MessageRequest(BaseModel):
+from pydantic import BaseModel, Field, model_validator
+
+
+class UserReference(BaseModel):
+    """Identifies the user either by internal ID or by Telegram account."""
+    user_id: Optional[int] = Field(None, description="The user the expense belongs to")
+    telegram_id: Optional[str] = Field(
+        None, max_length=64, description="The user's Telegram ID, instead of user_id (new users are registered)"
+    )
+
+    @model_validator(mode="after")
+    def check_user(self) -> "UserReference":
+        if (self.user_id is None) == (self.telegram_id is None):
+            raise ValueError("Exactly one of user_id and telegram_id is required")
+        return self
+
+
+class MessageRequest(UserReference):
     """Model for incoming message requests."""
     message: str = Field(..., description="The message to analyze")
     
@@ -8,4 +25,56 @@ class MessageResponse(BaseModel):
     """Model for API responses."""
     amount: float
     category: str
-    description: str
\ No newline at end of file
+    description: str
+    source: str = Field("llm", description="Stage that analyzed the message: 'rules', 'cache', 'classifier' or 'llm'")
+
+class BatchMessageRequest(UserReference):
+    """Model for batch analysis requests."""
+    messages: list[str] = Field(..., description="The messages to analyze, in order")
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of analyzing one message of a batch."""
+    index: int
+    success: bool
+    expense: Optional[MessageResponse] = None
+    error: Optional[str] = None
+
+
+class BatchMessageResponse(BaseModel):
+    """Model for batch analysis responses."""
+    results: list[BatchItemResult]
+
+
+class FastPathStats(BaseModel):
+    """Counters for the rule-based parser."""
+    hits: int
+    misses: int
+
+
+class ClassifierStats(BaseModel):
+    """Counters for the local category classifier."""
+    hits: int
+    misses: int
+
+
+class LLMCacheStats(BaseModel):
+    """Counters for the LLM result cache."""
+    hits: int
+    misses: int
+    size: int
+    hit_rate: float
+
+
+class DedupStats(BaseModel):
+    """Counters for requests answered without repeating the work."""
+    in_flight_shared: int
+    idempotent_replays: int
+
+
+class AnalysisStats(BaseModel):
+    """Hit/miss counters for the stages that can answer without calling the LLM."""
+    fast_path: FastPathStats
+    classifier: Optional[ClassifierStats] = None
+    llm_cache: Optional[LLMCacheStats] = None
+    dedup: Optional[DedupStats] = None
@@ -1,81 +1,356 @@
-from langchain_openai import ChatOpenAI
-from langchain.schema.messages import HumanMessage, SystemMessage, AIMessage
+from app.core import metrics
 from app.core.config import settings
-from app.services.expense_category_service import ExpenseCategoryService
-from app.services.expense_service import ExpenseService
+from app.services.category_cache import CategoryCache, CategorySnapshot
+from app.services.category_classifier import CategoryClassifier
+from app.services.expense_service import AsyncExpenseService
+from app.services.expense_writer import GroupCommitWriter
+from app.services.fast_path_parser import FastPathParser, split_amount
+from app.services.llm_cache import LLMResultCache
+from app.services.llm_scheduler import LLMUnavailable
+from app.services.prompts import EXPENSE_TOOL_NAME
+from app.services.request_dedup import IdempotencyCache, IdempotencyKeyReused, SingleFlight
+from app.models.expense import Expense
 from app.schemas.expense import ExpenseCreate
-from langchain_core.messages import SystemMessage, HumanMessage
+from pydantic import ValidationError
+import asyncio
 import json
+import logging
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_STAGE_SECONDS = metrics.histogram(
+    "analysis_stage_seconds", "Time spent in each stage of message analysis", ("stage",)
+)
+ANALYSIS_RESULTS = metrics.counter("analysis_results", "Analyzed messages by the stage that answered them", ("source",))
+ANALYSIS_ERRORS = metrics.counter("analysis_errors", "Messages that could not be analyzed or saved", ("reason",))
+CATEGORY_FALLBACKS = metrics.counter("analysis_category_fallbacks", "Categories outside the catalog replaced with 'Other'")
+ANALYSIS_DEDUPLICATED = metrics.counter(
+    "analysis_deduplicated", "Requests answered by another in-flight request or an earlier idempotent one", ("kind",)
+)
+_SHARED_IN_FLIGHT = ANALYSIS_DEDUPLICATED.labels("in_flight")
+_IDEMPOTENT_REPLAYS = ANALYSIS_DEDUPLICATED.labels("idempotency_key")
+
+# Bound once so the hot path only pays for perf_counter() and an addition per stage
+_CATEGORIES_SECONDS = ANALYSIS_STAGE_SECONDS.labels("categories")
+_LOOKUP_SECONDS = ANALYSIS_STAGE_SECONDS.labels("lookup")
+_LLM_SECONDS = ANALYSIS_STAGE_SECONDS.labels("llm")
+_PARSE_SECONDS = ANALYSIS_STAGE_SECONDS.labels("parse")
+_SAVE_SECONDS = ANALYSIS_STAGE_SECONDS.labels("save")
+
+_JSON_MODE_OPTIONS = {'response_format': {'type': 'json_object'}}
+_TOOL_CHOICE = {'type': 'function', 'function': {'name': EXPENSE_TOOL_NAME}}
+
+
+def _parse_llm_json(response) -> dict:
+    """
+    Read the analysis out of an LLM reply: the record_expense tool call if there is one,
+    otherwise the JSON object in the text (models sometimes wrap it in prose or a code fence).
+
+    Raises:
+        json.JSONDecodeError: If no JSON object can be read from the reply
+    """
+    for call in (getattr(response, 'additional_kwargs', None) or {}).get('tool_calls') or ():
+        function = call.get('function') or {}
+        if function.get('name') == EXPENSE_TOOL_NAME:
+            return json.loads(function.get('arguments') or '')
+    return _loads_embedded(response.content, '{', '}')
+
+
+def _parse_llm_json_array(response) -> list:
+    """
+    Read the JSON array of a batch reply, tolerating prose or a code fence around it like _parse_llm_json.
+
+    Raises:
+        json.JSONDecodeError: If no JSON can be read from the reply
+        ValueError: If the reply is not an array
+    """
+    items = _loads_embedded(response.content, '[', ']')
+    if not isinstance(items, list):
+        raise ValueError('Expected a JSON array of expenses')
+    return items
+
+
+def _loads_embedded(content: str, opening: str, closing: str):
+    """Parse content as JSON, or else the span from the first `opening` to the last `closing` bracket."""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        start, end = content.find(opening), content.rfind(closing)
+        if start == -1 or end < start:
+            raise
+        return json.loads(content[start:end + 1])
+
 
 class AIService:
-    def __init__(self):
+    def __init__(
+        self,
+        llm: Optional["ChatOpenAI"] = None,
+        category_cache: Optional[CategoryCache] = None,
+        fast_path: Optional[FastPathParser] = None,
+        result_cache: Optional[LLMResultCache] = None,
+        expense_writer: Optional[GroupCommitWriter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        idempotency_cache: Optional[IdempotencyCache] = None,
+        output_mode: str = settings.LLM_OUTPUT_MODE,
+        classifier: Optional[CategoryClassifier] = None,
+        classifier_min_confidence: float = settings.CATEGORY_CLASSIFIER_MIN_CONFIDENCE,
+    ):
+        self.category_cache = category_cache or CategoryCache()
+        self.fast_path = fast_path or FastPathParser()
+        self.result_cache = result_cache
+        self.expense_writer = expense_writer
+        if single_flight is None and settings.SINGLE_FLIGHT_ENABLED:
+            single_flight = SingleFlight()
+        self.single_flight = single_flight
+        self.idempotency_cache = idempotency_cache or IdempotencyCache()
+        self.output_mode = output_mode
+        self.classifier = classifier
+        self.classifier_min_confidence = classifier_min_confidence
+        from app.services.llm_usage import TokenUsageCallback
+
+        # Cached answers are replayed verbatim, so they are requested deterministically
+        self._llm_options = {'temperature': settings.LLM_CACHE_TEMPERATURE} if result_cache is not None else {}
+        self._llm_options['config'] = {'callbacks': [TokenUsageCallback()]}
+        self._message_options = (
+            {**self._llm_options, **_JSON_MODE_OPTIONS} if output_mode == 'json' else self._llm_options
+        )
+        if llm is not None:
+            self.llm = llm
+            return
+        # langchain is slow to import, so it is only loaded once a client is actually needed
+        from langchain_openai import ChatOpenAI
+
         try:
             self.llm = ChatOpenAI(
                 api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
                 model_name=settings.OPENAI_MODEL_NAME,
                 temperature=settings.OPENAI_TEMPERATURE
             )
-        except Exception as e:
-            print(f"Error initializing ChatOpenAI: {e}")
+        except Exception:
+            logger.exception("llm_client_init_failed")
             raise
     
-    async def process_message(self, message: str, user_id: int) -> dict:
+    def stats(self) -> dict:
+        """Return hit/miss counters for the stages in front of the LLM."""
+        return {
+            'fast_path': {'hits': self.fast_path.hits, 'misses': self.fast_path.misses},
+            'classifier': (
+                {'hits': self.classifier.hits, 'misses': self.classifier.misses} if self.classifier is not None else None
+            ),
+            'llm_cache': self.result_cache.stats() if self.result_cache is not None else None,
+            'dedup': {
+                'in_flight_shared': self.single_flight.shared if self.single_flight is not None else 0,
+                'idempotent_replays': self.idempotency_cache.replays,
+            },
+        }
+    
+    @staticmethod
+    def _validate_result(result, categories: CategorySnapshot) -> bool:
+        """
+        Check that an analysis result has the expected structure.
+        Categories outside the catalog are replaced with 'Other'.
+        """
+        if not isinstance(result, dict) or not all(key in result for key in ['amount', 'category', 'description']):
+            logger.warning("invalid_result_structure", extra={'result': result})
+            return False
+        
+        if result['category'] not in categories.names and result['category'] != 'unknown':
+            logger.info("category_fallback", extra={'category': result['category']})
+            CATEGORY_FALLBACKS.inc()
+            result['category'] = 'Other'
+        return True
+    
+    def _classify(self, message: str, categories: CategorySnapshot, user_id: Optional[int]) -> Optional[dict]:
+        """
+        Answer a message with the local classifier when it has exactly one amount
+        and the classifier is confident about a category from the catalog.
+        """
+        if self.classifier is None:
+            return None
+        split = split_amount(message)
+        if split is None:
+            return None
+        amount, description = split
+        category, confidence = self.classifier.predict(description, user_id)
+        if confidence < self.classifier_min_confidence or category not in categories.names:
+            self.classifier.misses += 1
+            return None
+        self.classifier.hits += 1
+        return {'amount': amount, 'category': category, 'description': description}
+    
+    async def _lookup_known_result(
+        self, message: str, categories: CategorySnapshot, user_id: Optional[int] = None
+    ) -> tuple[Optional[dict], str, Optional[str]]:
+        """
+        Try to answer a message without calling the LLM.
+        
+        Returns:
+            The result (or None), the stage that produced it, and the LLM cache key to store a fresh result under
+        """
+        result = self.fast_path.parse(message, categories)
+        if result is not None:
+            return result, 'rules', None
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.make_key(message, self.llm.model_name, categories.version)
+            result = await self.result_cache.get(cache_key)
+            if result is not None:
+                return result, 'cache', cache_key
+        
+        result = self._classify(message, categories, user_id)
+        if result is not None:
+            return result, 'classifier', None
+        return None, 'llm', cache_key
+    
+    def _message_call_options(self, categories: CategorySnapshot) -> dict:
+        """Keyword arguments for the single-message LLM call in the configured output mode."""
+        if self.output_mode == 'tools':
+            return {**self._llm_options, 'tools': [categories.expense_tool], 'tool_choice': _TOOL_CHOICE}
+        return self._message_options
+    
+    async def _remember_result(self, cache_key: Optional[str], result: dict) -> None:
+        """Store a validated LLM result in the result cache."""
+        if cache_key is None:
+            return
+        await self.result_cache.set(cache_key, {
+            'amount': result['amount'],
+            'category': result['category'],
+            'description': result['description']
+        })
+    
+    async def _save_expense(self, expense_data: ExpenseCreate) -> Optional[Expense]:
+        """Save an expense through the group-commit writer when enabled, otherwise directly."""
+        if self.expense_writer is not None:
+            return await self.expense_writer.create_expense(expense_data)
+        return await AsyncExpenseService.create_expense(expense_data)
+    
+    async def process_message(
+        self,
+        message: str,
+        user_id: int,
+        idempotency_key: Optional[str] = None,
+        save: Optional[Callable[[ExpenseCreate, str], Awaitable[Optional[Expense]]]] = None,
+    ) -> dict:
         """
         Analyze a natural language expense message, save it to the database, and return structured data.
+        Simple messages are parsed by rules; others are answered from the LLM result cache
+        when possible and only sent to the LLM on a miss.
         If the message cannot be analyzed as an expense, returns a structure with 'unknown' category.
         
+        Identical (user_id, message) requests that arrive while one is being processed share
+        its LLM call and insert. With an idempotency key, a successful result is remembered for
+        IDEMPOTENCY_TTL_SECONDS and replayed for the same (user_id, key) without new work; the
+        same key sent with a different message gets an error flagged 'idempotency_conflict'.
+        
         Args:
             message: The expense message to analyze
             user_id: The ID of the user creating the expense
+            idempotency_key: Optional client-supplied key identifying this request across retries
+            save: Optional replacement for the expense insert, called with the expense and the
+                stage that analyzed it; such a request doesn't share work with others in flight
             
         Returns:
             A dictionary with the saved expense data or error information
         """
-        try:
-            # Analyze the message
-            print("Analyzing message: ", message)
-            categories = ExpenseCategoryService.get_categories_as_string()
-            
-            messages = [
-                SystemMessage(content=(
-                    "You are an assistant that extracts structured expense data from user messages. "
-                    "Given a message like 'Bought coffee for 4.5 dollars', extract and return a JSON object "
-                    "with the fields: amount (number), category (string), and description (string).\n\n"
-                    f"Available categories are: {categories}\n"
-                    "If the message cannot be analyzed as an expense, set category to 'unknown'. "
-                    "But only if you can't extract an expense, otherwise use a category from the list above. "
-                    "Respond only with the JSON structure, for example:\n"
-                    '{"amount": 4.5, "category": "Food", "description": "Bought coffee"}'
-                )),
-                HumanMessage(content=message)
-]
-
-
-            
+        if idempotency_key is not None:
             try:
-                response = self.llm.invoke(messages)
-                result = json.loads(response.content)
-            except json.JSONDecodeError as e:
-                print(f"Error parsing JSON response: {e}")
-                print("Raw response:", response.content)
+                replayed = self.idempotency_cache.get((user_id, idempotency_key), message)
+            except IdempotencyKeyReused as e:
                 return {
                     'amount': 0,
                     'category': 'unknown',
                     'description': message,
-                    'error': 'Could not parse AI response'
-                }
-            except Exception as e:
-                print(f"Error calling OpenAI: {e}")
-                return {
-                    'amount': 0,
-                    'category': 'unknown',
-                    'description': message,
-                    'error': str(e)
+                    'error': str(e),
+                    'idempotency_conflict': True
                 }
+            if replayed is not None:
+                _IDEMPOTENT_REPLAYS.inc()
+                return replayed
+        
+        async def analyze() -> dict:
+            result = await self._process_message(message, user_id, save)
+            if idempotency_key is not None and 'error' not in result:
+                self.idempotency_cache.set((user_id, idempotency_key), message, result)
+            return result
+        
+        if self.single_flight is None or save is not None:
+            return await analyze()
+        
+        if idempotency_key is not None:
+            # The message is part of the key so a reused key never hands out another message's result
+            flight_key = (user_id, 'idempotency_key', idempotency_key, message)
+        else:
+            flight_key = (user_id, 'message', message)
+        if flight_key in self.single_flight:
+            _SHARED_IN_FLIGHT.inc()
+        return dict(await self.single_flight.run(flight_key, analyze))
+    
+    async def _process_message(
+        self, message: str, user_id: int, save: Optional[Callable[[ExpenseCreate, str], Awaitable[Optional[Expense]]]]
+    ) -> dict:
+        """Analyze and save one message; see process_message."""
+        try:
+            logger.debug("analyzing_message", extra={'user_id': user_id, 'text': message})
+            started = time.perf_counter()
+            categories = await self.category_cache.get()
+            looked_up = time.perf_counter()
+            _CATEGORIES_SECONDS.observe(looked_up - started)
+            
+            # Simple messages are handled by the rule-based parser or the cache; the rest go to the LLM
+            result, source, cache_key = await self._lookup_known_result(message, categories, user_id)
+            started = time.perf_counter()
+            _LOOKUP_SECONDS.observe(started - looked_up)
+            
+            if result is None:
+                from langchain_core.messages import HumanMessage
+
+                messages = [categories.system_message, HumanMessage(content=message)]
+                
+                try:
+                    response = await self.llm.ainvoke(messages, **self._message_call_options(categories))
+                    answered = time.perf_counter()
+                    _LLM_SECONDS.observe(answered - started)
+                    result = _parse_llm_json(response)
+                    started = time.perf_counter()
+                    _PARSE_SECONDS.observe(started - answered)
+                except json.JSONDecodeError as e:
+                    logger.warning("invalid_llm_json", extra={'error': str(e), 'raw': response.content})
+                    ANALYSIS_ERRORS.labels("invalid_json").inc()
+                    return {
+                        'amount': 0,
+                        'category': 'unknown',
+                        'description': message,
+                        'error': 'Could not parse AI response'
+                    }
+                except LLMUnavailable as e:
+                    logger.warning("llm_unavailable", extra={'error': str(e), 'retry_after': e.retry_after})
+                    ANALYSIS_ERRORS.labels("llm_unavailable").inc()
+                    return {
+                        'amount': 0,
+                        'category': 'unknown',
+                        'description': message,
+                        'error': str(e),
+                        'retry_after': e.retry_after
+                    }
+                except Exception as e:
+                    logger.warning("llm_call_failed", extra={'error': str(e)})
+                    ANALYSIS_ERRORS.labels("llm_error").inc()
+                    return {
+                        'amount': 0,
+                        'category': 'unknown',
+                        'description': message,
+                        'error': str(e)
+                    }
             
             # Ensure the result has the expected structure
-            if not isinstance(result, dict) or not all(key in result for key in ['amount', 'category', 'description']):
-                print("Invalid response structure:", result)
+            if not self._validate_result(result, categories):
+                ANALYSIS_ERRORS.labels("invalid_result").inc()
                 return {
                     'amount': 0,
                     'category': 'unknown',
@@ -83,10 +358,8 @@ class AIService:
                     'error': 'Could not analyze message as expense'
                 }
             
-            # Validate category
-            if result['category'] not in categories.split(", ") and result['category'] != 'unknown':
-                print(f"Invalid category: {result['category']}")
-                result['category'] = 'Other'
+            if source == 'llm':
+                await self._remember_result(cache_key, result)
             
             # Create and save the expense
             try:
@@ -97,8 +370,14 @@ class AIService:
                     category=result['category']
                 )
                 
-                saved_expense = ExpenseService.create_expense(expense_data)
+                started = time.perf_counter()
+                if save is not None:
+                    saved_expense = await save(expense_data, source)
+                else:
+                    saved_expense = await self._save_expense(expense_data)
+                _SAVE_SECONDS.observe(time.perf_counter() - started)
                 if not saved_expense:
+                    ANALYSIS_ERRORS.labels("save_failed").inc()
                     return {
                         'amount': 0,
                         'category': 'unknown',
@@ -106,13 +385,16 @@ class AIService:
                         'error': 'Failed to save expense'
                     }
                 
+                ANALYSIS_RESULTS.labels(source).inc()
                 return {
                     'amount': float(saved_expense.amount),
                     'category': saved_expense.category,
-                    'description': saved_expense.description
+                    'description': saved_expense.description,
+                    'source': source
                 }
             except Exception as e:
-                print(f"Error saving expense: {e}")
+                logger.exception("expense_save_failed")
+                ANALYSIS_ERRORS.labels("save_failed").inc()
                 return {
                     'amount': 0,
                     'category': 'unknown',
@@ -121,10 +403,188 @@ class AIService:
                 }
                 
         except Exception as e:
-            print(f"Unexpected error in process_message: {e}")
+            logger.exception("process_message_failed")
+            ANALYSIS_ERRORS.labels("unexpected").inc()
             return {
                 'amount': 0,
                 'category': 'unknown',
                 'description': message,
                 'error': str(e)
-            } 
\ No newline at end of file
+            } 
+    
+    async def _analyze_chunk(self, chunk: list[tuple[int, str]], categories: CategorySnapshot) -> dict[int, dict]:
+        """
+        Analyze several messages with a single LLM call.
+        
+        Args:
+            chunk: (index, message) pairs to analyze
+            categories: The category catalog to prompt with
+            
+        Returns:
+            The raw result for each index the model answered
+        """
+        from langchain_core.messages import HumanMessage
+
+        payload = json.dumps([{'index': index, 'message': message} for index, message in chunk])
+        started = time.perf_counter()
+        response = await self.llm.ainvoke(
+            [categories.batch_system_message, HumanMessage(content=payload)], **self._llm_options
+        )
+        _LLM_SECONDS.observe(time.perf_counter() - started)
+        items = _parse_llm_json_array(response)
+        
+        expected = {index for index, _ in chunk}
+        return {
+            item['index']: item
+            for item in items
+            if isinstance(item, dict) and item.get('index') in expected
+        }
+    
+    async def process_batch(self, messages: list[str], user_id: int) -> list[dict]:
+        """
+        Analyze many expense messages and save the valid ones with a single multi-row insert.
+        Messages that need the LLM are sent in chunks of BATCH_ANALYZE_CHUNK_SIZE per prompt.
+        
+        Args:
+            messages: The expense messages to analyze
+            user_id: The ID of the user creating the expenses
+            
+        Returns:
+            One dictionary per message, in input order, with either the saved expense or an error
+        """
+        categories = await self.category_cache.get()
+        results: dict[int, dict] = {}
+        sources: dict[int, str] = {}
+        cache_keys: dict[int, Optional[str]] = {}
+        errors: dict[int, str] = {}
+        pending: list[tuple[int, str]] = []
+        
+        for index, message in enumerate(messages):
+            if not message or message.strip() == "":
+                errors[index] = 'Message cannot be empty'
+                continue
+            result, sources[index], cache_keys[index] = await self._lookup_known_result(message, categories, user_id)
+            if result is None:
+                pending.append((index, message))
+            else:
+                results[index] = result
+        
+        chunk_size = settings.BATCH_ANALYZE_CHUNK_SIZE
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        analyzed_chunks = await asyncio.gather(
+            *(self._analyze_chunk(chunk, categories) for chunk in chunks), return_exceptions=True
+        )
+        for chunk, analyzed in zip(chunks, analyzed_chunks):
+            if isinstance(analyzed, Exception):
+                logger.warning("batch_chunk_failed", extra={'error': str(analyzed), 'size': len(chunk)})
+                ANALYSIS_ERRORS.labels("llm_error").inc(len(chunk))
+                error = 'Could not parse AI response' if isinstance(analyzed, json.JSONDecodeError) else str(analyzed)
+                for index, _ in chunk:
+                    errors[index] = error
+                continue
+            for index, _ in chunk:
+                if index in analyzed:
+                    results[index] = analyzed[index]
+                else:
+                    errors[index] = 'Could not analyze message as expense'
+        
+        to_save: list[tuple[int, ExpenseCreate]] = []
+        for index in sorted(results):
+            result = results[index]
+            if not self._validate_result(result, categories):
+                errors[index] = 'Could not analyze message as expense'
+                continue
+            try:
+                to_save.append((index, ExpenseCreate(
+                    user_id=user_id,
+                    description=result['description'],
+                    amount=float(result['amount']),
+                    category=result['category']
+                )))
+            except (ValidationError, TypeError, ValueError) as e:
+                errors[index] = f'Could not analyze message as expense: {e}'
+                continue
+            if sources[index] == 'llm':
+                await self._remember_result(cache_keys[index], result)
+        
+        started = time.perf_counter()
+        saved_expenses = await AsyncExpenseService.create_expenses([data for _, data in to_save])
+        _SAVE_SECONDS.observe(time.perf_counter() - started)
+        saved: dict[int, dict] = {}
+        if len(saved_expenses) == len(to_save):
+            for (index, _), expense in zip(to_save, saved_expenses):
+                ANALYSIS_RESULTS.labels(sources[index]).inc()
+                saved[index] = {
+                    'amount': float(expense.amount),
+                    'category': expense.category,
+                    'description': expense.description,
+                    'source': sources[index]
+                }
+        else:
+            ANALYSIS_ERRORS.labels("save_failed").inc(len(to_save))
+            for index, _ in to_save:
+                errors[index] = 'Failed to save expense'
+        
+        return [
+            {'index': index, 'success': True, 'expense': saved[index]}
+            if index in saved else
+            {'index': index, 'success': False, 'error': errors.get(index, 'Could not analyze message as expense')}
+            for index in range(len(messages))
+        ]
+
+    async def categorize(self, descriptions: list[str], user_id: Optional[int] = None) -> list[dict]:
+        """
+        Pick a category for descriptions of transactions that are known to be expenses
+        (e.g. bank statement lines). Keywords and the local classifier are tried first;
+        the rest are sent to the LLM in chunks of BATCH_ANALYZE_CHUNK_SIZE per prompt.
+        
+        Args:
+            descriptions: Transaction descriptions, amount included if it helps the model
+            user_id: The user the transactions belong to
+            
+        Returns:
+            One dictionary per description, in input order, with 'category' and 'source', or 'error'
+        """
+        categories = await self.category_cache.get()
+        results: list[Optional[dict]] = [None] * len(descriptions)
+        pending: list[tuple[int, str]] = []
+        
+        for index, description in enumerate(descriptions):
+            category = self.fast_path.match_category(description, categories)
+            if category is not None:
+                results[index] = {'category': category, 'source': 'rules'}
+                continue
+            if self.classifier is not None:
+                category, confidence = self.classifier.predict(description, user_id)
+                if confidence >= self.classifier_min_confidence and category in categories.names:
+                    self.classifier.hits += 1
+                    results[index] = {'category': category, 'source': 'classifier'}
+                    continue
+                self.classifier.misses += 1
+            pending.append((index, description))
+        
+        chunk_size = settings.BATCH_ANALYZE_CHUNK_SIZE
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        analyzed_chunks = await asyncio.gather(
+            *(self._analyze_chunk(chunk, categories) for chunk in chunks), return_exceptions=True
+        )
+        fallback = 'Other' if 'Other' in categories.names else None
+        for chunk, analyzed in zip(chunks, analyzed_chunks):
+            if isinstance(analyzed, Exception):
+                logger.warning("categorize_chunk_failed", extra={'error': str(analyzed), 'size': len(chunk)})
+                ANALYSIS_ERRORS.labels("llm_error").inc(len(chunk))
+                error = 'Could not parse AI response' if isinstance(analyzed, json.JSONDecodeError) else str(analyzed)
+                for index, _ in chunk:
+                    results[index] = {'error': error}
+                continue
+            for index, _ in chunk:
+                category = (analyzed.get(index) or {}).get('category')
+                if category not in categories.names:
+                    # These are known to be expenses, so "unknown" just means the model couldn't tell which kind
+                    CATEGORY_FALLBACKS.inc()
+                    category = fallback
+                results[index] = (
+                    {'category': category, 'source': 'llm'} if category is not None
+                    else {'error': 'Could not categorize expense'}
+                )
+        return results
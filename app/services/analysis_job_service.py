@@ -0,0 +1,230 @@
+import json
+import logging
+import uuid
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.database import AsyncSessionLocal
+from app.models.analysis_job import JOB_FAILED, JOB_SUCCEEDED, AnalysisJob
+from app.models.expense import Expense
+from app.schemas.expense import ExpenseCreate
+from app.services.expense_service import UPDATE_ROLLUPS_SQL, ExpenseService
+
+logger = logging.getLogger(__name__)
+
+# A retried enqueue with the same idempotency key finds the existing job instead of adding one
+ENQUEUE_JOB_SQL = text("""
+    INSERT INTO analysis_jobs (id, user_id, message, idempotency_key, status, attempts, created_at, available_at)
+    VALUES (:id, :user_id, :message, :idempotency_key, 'queued', 0, now(), now())
+    ON CONFLICT (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+    RETURNING id
+""")
+
+# Jobs whose lease expired max_attempts times kept killing or stalling their worker; give up on them.
+# Run periodically by the worker rather than on every claim.
+FAIL_EXHAUSTED_JOBS_SQL = text("""
+    UPDATE analysis_jobs
+    SET status = 'failed', error = 'Gave up after the worker lease expired ' || attempts || ' times',
+        finished_at = now(), lease_expires_at = NULL
+    WHERE status = 'running' AND lease_expires_at < now() AND attempts >= :max_attempts
+""")
+
+# Takes queued jobs that are due, and running jobs whose worker died (expired lease) while
+# they have attempts left. SKIP LOCKED lets several workers (and processes) claim concurrently.
+# result is only set on a running job if an earlier attempt saved its expense (SAVE_EXPENSE_SQL).
+CLAIM_JOBS_SQL = text("""
+    UPDATE analysis_jobs AS job
+    SET status = 'running',
+        attempts = job.attempts + 1,
+        lease_expires_at = now() + make_interval(secs => :lease_seconds)
+    FROM (
+        SELECT id FROM analysis_jobs
+        WHERE (status = 'queued' AND available_at <= now())
+           OR (status = 'running' AND lease_expires_at < now() AND attempts < :max_attempts)
+        ORDER BY available_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ) AS next
+    WHERE job.id = next.id
+    RETURNING job.id, job.user_id, job.message, job.idempotency_key, job.attempts, job.created_at, job.result
+""")
+
+# Saves a job's expense and records it on the job in one statement. The job row is locked and
+# must still be held by this attempt with no expense saved yet, so neither a retry of the job
+# nor a run that outlived its lease can insert the expense a second time.
+SAVE_EXPENSE_SQL = text(f"""
+    WITH claimed AS (
+        SELECT id FROM analysis_jobs
+        WHERE id = :job_id AND status = 'running' AND attempts = :attempts AND expense_id IS NULL
+        FOR UPDATE
+    ), inserted AS (
+        INSERT INTO expenses (user_id, description, amount, category, added_at)
+        SELECT CAST(:user_id AS INTEGER), CAST(:description AS VARCHAR), CAST(:amount AS NUMERIC),
+               CAST(:category AS VARCHAR), CAST(:added_at AS TIMESTAMPTZ)
+        FROM claimed
+        RETURNING *
+    ), {UPDATE_ROLLUPS_SQL},
+    job AS (
+        UPDATE analysis_jobs
+        SET expense_id = inserted.id,
+            result = json_build_object(
+                'amount', inserted.amount, 'category', inserted.category,
+                'description', inserted.description, 'source', CAST(:source AS VARCHAR)
+            )
+        FROM inserted
+        WHERE analysis_jobs.id = :job_id
+    )
+    SELECT * FROM inserted
+""")
+
+FINISH_JOB_SQL = text("""
+    UPDATE analysis_jobs
+    SET status = :status, result = CAST(:result AS JSON), error = :error, finished_at = now(), lease_expires_at = NULL
+    WHERE id = :id AND status = 'running' AND attempts = :attempts
+""")
+
+RETRY_JOB_SQL = text("""
+    UPDATE analysis_jobs
+    SET status = 'queued', error = :error, lease_expires_at = NULL,
+        available_at = now() + make_interval(secs => :delay_seconds)
+    WHERE id = :id AND status = 'running' AND attempts = :attempts
+""")
+
+
+class AsyncAnalysisJobService:
+    """Persistent queue of background analysis jobs in the analysis_jobs table."""
+
+    @staticmethod
+    async def enqueue(user_id: int, message: str, idempotency_key: Optional[str] = None) -> Optional[AnalysisJob]:
+        """
+        Add a message to the queue.
+
+        Args:
+            user_id: The ID of the user creating the expense
+            message: The expense message to analyze
+            idempotency_key: Optional client key; enqueueing the same key again returns the existing job
+
+        Returns:
+            The queued (or previously queued) job, or None if it could not be stored
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                job_id = (await db.execute(ENQUEUE_JOB_SQL, {
+                    'id': uuid.uuid4().hex,
+                    'user_id': user_id,
+                    'message': message,
+                    'idempotency_key': idempotency_key,
+                })).scalar()
+                await db.commit()
+                if job_id is None:
+                    return (await db.execute(
+                        select(AnalysisJob).where(
+                            AnalysisJob.user_id == user_id, AnalysisJob.idempotency_key == idempotency_key
+                        )
+                    )).scalars().first()
+                return await db.get(AnalysisJob, job_id)
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.error("database_error", extra={'error': str(e)})
+                return None
+
+    @staticmethod
+    async def get(job_id: str) -> Optional[AnalysisJob]:
+        """Return a job by ID, or None if there is no such job."""
+        async with AsyncSessionLocal() as db:
+            return await db.get(AnalysisJob, job_id)
+
+    @staticmethod
+    async def claim(limit: int, lease_seconds: float, max_attempts: int) -> list:
+        """
+        Mark up to `limit` due jobs as running for this worker. Jobs whose lease expired
+        after their last attempt are left to fail_exhausted().
+
+        Returns:
+            Rows with id, user_id, message, idempotency_key, attempts, created_at, and the
+            result saved by an earlier attempt (None unless the job's expense already exists)
+        """
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(CLAIM_JOBS_SQL, {
+                'limit': limit, 'lease_seconds': lease_seconds, 'max_attempts': max_attempts,
+            })).fetchall()
+            await db.commit()
+            return rows
+
+    @staticmethod
+    async def fail_exhausted(max_attempts: int) -> int:
+        """
+        Fail running jobs whose lease expired after their last attempt.
+
+        Returns:
+            The number of jobs failed
+        """
+        async with AsyncSessionLocal() as db:
+            updated = await db.execute(FAIL_EXHAUSTED_JOBS_SQL, {'max_attempts': max_attempts})
+            await db.commit()
+            return updated.rowcount
+
+    @staticmethod
+    async def save_expense(job_id: str, attempts: int, expense: ExpenseCreate, source: str) -> Optional[Expense]:
+        """
+        Save the expense of a job and record it on the job in the same transaction.
+
+        Args:
+            job_id: The job the expense belongs to
+            attempts: The attempt saving it; nothing is saved unless its claim still holds
+            expense: The expense data to create
+            source: Stage that analyzed the message, kept in the recorded result
+
+        Returns:
+            The created expense, or None if it was not saved
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(text("SET TRANSACTION ISOLATION LEVEL READ COMMITTED"))
+                row = (await db.execute(SAVE_EXPENSE_SQL, {
+                    **ExpenseService._insert_params(expense), 'job_id': job_id, 'attempts': attempts, 'source': source,
+                })).fetchone()
+                await db.commit()
+                return ExpenseService._row_to_expense(row) if row else None
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.error("database_error", extra={'error': str(e)})
+                return None
+
+    @staticmethod
+    async def finish(job_id: str, attempts: int, result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+        """
+        Record the outcome of a job: succeeded with `result`, or failed with `error`.
+
+        Only the claim that made attempt number `attempts` may finish the job; if its lease
+        expired and another worker claimed the job since, nothing is written.
+
+        Returns:
+            Whether the outcome was recorded
+        """
+        async with AsyncSessionLocal() as db:
+            updated = await db.execute(FINISH_JOB_SQL, {
+                'id': job_id,
+                'attempts': attempts,
+                'status': JOB_FAILED if error is not None else JOB_SUCCEEDED,
+                'result': json.dumps(result) if result is not None else None,
+                'error': error,
+            })
+            await db.commit()
+            return updated.rowcount == 1
+
+    @staticmethod
+    async def retry(job_id: str, attempts: int, delay_seconds: float, error: str) -> bool:
+        """
+        Put a job back in the queue, to be picked up again after `delay_seconds`.
+
+        Like finish(), only applies while the claim for attempt `attempts` still holds.
+        """
+        async with AsyncSessionLocal() as db:
+            updated = await db.execute(RETRY_JOB_SQL, {
+                'id': job_id, 'attempts': attempts, 'delay_seconds': delay_seconds, 'error': error,
+            })
+            await db.commit()
+            return updated.rowcount == 1
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.expense import Expense
+from app.schemas.expense import ExpenseCreate
+from app.services.ai_service import AIService
+from app.services.analysis_job_service import AsyncAnalysisJobService
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_JOBS = metrics.counter("analysis_jobs", "Background analysis jobs by outcome", ("outcome",))
+ANALYSIS_JOB_WAIT_SECONDS = metrics.histogram(
+    "analysis_job_wait_seconds", "Time background jobs spent queued before a worker picked them up",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+
+
+class AnalysisJobWorker:
+    """
+    Pool of asyncio tasks that run queued analysis jobs through AIService.
+
+    Each task claims one job at a time from the analysis_jobs table, so jobs
+    survive restarts and several processes can share the queue. Workers poll the
+    table every poll_interval seconds and are woken immediately by notify() when
+    this process enqueues a job. A separate task fails jobs that ran out of
+    attempts once per lease period.
+    """
+
+    def __init__(
+        self,
+        ai_service: AIService,
+        concurrency: int = settings.ANALYSIS_JOB_WORKERS,
+        poll_interval: float = settings.ANALYSIS_JOB_POLL_SECONDS,
+        lease_seconds: float = settings.ANALYSIS_JOB_LEASE_SECONDS,
+        max_attempts: int = settings.ANALYSIS_JOB_MAX_ATTEMPTS,
+        claim: Callable[[int, float, int], Awaitable[list]] = AsyncAnalysisJobService.claim,
+        finish: Callable[..., Awaitable[bool]] = AsyncAnalysisJobService.finish,
+        retry: Callable[[str, int, float, str], Awaitable[bool]] = AsyncAnalysisJobService.retry,
+        fail_exhausted: Callable[[int], Awaitable[int]] = AsyncAnalysisJobService.fail_exhausted,
+        save_expense: Callable[..., Awaitable[Optional[Expense]]] = AsyncAnalysisJobService.save_expense,
+    ):
+        self.ai_service = ai_service
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._claim = claim
+        self._finish = finish
+        self._retry = retry
+        self._fail_exhausted = fail_exhausted
+        self._save_expense = save_expense
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks: list[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        self._sweeper = asyncio.create_task(self._sweep())
+
+    def notify(self) -> None:
+        """Wake idle workers because a job was just enqueued."""
+        self._wakeup.set()
+
+    async def _next_job(self):
+        try:
+            jobs = await self._claim(1, self.lease_seconds, self.max_attempts)
+        except Exception as e:
+            logger.error("job_claim_failed", extra={'error': str(e)})
+            jobs = []
+        return jobs[0] if jobs else None
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _sweep(self) -> None:
+        # Leases only expire lease_seconds after a claim, so checking more often finds nothing new
+        while not self._stopping:
+            try:
+                failed = await self._fail_exhausted(self.max_attempts)
+            except Exception as e:
+                logger.error("job_sweep_failed", extra={'error': str(e)})
+                failed = 0
+            if failed:
+                ANALYSIS_JOBS.labels("exhausted").inc(failed)
+                logger.warning("jobs_exhausted", extra={'count': failed})
+            await asyncio.sleep(self.lease_seconds)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            job = await self._next_job()
+            if job is None:
+                await self._wait_for_work()
+                continue
+            await self.run_job(job)
+
+    async def run_job(self, job) -> None:
+        """Analyze one claimed job and record its outcome."""
+        if job.created_at is not None:
+            created_at = job.created_at if job.created_at.tzinfo else job.created_at.replace(tzinfo=timezone.utc)
+            ANALYSIS_JOB_WAIT_SECONDS.observe((datetime.now(timezone.utc) - created_at).total_seconds())
+        if job.result is not None:
+            # An earlier attempt saved the expense but lost its lease before recording the outcome
+            recorded = await self._finish(job.id, job.attempts, result=job.result)
+            ANALYSIS_JOBS.labels("succeeded" if recorded else "lease_lost").inc()
+            return
+
+        async def save(expense: ExpenseCreate, source: str) -> Optional[Expense]:
+            return await self._save_expense(job.id, job.attempts, expense, source)
+
+        try:
+            result = await self.ai_service.process_message(job.message, job.user_id, job.idempotency_key, save=save)
+        except Exception as e:
+            logger.exception("job_failed", extra={'job_id': job.id})
+            result = {'error': str(e)}
+
+        try:
+            if 'error' not in result:
+                outcome = "succeeded"
+                recorded = await self._finish(job.id, job.attempts, result=result)
+            elif job.attempts < self.max_attempts and 'retry_after' in result:
+                # The LLM was overloaded; try again once it has room instead of failing the job
+                outcome = "retried"
+                delay = result['retry_after'] + random.uniform(0, 1)
+                recorded = await self._retry(job.id, job.attempts, delay, result['error'])
+            else:
+                outcome = "failed"
+                recorded = await self._finish(job.id, job.attempts, error=result['error'])
+        except Exception as e:
+            # The lease will expire and another worker will pick the job up again
+            logger.error("job_update_failed", extra={'job_id': job.id, 'error': str(e)})
+            return
+        if recorded:
+            ANALYSIS_JOBS.labels(outcome).inc()
+        else:
+            # This run outlived its lease and the job was claimed again (or given up on)
+            ANALYSIS_JOBS.labels("lease_lost").inc()
+            logger.warning("job_lease_lost", extra={'job_id': job.id, 'attempts': job.attempts})
+
+    async def aclose(self, timeout: float = settings.ANALYSIS_JOB_SHUTDOWN_TIMEOUT) -> None:
+        """Stop taking jobs, give running ones `timeout` seconds to finish, then cancel them."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.services.expense_category_service import AsyncExpenseCategoryService
+from app.services.prompts import (
+    build_batch_system_prompt,
+    build_compact_expense_system_prompt,
+    build_expense_system_prompt,
+    build_expense_tool,
+    build_tool_system_prompt,
+)
+
+if TYPE_CHECKING:
+    from langchain_core.messages import SystemMessage
+
+
+@dataclass(frozen=True)
+class CategorySnapshot:
+    """An immutable view of the category catalog and everything derived from it."""
+    names: frozenset[str]
+    as_string: str
+    system_message: "SystemMessage"
+    batch_system_message: "SystemMessage"
+    expense_tool: dict
+    version: str
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def from_names(
+        cls,
+        names: list[str],
+        output_mode: str = settings.LLM_OUTPUT_MODE,
+        compact: bool = settings.LLM_COMPACT_PROMPT,
+    ) -> "CategorySnapshot":
+        from langchain_core.messages import SystemMessage
+
+        as_string = ", ".join(names)
+        if output_mode == "tools":
+            system_prompt = build_tool_system_prompt(compact)
+        elif compact:
+            system_prompt = build_compact_expense_system_prompt(as_string)
+        else:
+            system_prompt = build_expense_system_prompt(as_string)
+        return cls(
+            names=frozenset(names),
+            as_string=as_string,
+            system_message=SystemMessage(content=system_prompt),
+            batch_system_message=SystemMessage(content=build_batch_system_prompt(as_string)),
+            expense_tool=build_expense_tool(names),
+            # Sorted so the version doesn't change with the order the names were loaded in
+            version=hashlib.sha1(", ".join(sorted(names)).encode("utf-8")).hexdigest()[:12],
+        )
+
+
+async def _load_category_names() -> list[str]:
+    return [category.name for category in await AsyncExpenseCategoryService.get_all_categories()]
+
+
+class CategoryCache:
+    """
+    In-process cache of the expense category catalog.
+
+    The catalog is reloaded from the database once the TTL expires or after an
+    explicit invalidation; concurrent callers share a single reload.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = settings.CATEGORY_CACHE_TTL_SECONDS,
+        loader: Callable[[], Awaitable[list[str]]] = _load_category_names,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self._loader = loader
+        self._snapshot: Optional[CategorySnapshot] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self, snapshot: Optional[CategorySnapshot]) -> bool:
+        return snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl_seconds
+
+    async def get(self) -> CategorySnapshot:
+        """Return the cached catalog, reloading it if it is stale."""
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        async with self._lock:
+            if not self._is_fresh(self._snapshot):
+                await self._refresh()
+            return self._snapshot
+
+    async def reload(self) -> CategorySnapshot:
+        """Reload the catalog from the database immediately."""
+        async with self._lock:
+            await self._refresh()
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """Drop the cached catalog so the next caller reloads it."""
+        self._snapshot = None
+
+    async def _refresh(self) -> None:
+        names = await self._loader()
+        self._snapshot = CategorySnapshot.from_names(names)
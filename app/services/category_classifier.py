@@ -0,0 +1,189 @@
+import gzip
+import json
+import math
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from typing import Iterable, Optional
+
+_WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+MODEL_FORMAT_VERSION = 1
+
+
+def _features(text: str, user_id: Optional[int], per_user: bool) -> list[str]:
+    """
+    Word unigrams and bigrams plus character trigrams (which tolerate typos and
+    plurals). A per-user model also gets every word prefixed with the user ID,
+    so a user's own habits ("market" means Food for one user, Other for another)
+    can override the shared weights.
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    features = ["bias"]
+    features.extend(f"w:{word}" for word in words)
+    features.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f"^{word}$"
+        features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    if per_user and user_id is not None:
+        features.extend(f"u{user_id}:w:{word}" for word in words)
+    return features
+
+
+class CategoryClassifier:
+    """
+    Hashed n-gram logistic regression that predicts an expense category from its description.
+
+    Features are hashed into `buckets` slots, so the model only stores weights for
+    slots seen in training. Predicting costs a few dozen dictionary lookups, which
+    makes it cheap enough to try before every LLM call.
+    """
+
+    def __init__(
+        self,
+        categories: list[str],
+        weights: Optional[dict[int, list[float]]] = None,
+        buckets: int = 2 ** 20,
+        per_user: bool = False,
+        metadata: Optional[dict] = None,
+    ):
+        self.categories = categories
+        self.weights = weights if weights is not None else {}
+        self.buckets = buckets
+        self.per_user = per_user
+        self.metadata = metadata or {}
+        self.hits = 0
+        self.misses = 0
+
+    def _hashed(self, text: str, user_id: Optional[int]) -> dict[int, float]:
+        slots = Counter(zlib.crc32(feature.encode("utf-8")) % self.buckets
+                        for feature in _features(text, user_id, self.per_user))
+        norm = math.sqrt(sum(count * count for count in slots.values()))
+        return {slot: count / norm for slot, count in slots.items()}
+
+    def _probabilities(self, features: dict[int, float]) -> list[float]:
+        scores = [0.0] * len(self.categories)
+        for slot, value in features.items():
+            weights = self.weights.get(slot)
+            if weights is not None:
+                for index, weight in enumerate(weights):
+                    scores[index] += weight * value
+        top = max(scores)
+        exponents = [math.exp(score - top) for score in scores]
+        total = sum(exponents)
+        return [exponent / total for exponent in exponents]
+
+    def predict(self, text: str, user_id: Optional[int] = None) -> tuple[str, float]:
+        """Return the most likely category and its probability."""
+        probabilities = self._probabilities(self._hashed(text, user_id))
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.categories[best], probabilities[best]
+
+    @classmethod
+    def train(
+        cls,
+        examples: Iterable[tuple[Optional[int], str, str]],
+        per_user: bool = False,
+        epochs: int = 8,
+        learning_rate: float = 0.5,
+        l2: float = 1e-5,
+        buckets: int = 2 ** 20,
+        seed: int = 0,
+    ) -> "CategoryClassifier":
+        """
+        Fit the model with plain SGD on (user_id, description, category) examples.
+        """
+        examples = list(examples)
+        categories = sorted({category for _, _, category in examples})
+        index_of = {category: index for index, category in enumerate(categories)}
+        model = cls(categories, buckets=buckets, per_user=per_user)
+        rows = [(model._hashed(description, user_id), index_of[category]) for user_id, description, category in examples]
+
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(rows)
+            rate = learning_rate / (1 + epoch)
+            for features, label in rows:
+                probabilities = model._probabilities(features)
+                probabilities[label] -= 1.0
+                for slot, value in features.items():
+                    weights = model.weights.get(slot)
+                    if weights is None:
+                        weights = model.weights[slot] = [0.0] * len(categories)
+                    for index, gradient in enumerate(probabilities):
+                        weights[index] -= rate * (gradient * value + l2 * weights[index])
+
+        model.metadata = {
+            'examples': len(examples),
+            'epochs': epochs,
+            'trained_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        return model
+
+    def save(self, path: str) -> None:
+        """Write the model as gzipped JSON, with weights rounded to 4 decimals."""
+        payload = {
+            'version': MODEL_FORMAT_VERSION,
+            'categories': self.categories,
+            'buckets': self.buckets,
+            'per_user': self.per_user,
+            'metadata': self.metadata,
+            'weights': {str(slot): [round(weight, 4) for weight in weights] for slot, weights in self.weights.items()},
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            json.dump(payload, file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "CategoryClassifier":
+        """
+        Read a model written by save().
+
+        Raises:
+            OSError: If the file can't be read
+            ValueError: If it is not a model this version understands
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            payload = json.load(file)
+        if payload.get('version') != MODEL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported classifier format: {payload.get('version')}")
+        return cls(
+            payload['categories'],
+            weights={int(slot): weights for slot, weights in payload['weights'].items()},
+            buckets=payload['buckets'],
+            per_user=payload['per_user'],
+            metadata=payload.get('metadata'),
+        )
+
+
+def evaluate(
+    classifier: CategoryClassifier,
+    examples: list[tuple[Optional[int], str, str]],
+    min_confidence: float,
+) -> dict:
+    """
+    Score the classifier on labeled examples.
+
+    Returns:
+        Overall accuracy, the share of examples it is confident about (coverage),
+        the accuracy on those, and the mean prediction time in microseconds
+    """
+    correct = confident = confident_correct = 0
+    started = time.perf_counter()
+    for user_id, description, category in examples:
+        predicted, confidence = classifier.predict(description, user_id)
+        correct += predicted == category
+        if confidence >= min_confidence:
+            confident += 1
+            confident_correct += predicted == category
+    elapsed = time.perf_counter() - started
+    total = len(examples) or 1
+    return {
+        'examples': len(examples),
+        'accuracy': correct / total,
+        'min_confidence': min_confidence,
+        'coverage': confident / total,
+        'confident_accuracy': confident_correct / confident if confident else None,
+        'predict_microseconds': elapsed / total * 1e6,
+    }
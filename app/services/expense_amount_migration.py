@@ -0,0 +1,141 @@
+import logging
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal, get_engine
+
+logger = logging.getLogger(__name__)
+
+AMOUNT_TYPE_SQL = text("""
+    SELECT attname, format_type(atttypid, atttypmod)
+    FROM pg_attribute
+    WHERE attrelid = to_regclass('expenses') AND attname IN ('amount', 'amount_numeric') AND NOT attisdropped
+""")
+
+# A shadow column filled by a trigger for new rows and by batched updates for old ones,
+# so the money column keeps serving the running code until the swap
+PREPARE_STEPS = [
+    "ALTER TABLE expenses ADD COLUMN IF NOT EXISTS amount_numeric numeric(14, 2)",
+    """
+    CREATE OR REPLACE FUNCTION expenses_sync_amount_numeric() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.amount_numeric := CAST(NEW.amount AS numeric);
+        RETURN NEW;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS expenses_sync_amount_numeric ON expenses",
+    """
+    CREATE TRIGGER expenses_sync_amount_numeric BEFORE INSERT OR UPDATE OF amount ON expenses
+    FOR EACH ROW EXECUTE FUNCTION expenses_sync_amount_numeric()
+    """,
+]
+
+ID_RANGE_SQL = text("SELECT min(id), max(id) FROM expenses")
+
+# Converting money to numeric happens in the server, so the result doesn't depend on lc_monetary
+BACKFILL_BATCH_SQL = text("""
+    UPDATE expenses SET amount_numeric = CAST(amount AS numeric)
+    WHERE id >= :low AND id < :high AND amount_numeric IS NULL
+""")
+
+# Lets SET NOT NULL skip scanning the table inside the swap transaction
+VALIDATE_STEPS = [
+    "ALTER TABLE expenses DROP CONSTRAINT IF EXISTS expenses_amount_numeric_not_null",
+    "ALTER TABLE expenses ADD CONSTRAINT expenses_amount_numeric_not_null CHECK (amount_numeric IS NOT NULL) NOT VALID",
+    "ALTER TABLE expenses VALIDATE CONSTRAINT expenses_amount_numeric_not_null",
+]
+
+SWAP_STEPS = [
+    "ALTER TABLE expenses ALTER COLUMN amount_numeric SET NOT NULL",
+    "ALTER TABLE expenses DROP CONSTRAINT expenses_amount_numeric_not_null",
+    "DROP TRIGGER expenses_sync_amount_numeric ON expenses",
+    "DROP FUNCTION expenses_sync_amount_numeric()",
+    "ALTER TABLE expenses DROP COLUMN amount",
+    "ALTER TABLE expenses RENAME COLUMN amount_numeric TO amount",
+]
+
+
+class ExpenseAmountMigration:
+    """
+    Online conversion of expenses.amount from MONEY to NUMERIC(14, 2).
+
+    prepare() and backfill() run next to the old code without blocking writes;
+    swap() is a short transaction that replaces the column and must ship together
+    with the code that reads numeric amounts.
+    """
+
+    @staticmethod
+    def amount_type() -> Optional[str]:
+        """The current type of expenses.amount, e.g. 'money' or 'numeric(14,2)'."""
+        db = SessionLocal()
+        try:
+            return dict(db.execute(AMOUNT_TYPE_SQL).fetchall()).get('amount')
+        finally:
+            db.close()
+
+    @staticmethod
+    def prepare() -> None:
+        """Add the numeric shadow column and the trigger that fills it for new rows."""
+        with get_engine().begin() as connection:
+            for step in PREPARE_STEPS:
+                connection.execute(text(step))
+
+    @staticmethod
+    def backfill(
+        batch_size: int = 10000,
+        pause_seconds: float = 0.0,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        """
+        Copy the old amounts into the shadow column, one committed id range at a time,
+        so no transaction holds row locks for long.
+
+        Args:
+            batch_size: Width of each id range
+            pause_seconds: Sleep between batches to leave room for production traffic
+            progress: Called with (rows updated so far, last id done) after every batch
+
+        Returns:
+            The number of rows updated
+        """
+        with get_engine().connect() as connection:
+            low, high = connection.execute(ID_RANGE_SQL).one()
+        if low is None:
+            return 0
+        updated = 0
+        for start in range(low, high + 1, batch_size):
+            with get_engine().begin() as connection:
+                updated += connection.execute(BACKFILL_BATCH_SQL, {'low': start, 'high': start + batch_size}).rowcount
+            if progress is not None:
+                progress(updated, min(start + batch_size - 1, high))
+            if pause_seconds:
+                time.sleep(pause_seconds)
+        logger.info("expense_amounts_backfilled", extra={'rows': updated})
+        return updated
+
+    @staticmethod
+    def validate() -> None:
+        """Check, without blocking writes, that every row has a numeric amount."""
+        with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for step in VALIDATE_STEPS:
+                connection.execute(text(step))
+
+    @staticmethod
+    def swap(lock_timeout_ms: int = 5000) -> None:
+        """Replace the money column with the numeric one; gives up after lock_timeout_ms waiting for the lock."""
+        db = SessionLocal()
+        try:
+            db.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+            db.execute(text("LOCK TABLE expenses IN ACCESS EXCLUSIVE MODE"))
+            for step in SWAP_STEPS:
+                db.execute(text(step))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        logger.info("expense_amounts_converted")
@@ -1,13 +1,15 @@
-from app.core.database import SessionLocal
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal, SessionLocal
 from app.models.expense_category import ExpenseCategory
 
 class ExpenseCategoryService:
     @staticmethod
     def get_all_categories() -> list[ExpenseCategory]:
-        """Get all expense categories from the database."""
+        """Get all expense categories from the database, ordered by name."""
         db = SessionLocal()
         try:
-            return db.query(ExpenseCategory).all()
+            return db.query(ExpenseCategory).order_by(ExpenseCategory.name).all()
         finally:
             db.close()
     
@@ -15,4 +17,20 @@ class ExpenseCategoryService:
     def get_categories_as_string() -> str:
         """Get all expense categories as a comma-separated string."""
         categories = ExpenseCategoryService.get_all_categories()
-        return ", ".join([cat.name for cat in categories]) 
\ No newline at end of file
+        return ", ".join([cat.name for cat in categories])
+
+
+class AsyncExpenseCategoryService:
+    """Async counterpart of ExpenseCategoryService running on the AsyncSession engine."""
+
+    @staticmethod
+    async def get_all_categories() -> list[ExpenseCategory]:
+        """Get all expense categories from the database, ordered by name."""
+        async with AsyncSessionLocal() as db:
+            return list((await db.execute(select(ExpenseCategory).order_by(ExpenseCategory.name))).scalars().all())
+
+    @staticmethod
+    async def get_categories_as_string() -> str:
+        """Get all expense categories as a comma-separated string."""
+        categories = await AsyncExpenseCategoryService.get_all_categories()
+        return ", ".join([cat.name for cat in categories])
@@ -0,0 +1,449 @@
+import asyncio
+import codecs
+import csv
+import io
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Awaitable, Callable, Literal, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.schemas.expense import ExpenseCreate
+from app.services.ai_service import AIService
+from app.services.expense_service import AsyncExpenseService
+
+logger = logging.getLogger(__name__)
+
+EXPENSE_IMPORT_ROWS = metrics.counter("expense_import_rows", "Imported statement rows by outcome", ("outcome",))
+_IMPORTED_ROWS = EXPENSE_IMPORT_ROWS.labels("imported")
+_FAILED_ROWS = EXPENSE_IMPORT_ROWS.labels("failed")
+
+IMPORT_RUNNING = "running"
+IMPORT_SUCCEEDED = "succeeded"
+IMPORT_FAILED = "failed"
+
+# Header names accepted for each field (compared lowercased); the first matching column wins
+COLUMN_ALIASES: dict[str, tuple[str, ...]] = {
+    'description': ("description", "memo", "details", "narrative", "payee", "concept"),
+    'amount': ("amount", "debit", "value"),
+    'category': ("category",),
+    'date': ("date", "transaction date", "booking date", "posted"),
+}
+
+# A currency symbol (optionally prefixed, as in US$ or R$) or an ISO 4217 code
+_CURRENCY = r"(?:[A-Za-z]{0,3}[$€£¥₹₽₩₺₪฿]|[A-Za-z]{3})"
+# Sign and parentheses, then a currency, the number, a currency and a trailing sign, all optional but the number
+# Which sign expenses have in the file; rows with the other sign are credits (income, refunds)
+ExpenseSign = Literal["negative", "positive"]
+
+# Amount columns whose name says they only hold money going out
+DEBIT_COLUMNS = ("debit",)
+
+_AMOUNT_PATTERN = re.compile(
+    rf"(?P<open>\()?\s*(?P<lead_sign>[+-])?\s*(?:{_CURRENCY}\s*)?(?P<inner_sign>[+-])?\s*"
+    rf"(?P<number>\d(?:[\d.,' \u00a0]*\d)?)"
+    rf"\s*(?:{_CURRENCY}\s*)?(?P<trail_sign>[+-])?\s*(?P<close>\))?"
+)
+
+# Keeps import tasks referenced while they run, even if the client stops listening
+_RUNNING_IMPORTS: set[asyncio.Task] = set()
+
+
+def parse_amount(text: str) -> Decimal:
+    """
+    Parse a statement amount such as "-1,234.56", "1.234,56 €", "USD 7" or "(12.30)".
+
+    A currency symbol or code may only lead or trail the number. The sign is kept:
+    a minus sign (before or after the number) or parentheses make the amount negative.
+
+    Raises:
+        ValueError: If the text is not an amount
+    """
+    match = _AMOUNT_PATTERN.fullmatch(text.strip())
+    if match is None or bool(match['open']) != bool(match['close']):
+        raise ValueError(f"Invalid amount: {text!r}")
+    signs = [match[name] for name in ('lead_sign', 'inner_sign', 'trail_sign') if match[name]]
+    if len(signs) > 1 or (signs and match['open']):
+        raise ValueError(f"Invalid amount: {text!r}")
+    negative = bool(match['open']) or signs == ['-']
+
+    cleaned = re.sub(r"[' \u00a0]", "", match['number'])
+    if "," in cleaned and "." in cleaned:
+        # Whichever separator comes last is the decimal one
+        thousands = "," if cleaned.rfind(".") > cleaned.rfind(",") else "."
+        cleaned = cleaned.replace(thousands, "").replace(",", ".")
+    elif re.fullmatch(r"\d+,\d{1,2}", cleaned):
+        cleaned = cleaned.replace(",", ".")
+    else:
+        cleaned = cleaned.replace(",", "")
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {text!r}")
+    return -amount if negative else amount
+
+
+class CsvStreamParser:
+    """
+    Incremental CSV parser: feed it the upload chunk by chunk and get back the
+    records completed so far, with the line each one starts on.
+
+    Only the unfinished tail of the input is kept between chunks. Quoted fields
+    may contain newlines; a record is held back until its closing quote arrives.
+    """
+
+    def __init__(self, max_pending_bytes: int = settings.EXPENSE_IMPORT_MAX_LINE_BYTES):
+        self.max_pending_bytes = max_pending_bytes
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._pending = ""
+        self._lines = 0
+
+    def feed(self, chunk: bytes, final: bool = False) -> list[tuple[int, list[str]]]:
+        """
+        Add the next chunk of the upload (final=True after the last one) and return the completed records.
+
+        Raises:
+            ValueError: If a single record is longer than max_pending_bytes
+        """
+        text = self._pending + self._decoder.decode(chunk, final)
+        if final:
+            cut = len(text)
+        else:
+            cut = position = quotes = 0
+            for line in text.split("\n")[:-1]:
+                position += len(line) + 1
+                quotes += line.count('"')
+                if quotes % 2 == 0:
+                    cut = position
+        self._pending = text[cut:]
+        if len(self._pending) > self.max_pending_bytes:
+            raise ValueError(f"Line {self._lines + 1} is longer than {self.max_pending_bytes} bytes")
+
+        records = []
+        reader = csv.reader(io.StringIO(text[:cut]))
+        start = 0
+        for record in reader:
+            if any(value.strip() for value in record):
+                records.append((self._lines + start + 1, record))
+            start = reader.line_num
+        self._lines += text[:cut].count("\n")
+        return records
+
+    @property
+    def lines_read(self) -> int:
+        """Lines of the upload covered by the records returned so far."""
+        return self._lines
+
+
+@dataclass
+class ImportRow:
+    """A parsed statement line waiting to be categorized and saved."""
+    line: int
+    description: str
+    amount: Decimal
+    category: Optional[str]
+    added_at: Optional[datetime]
+
+
+@dataclass
+class ExpenseImport:
+    """Progress and per-row errors of one statement import."""
+    user_id: int
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = IMPORT_RUNNING
+    rows: int = 0
+    processed: int = 0
+    imported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: list[dict] = field(default_factory=list)
+    errors_truncated: bool = False
+    started_at: float = field(default_factory=time.monotonic)
+    elapsed_seconds: Optional[float] = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def add_error(self, line: int, error: str) -> None:
+        self.failed += 1
+        _FAILED_ROWS.inc()
+        if len(self.errors) < settings.EXPENSE_IMPORT_MAX_ERRORS:
+            self.errors.append({'line': line, 'error': error})
+        else:
+            self.errors_truncated = True
+
+    def report(self) -> dict:
+        return {
+            'import_id': self.id,
+            'status': self.status,
+            'rows': self.rows,
+            'processed': self.processed,
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'errors': list(self.errors),
+            'errors_truncated': self.errors_truncated,
+            'elapsed_seconds': self.elapsed_seconds,
+        }
+
+    @property
+    def done(self) -> bool:
+        """Whether the import has finished, successfully or not."""
+        return self._done.is_set()
+
+    def notify(self) -> None:
+        """Wake progress() readers after a batch was processed."""
+        self._changed.set()
+
+    def finish(self, status: str) -> None:
+        """Record the final status and release wait() and progress()."""
+        self.status = status
+        self.elapsed_seconds = round(time.monotonic() - self.started_at, 3)
+        self._changed.set()
+        self._done.set()
+
+    async def wait(self) -> dict:
+        """Wait for the import to finish and return the final report."""
+        await self._done.wait()
+        return self.report()
+
+    async def progress(self) -> AsyncIterator[dict]:
+        """Yield a report after every saved batch, ending with the final one."""
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            yield self.report()
+            if self._done.is_set():
+                return
+
+
+class ExpenseImporter:
+    """
+    Import a bank statement CSV as expenses.
+
+    Rows are parsed as the upload streams in, in a task of its own so progress can be
+    reported meanwhile, and handed over in batches of `batch_size` to a task that
+    categorizes them (the file's own category, then keywords and the local
+    classifier, then the LLM) and bulk-loads them with COPY.
+    The upload is only read as fast as batches are saved, so memory stays bounded.
+    """
+
+    def __init__(
+        self,
+        ai_service: AIService,
+        batch_size: int = settings.EXPENSE_IMPORT_BATCH_SIZE,
+        copy: Callable[..., Awaitable[int]] = AsyncExpenseService.copy_expenses,
+    ):
+        self.ai_service = ai_service
+        self.batch_size = batch_size
+        self._copy = copy
+
+    @staticmethod
+    def _columns(header: list[str]) -> dict[str, int]:
+        names = [name.strip().lower() for name in header]
+        columns = {}
+        for field_name, aliases in COLUMN_ALIASES.items():
+            for alias in aliases:
+                if alias in names:
+                    columns[field_name] = names.index(alias)
+                    break
+        if 'description' not in columns or 'amount' not in columns:
+            raise ValueError("The CSV header needs a description and an amount column")
+        return columns
+
+    @staticmethod
+    def _parse_row(
+        line: int, record: list[str], columns: dict[str, int], date_format: Optional[str]
+    ) -> ImportRow:
+        def value(name: str) -> str:
+            index = columns.get(name)
+            return record[index].strip() if index is not None and index < len(record) else ""
+
+        description = value('description')
+        if not description:
+            raise ValueError("Missing description")
+        added_at = None
+        if value('date'):
+            try:
+                added_at = (
+                    datetime.strptime(value('date'), date_format) if date_format
+                    else datetime.fromisoformat(value('date'))
+                )
+            except ValueError:
+                raise ValueError(f"Invalid date: {value('date')!r}")
+        return ImportRow(line, description, parse_amount(value('amount')), value('category') or None, added_at)
+
+    @staticmethod
+    async def _records(parser: CsvStreamParser, chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, list[str]]]:
+        async for chunk in chunks:
+            for record in parser.feed(chunk):
+                yield record
+        for record in parser.feed(b"", final=True):
+            yield record
+
+    @staticmethod
+    def _default_expense_sign(header: list[str], columns: dict[str, int]) -> ExpenseSign:
+        """A debit column holds expenses as positive amounts; a signed amount column as negative ones."""
+        return "positive" if header[columns['amount']].strip().lower() in DEBIT_COLUMNS else "negative"
+
+    async def start(
+        self,
+        user_id: int,
+        chunks: AsyncIterator[bytes],
+        date_format: Optional[str] = None,
+        expense_sign: Optional[ExpenseSign] = None,
+    ) -> ExpenseImport:
+        """
+        Read the header of the upload and start importing the rest in the background.
+
+        Returns as soon as the header has been checked, while the upload is still
+        being read, so callers can report progress from the first batch on (see
+        ExpenseImport.wait and ExpenseImport.progress).
+
+        Rows whose amount has the opposite sign of `expense_sign` are credits (income,
+        refunds) and are skipped. By default expenses are negative, unless the amount
+        column is a debit column.
+
+        Raises:
+            ValueError: If the file has no usable header; nothing is imported in that case
+        """
+        job = ExpenseImport(user_id)
+        parser = CsvStreamParser()
+        records = self._records(parser, chunks)
+        async for _, header in records:
+            columns = self._columns(header)
+            break
+        else:
+            raise ValueError("The CSV file is empty")
+        expense_sign = expense_sign or self._default_expense_sign(header, columns)
+
+        reader = asyncio.create_task(self._read(job, parser, records, columns, date_format, expense_sign))
+        _RUNNING_IMPORTS.add(reader)
+        reader.add_done_callback(_RUNNING_IMPORTS.discard)
+        return job
+
+    async def _read(
+        self,
+        job: ExpenseImport,
+        parser: CsvStreamParser,
+        records: AsyncIterator[tuple[int, list[str]]],
+        columns: dict[str, int],
+        date_format: Optional[str],
+        expense_sign: ExpenseSign,
+    ) -> None:
+        batches: asyncio.Queue = asyncio.Queue(maxsize=2)
+        worker: Optional[asyncio.Task] = None
+        batch: list[ImportRow] = []
+
+        async def hand_over(rows: list[ImportRow]) -> None:
+            nonlocal worker
+            if worker is None:
+                worker = asyncio.create_task(self._run(job, batches))
+                _RUNNING_IMPORTS.add(worker)
+                worker.add_done_callback(_RUNNING_IMPORTS.discard)
+            await batches.put(rows)
+
+        try:
+            async for line, record in records:
+                if job.done:
+                    # Saving failed; there is no point in reading the rest of the upload
+                    break
+                job.rows += 1
+                try:
+                    row = self._parse_row(line, record, columns, date_format)
+                except ValueError as e:
+                    job.add_error(line, str(e))
+                    job.processed += 1
+                else:
+                    if row.amount and (row.amount < 0) != (expense_sign == "negative"):
+                        # Money coming in (salary, refunds) is not an expense
+                        job.skipped += 1
+                        job.processed += 1
+                    else:
+                        row.amount = abs(row.amount)
+                        batch.append(row)
+                if len(batch) >= self.batch_size:
+                    await hand_over(batch)
+                    batch = []
+        except ValueError as e:
+            # A broken line past the header: keep what was read, report the rest as failed
+            job.add_error(parser.lines_read + 1, f"{e}; the rest of the file was not read")
+        except BaseException as e:
+            # The upload broke off (e.g. the client disconnected); batches already saved stay saved
+            if worker is not None:
+                worker.cancel()
+            logger.warning("expense_import_upload_failed", extra={'import_id': job.id, 'error': repr(e)})
+            job.finish(IMPORT_FAILED)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        if batch and not job.done:
+            await hand_over(batch)
+        if worker is None:
+            job.finish(IMPORT_SUCCEEDED)
+        else:
+            await batches.put(None)
+
+    async def _run(self, job: ExpenseImport, batches: asyncio.Queue) -> None:
+        try:
+            while (rows := await batches.get()) is not None:
+                await self._import_batch(job, rows)
+                job.notify()
+        except Exception:
+            logger.exception("expense_import_failed", extra={'import_id': job.id})
+            job.finish(IMPORT_FAILED)
+            # Keep taking batches until the end marker, so the reader never blocks on a full queue
+            while await batches.get() is not None:
+                pass
+            return
+        logger.info("expense_import_finished", extra={
+            'import_id': job.id, 'rows': job.rows, 'imported': job.imported, 'failed': job.failed,
+        })
+        job.finish(IMPORT_SUCCEEDED)
+
+    async def _import_batch(self, job: ExpenseImport, rows: list[ImportRow]) -> None:
+        categories = await self.ai_service.category_cache.get()
+        by_lower_name = {name.lower(): name for name in categories.names}
+        for row in rows:
+            row.category = by_lower_name.get(row.category.lower()) if row.category else None
+
+        uncategorized = [row for row in rows if row.category is None]
+        if uncategorized:
+            answers = await self.ai_service.categorize(
+                [f"{row.description} {row.amount}" for row in uncategorized], job.user_id
+            )
+            for row, answer in zip(uncategorized, answers):
+                if 'error' in answer:
+                    job.add_error(row.line, answer['error'])
+                else:
+                    row.category = answer['category']
+
+        ready = []
+        for row in rows:
+            if row.category is None:
+                continue
+            try:
+                ready.append((row, ExpenseCreate(
+                    user_id=job.user_id,
+                    description=row.description,
+                    amount=row.amount,
+                    category=row.category,
+                )))
+            except ValueError as e:
+                job.add_error(row.line, str(e))
+        if ready:
+            try:
+                await self._copy([expense for _, expense in ready], [row.added_at for row, _ in ready])
+            except Exception as e:
+                logger.error("expense_import_batch_failed", extra={'import_id': job.id, 'error': str(e)})
+                for row, _ in ready:
+                    job.add_error(row.line, 'Failed to save expense')
+            else:
+                job.imported += len(ready)
+                _IMPORTED_ROWS.inc(len(ready))
+        job.processed += len(rows)
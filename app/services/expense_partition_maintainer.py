@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.expense_partition_service import ExpensePartitionService
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionMaintainer:
+    """
+    Creates the upcoming monthly partitions of expenses at startup and then every
+    `interval` seconds, so inserts never arrive for a month without a partition.
+    Every worker process runs one; an advisory lock serializes them.
+    """
+
+    def __init__(
+        self,
+        months_ahead: int = settings.EXPENSE_PARTITION_MONTHS_AHEAD,
+        interval: float = settings.EXPENSE_PARTITION_CHECK_SECONDS,
+        ensure: Callable[[int], list[str]] = ExpensePartitionService.ensure_partitions,
+    ):
+        self.months_ahead = months_ahead
+        self.interval = interval
+        self._ensure = ensure
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the maintenance task on the running event loop."""
+        self._task = asyncio.create_task(self._run())
+
+    async def run_once(self) -> list[str]:
+        """Create missing partitions now; returns their names (none if the database is unreachable)."""
+        try:
+            return await run_in_threadpool(self._ensure, self.months_ahead)
+        except Exception as e:
+            logger.error("expense_partition_maintenance_failed", extra={'error': str(e)})
+            return []
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    async def aclose(self) -> None:
+        """Stop the maintenance task."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
@@ -0,0 +1,267 @@
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal, get_engine
+
+logger = logging.getLogger(__name__)
+
+# Held while partitions are created or attached, so concurrent workers don't race on the same month
+PARTITION_LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext('expense_partitions'))")
+
+IS_PARTITIONED_SQL = text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('expenses')")
+
+LIST_PARTITIONS_SQL = text("""
+    SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+    FROM pg_inherits
+    JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = to_regclass('expenses')
+""")
+
+LEGACY_TABLE = "expenses_legacy"
+
+# Steps that only take light locks and may run for a while on a large table. The CHECK constraint
+# lets ATTACH PARTITION skip scanning the old rows; the indexes match the partitioned table's, so
+# ATTACH adopts them instead of building new ones under an exclusive lock.
+PREPARE_CONVERSION_STEPS = [
+    "ALTER TABLE expenses DROP CONSTRAINT IF EXISTS expenses_before_partitioning",
+    "ALTER TABLE expenses ADD CONSTRAINT expenses_before_partitioning CHECK (added_at < '{cutover}') NOT VALID",
+    "ALTER TABLE expenses VALIDATE CONSTRAINT expenses_before_partitioning",
+    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS expenses_legacy_id_added_at_key ON expenses (id, added_at)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS expenses_legacy_added_at_brin ON expenses USING brin (added_at)",
+]
+
+# The swap itself: one short transaction under an exclusive lock
+SWAP_CONVERSION_STEPS = [
+    f"ALTER TABLE expenses RENAME TO {LEGACY_TABLE}",
+    # A partition's primary key has to include the partition key too
+    f"ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT expenses_pkey, "
+    "ADD CONSTRAINT expenses_legacy_pkey PRIMARY KEY USING INDEX expenses_legacy_id_added_at_key",
+    "ALTER INDEX IF EXISTS ix_expenses_id RENAME TO expenses_legacy_id_idx",
+    "ALTER INDEX IF EXISTS ix_expenses_user_id_added_at RENAME TO expenses_legacy_user_id_added_at_idx",
+    f"CREATE TABLE expenses (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (added_at)",
+    "ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id",
+    "ALTER TABLE expenses ADD CONSTRAINT expenses_pkey PRIMARY KEY (id, added_at)",
+    "ALTER TABLE expenses ADD CONSTRAINT expenses_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)",
+    "CREATE INDEX ix_expenses_id ON expenses (id)",
+    "CREATE INDEX ix_expenses_user_id_added_at ON expenses (user_id, added_at, id)",
+    "CREATE INDEX ix_expenses_added_at_brin ON expenses USING brin (added_at)",
+    f"ALTER TABLE expenses ATTACH PARTITION {LEGACY_TABLE} FOR VALUES FROM (MINVALUE) TO ('{{cutover}}')",
+]
+
+# Archived expenses drop out of listings, so every user's cached reads are invalidated
+BUMP_ALL_DATA_VERSIONS_SQL = text("UPDATE users SET data_version = data_version + 1")
+
+_BOUND_PATTERN = re.compile(r"FROM \((?:MINVALUE|'([^']+)')\) TO \((?:MAXVALUE|'([^']+)')\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+    """A partition of expenses and its added_at range (None = unbounded)."""
+    name: str
+    start: Optional[datetime]
+    end: Optional[datetime]
+
+
+def month_start(day: date, months_later: int = 0) -> datetime:
+    """Midnight UTC on the first of the month `months_later` months after `day`'s month."""
+    month = day.year * 12 + day.month - 1 + months_later
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(start: datetime) -> str:
+    """Name of the monthly partition starting at `start`, e.g. expenses_y2024m03."""
+    return f"expenses_y{start.year:04d}m{start.month:02d}"
+
+
+def parse_partition_bound(name: str, bound: str) -> Partition:
+    """Read a partition's range from pg_get_expr(relpartbound)."""
+    match = _BOUND_PATTERN.search(bound)
+    if match is None:
+        raise ValueError(f"Unexpected partition bound for {name}: {bound}")
+    start, end = (
+        datetime.fromisoformat(value).astimezone(timezone.utc) if value else None for value in match.groups()
+    )
+    return Partition(name, start, end)
+
+
+def missing_partitions(existing: list[Partition], today: date, months_ahead: int) -> list[Partition]:
+    """
+    Monthly partitions to create so that every month from today's through
+    `months_ahead` months later has one. Months already covered by a partition
+    (including the converted table, which holds everything before the cutover)
+    are skipped.
+    """
+    missing = []
+    for offset in range(months_ahead + 1):
+        start, end = month_start(today, offset), month_start(today, offset + 1)
+        overlaps = any(
+            (partition.start is None or partition.start < end) and (partition.end is None or start < partition.end)
+            for partition in existing
+        )
+        if not overlaps:
+            missing.append(Partition(partition_name(start), start, end))
+    return missing
+
+
+def partitions_to_archive(existing: list[Partition], before: datetime) -> list[Partition]:
+    """Partitions holding only expenses older than `before`, oldest first."""
+    old = [partition for partition in existing if partition.end is not None and partition.end <= before]
+    return sorted(old, key=lambda partition: partition.end)
+
+
+class ExpensePartitionService:
+    """Monthly range partitioning of the expenses table on added_at."""
+
+    @staticmethod
+    def _quote(identifier: str) -> str:
+        return get_engine().dialect.identifier_preparer.quote(identifier)
+
+    @staticmethod
+    def is_partitioned() -> bool:
+        """Whether expenses is a partitioned table (see convert())."""
+        db = SessionLocal()
+        try:
+            return bool(db.execute(IS_PARTITIONED_SQL).scalar())
+        finally:
+            db.close()
+
+    @staticmethod
+    def list_partitions() -> list[Partition]:
+        """The partitions currently attached to expenses, oldest first."""
+        db = SessionLocal()
+        try:
+            partitions = [parse_partition_bound(name, bound) for name, bound in db.execute(LIST_PARTITIONS_SQL)]
+        finally:
+            db.close()
+        return sorted(partitions, key=lambda partition: partition.start or datetime.min.replace(tzinfo=timezone.utc))
+
+    @staticmethod
+    def ensure_partitions(months_ahead: int, today: Optional[date] = None) -> list[str]:
+        """
+        Create the monthly partitions for this month and the next `months_ahead` months
+        that don't exist yet. Safe to run from several processes at once.
+
+        Returns:
+            The names of the partitions that were created
+
+        Raises:
+            ValueError: If expenses is not partitioned (see convert())
+        """
+        today = today or datetime.now(timezone.utc).date()
+        db = SessionLocal()
+        try:
+            if not db.execute(IS_PARTITIONED_SQL).scalar():
+                raise ValueError("expenses is not partitioned; run python -m app.commands.partition_expenses convert")
+            db.execute(PARTITION_LOCK_SQL)
+            existing = [parse_partition_bound(name, bound) for name, bound in db.execute(LIST_PARTITIONS_SQL)]
+            missing = missing_partitions(existing, today, months_ahead)
+            for partition in missing:
+                # BRIN and the listing index are inherited from the partitioned table
+                db.execute(text(
+                    f"CREATE TABLE {partition.name} PARTITION OF expenses "
+                    f"FOR VALUES FROM ('{partition.start.isoformat()}') TO ('{partition.end.isoformat()}')"
+                ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if missing:
+            logger.info("expense_partitions_created", extra={'partitions': [partition.name for partition in missing]})
+        return [partition.name for partition in missing]
+
+    @staticmethod
+    def convert(months_ahead: int, lock_timeout_ms: int = 5000, today: Optional[date] = None) -> datetime:
+        """
+        Turn the plain expenses table into a partitioned one without copying rows.
+
+        The existing table becomes the partition for everything before the cutover
+        (the first of the month after next); monthly partitions start there. The
+        slow steps (validating a CHECK constraint, building indexes concurrently) run
+        first without blocking writes; the swap itself is a short transaction that
+        gives up after lock_timeout_ms if it can't get the table lock.
+
+        Returns:
+            The cutover time
+
+        Raises:
+            ValueError: If expenses is already partitioned
+        """
+        if ExpensePartitionService.is_partitioned():
+            raise ValueError("expenses is already partitioned")
+        cutover = month_start(today or datetime.now(timezone.utc).date(), 2)
+
+        with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for step in PREPARE_CONVERSION_STEPS:
+                connection.execute(text(step.format(cutover=cutover.isoformat())))
+
+        db = SessionLocal()
+        try:
+            db.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+            db.execute(PARTITION_LOCK_SQL)
+            db.execute(text("LOCK TABLE expenses IN ACCESS EXCLUSIVE MODE"))
+            for step in SWAP_CONVERSION_STEPS:
+                db.execute(text(step.format(cutover=cutover.isoformat())))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        logger.info("expenses_partitioned", extra={'cutover': cutover.isoformat()})
+        ExpensePartitionService.ensure_partitions(months_ahead)
+        return cutover
+
+    @staticmethod
+    def archive(
+        before: datetime,
+        schema: Optional[str] = "archive",
+        tablespace: Optional[str] = None,
+        drop: bool = False,
+        lock_timeout_ms: int = 5000,
+    ) -> list[str]:
+        """
+        Detach the partitions that only hold expenses older than `before`.
+
+        Detached partitions are dropped, or kept as plain tables (moved to `schema`
+        and/or rewritten into a cheaper `tablespace`) outside every query path.
+        Daily rollups are left alone, so summaries still cover archived months; every
+        user's data version is bumped, so cached listings are recomputed.
+
+        Returns:
+            The names of the detached partitions
+        """
+        partitions = partitions_to_archive(ExpensePartitionService.list_partitions(), before)
+        quote = ExpensePartitionService._quote
+        if schema and not drop:
+            with get_engine().begin() as connection:
+                connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {quote(schema)}"))
+        for partition in partitions:
+            db = SessionLocal()
+            try:
+                db.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+                db.execute(text(f"ALTER TABLE expenses DETACH PARTITION {quote(partition.name)}"))
+                if drop:
+                    db.execute(text(f"DROP TABLE {quote(partition.name)}"))
+                elif schema:
+                    db.execute(text(f"ALTER TABLE {quote(partition.name)} SET SCHEMA {quote(schema)}"))
+                db.execute(BUMP_ALL_DATA_VERSIONS_SQL)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            if tablespace and not drop:
+                # Rewrites the table, so it runs after the detach has released the lock on expenses
+                qualified = f"{quote(schema)}.{quote(partition.name)}" if schema else quote(partition.name)
+                with get_engine().begin() as connection:
+                    connection.execute(text(f"ALTER TABLE {qualified} SET TABLESPACE {quote(tablespace)}"))
+            logger.info("expense_partition_archived", extra={'partition': partition.name, 'dropped': drop})
+        return [partition.name for partition in partitions]
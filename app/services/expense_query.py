@@ -0,0 +1,66 @@
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import Integer, Numeric, bindparam, select, tuple_
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from sqlalchemy.sql import Select
+
+from app.models.expense import Expense
+from app.schemas.expense_filter import ExpenseFilter
+
+_NO_FILTERS = (False,) * len(ExpenseFilter.FIELDS)
+
+
+def filter_shape(filters: Optional[ExpenseFilter]) -> tuple[bool, ...]:
+    """The shape of an optional filter; no filter has the all-False shape."""
+    return filters.shape() if filters else _NO_FILTERS
+
+
+@lru_cache(maxsize=4 * 2 ** len(ExpenseFilter.FIELDS))
+def expense_query(shape: tuple[bool, ...], keyset: bool = False, limited: bool = False) -> Select:
+    """
+    Newest-first query on a user's expenses with a bound parameter for every active filter.
+
+    Statements are built once per filter shape, so the SQL text (and the server-side
+    prepared statement psycopg creates for it) is reused no matter what values are bound.
+
+    Args:
+        shape: The filter shape, see ExpenseFilter.shape()
+        keyset: Continue after (:cursor_added_at, :cursor_id)
+        limited: Apply LIMIT :limit
+    """
+    has_start, has_end, has_category, has_min, has_max = shape
+    query = select(Expense.__table__).where(Expense.user_id == bindparam("user_id"))
+    if has_start:
+        query = query.where(Expense.added_at >= bindparam("start_date"))
+    if has_end:
+        query = query.where(Expense.added_at <= bindparam("end_date"))
+    if has_category:
+        query = query.where(Expense.category == bindparam("category"))
+    if has_min:
+        query = query.where(Expense.amount >= bindparam("min_amount", type_=Numeric))
+    if has_max:
+        query = query.where(Expense.amount <= bindparam("max_amount", type_=Numeric))
+    if keyset:
+        query = query.where(
+            tuple_(Expense.added_at, Expense.id) < tuple_(bindparam("cursor_added_at"), bindparam("cursor_id")),
+            # Implied by the row comparison, but only a plain bound lets PostgreSQL skip newer partitions
+            Expense.added_at <= bindparam("cursor_added_at"),
+        )
+    query = query.order_by(Expense.added_at.desc(), Expense.id.desc())
+    if limited:
+        query = query.limit(bindparam("limit", type_=Integer))
+    return query
+
+
+def expense_query_params(user_id: int, filters: Optional[ExpenseFilter]) -> dict:
+    """Bind parameters for expense_query()."""
+    params = filters.to_sql_params() if filters else {}
+    params['user_id'] = user_id
+    return params
+
+
+@lru_cache(maxsize=2 ** len(ExpenseFilter.FIELDS))
+def expense_sql(shape: tuple[bool, ...]) -> str:
+    """The PostgreSQL text of expense_query(shape), with :named placeholders."""
+    return str(expense_query(shape).compile(dialect=PGDialect(paramstyle="named")))
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.request_dedup import SingleFlight
+from app.services.user_service import AsyncUserService
+
+logger = logging.getLogger(__name__)
+
+EXPENSE_READ_CACHE = metrics.counter(
+    "expense_read_cache", "Expense reads by cache outcome (hit, miss, not_modified, bypass)", ("result",)
+)
+_HITS = EXPENSE_READ_CACHE.labels("hit")
+_MISSES = EXPENSE_READ_CACHE.labels("miss")
+_NOT_MODIFIED = EXPENSE_READ_CACHE.labels("not_modified")
+_BYPASSED = EXPENSE_READ_CACHE.labels("bypass")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison, as RFC 9110 requires for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class ExpenseReadCache:
+    """
+    In-process LRU of serialized expense query results.
+
+    Entries are keyed by (user_id, query) and tagged with the user's data version,
+    which every write to the user's expenses bumps in the database (see
+    users.data_version), so all worker processes agree on when an entry is stale.
+    A read costs one primary-key lookup of the version; the query and the
+    serialization only run when the version moved. Memory is bounded by the total
+    size of the cached bodies. Misses for the same query that arrive together
+    share one execution.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = settings.EXPENSE_READ_CACHE_MAX_BYTES,
+        get_version: Callable[[int], Awaitable[int]] = AsyncUserService.get_data_version,
+    ):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._get_version = get_version
+        self._entries: OrderedDict[tuple[int, Hashable], tuple[int, bytes]] = OrderedDict()
+        self._single_flight = SingleFlight()
+
+    async def version(self, user_id: int) -> Optional[int]:
+        """The user's current data version, or None if it can't be read (reads then skip the cache)."""
+        try:
+            return await self._get_version(user_id)
+        except SQLAlchemyError as e:
+            _BYPASSED.inc()
+            logger.warning("expense_read_version_failed", extra={'user_id': user_id, 'error': str(e)})
+            return None
+
+    @staticmethod
+    def etag(user_id: int, version: int, query: Hashable) -> str:
+        """Entity tag of a query's result at a data version."""
+        digest = hashlib.blake2b(repr((user_id, query)).encode(), digest_size=8).hexdigest()
+        return f'"{version}-{digest}"'
+
+    def not_modified(self) -> None:
+        """Count a conditional read answered with 304."""
+        _NOT_MODIFIED.inc()
+
+    def get(self, user_id: int, version: int, query: Hashable) -> Optional[bytes]:
+        """The cached body of a query at this data version, if any."""
+        entry = self._entries.get((user_id, query))
+        if entry is None or entry[0] != version:
+            _MISSES.inc()
+            return None
+        self._entries.move_to_end((user_id, query))
+        _HITS.inc()
+        return entry[1]
+
+    def put(self, user_id: int, version: int, query: Hashable, body: bytes) -> None:
+        """Cache a query's body computed at `version`, replacing what was cached for an older one."""
+        key = (user_id, query)
+        previous = self._entries.get(key)
+        if previous is not None and previous[0] > version:
+            return
+        if len(body) > self.max_bytes // 8:
+            # One huge page would evict everything else
+            return
+        if previous is not None:
+            self.size -= len(previous[1])
+        self._entries[key] = (version, body)
+        self._entries.move_to_end(key)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    async def get_or_load(
+        self, user_id: int, version: int, query: Hashable, load: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """The body of a query at `version`, from the cache or computed by `load` (and cached)."""
+        body = self.get(user_id, version, query)
+        if body is not None:
+            return body
+
+        async def fill() -> bytes:
+            loaded = await load()
+            self.put(user_id, version, query, loaded)
+            return loaded
+
+        return await self._single_flight.run((user_id, version, query), fill)
+
+    def __len__(self) -> int:
+        return len(self._entries)
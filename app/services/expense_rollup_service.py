@@ -0,0 +1,111 @@
+from datetime import date
+from typing import Literal, Optional
+
+from sqlalchemy import Date, cast, func, literal_column, select, text
+
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.expense_rollup import ExpenseDailyRollup
+
+SummaryGrouping = Literal["day", "week", "month", "category"]
+
+REBUILD_ROLLUPS_SQL = """
+    INSERT INTO expense_daily_rollups (user_id, category, day, total, count)
+    SELECT user_id, category, CAST(added_at AT TIME ZONE 'UTC' AS date), SUM(amount), COUNT(*)
+    FROM expenses
+    {where}
+    GROUP BY 1, 2, 3
+"""
+
+# Rebuilt totals may differ from what cached summaries were computed from
+BUMP_DATA_VERSIONS_SQL = "UPDATE users SET data_version = data_version + 1 {where}"
+
+
+class ExpenseRollupService:
+    @staticmethod
+    def rebuild(user_id: Optional[int] = None) -> int:
+        """
+        Recompute the daily rollups from the expenses table.
+        
+        Inserts are blocked while the rebuild runs so no expense is counted twice or missed.
+        
+        Args:
+            user_id: Only rebuild this user's rollups; all users if None
+            
+        Returns:
+            The number of rollup rows written
+        """
+        db = SessionLocal()
+        try:
+            db.execute(text("LOCK TABLE expenses IN SHARE MODE"))
+            params = {}
+            where = ""
+            if user_id is not None:
+                params['user_id'] = user_id
+                where = "WHERE user_id = :user_id"
+                db.execute(text("DELETE FROM expense_daily_rollups WHERE user_id = :user_id"), params)
+            else:
+                db.execute(text("DELETE FROM expense_daily_rollups"))
+            result = db.execute(text(REBUILD_ROLLUPS_SQL.format(where=where)), params)
+            db.execute(text(BUMP_DATA_VERSIONS_SQL.format(where="WHERE id = :user_id" if where else "")), params)
+            db.commit()
+            return result.rowcount
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class AsyncExpenseRollupService:
+    @staticmethod
+    def _bucket(group_by: SummaryGrouping):
+        if group_by == "category":
+            return ExpenseDailyRollup.category
+        if group_by == "day":
+            return ExpenseDailyRollup.day
+        # Inline the unit so SELECT and GROUP BY render the identical expression
+        unit = literal_column({"week": "'week'", "month": "'month'"}[group_by])
+        return cast(func.date_trunc(unit, ExpenseDailyRollup.day), Date)
+
+    @staticmethod
+    async def summarize(
+        user_id: int,
+        group_by: SummaryGrouping = "month",
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category: Optional[str] = None
+    ) -> list[dict]:
+        """
+        Sum a user's spending from the daily rollups.
+        
+        Args:
+            user_id: The ID of the user
+            group_by: Bucket totals by day, week, month or category
+            start_date: First day to include (UTC)
+            end_date: Last day to include (UTC)
+            category: Only include this category
+            
+        Returns:
+            One dictionary per bucket with its key, total and number of expenses, ordered by key
+        """
+        bucket = AsyncExpenseRollupService._bucket(group_by).label("bucket")
+        query = (
+            select(bucket, func.sum(ExpenseDailyRollup.total), func.sum(ExpenseDailyRollup.count))
+            .where(ExpenseDailyRollup.user_id == user_id)
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+        if start_date:
+            query = query.where(ExpenseDailyRollup.day >= start_date)
+        if end_date:
+            query = query.where(ExpenseDailyRollup.day <= end_date)
+        if category:
+            query = query.where(ExpenseDailyRollup.category == category)
+        
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query)).fetchall()
+        
+        return [
+            {'key': str(key), 'total': float(total or 0), 'count': int(count or 0)}
+            for key, total, count in rows
+        ]
@@ -1,13 +1,78 @@
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List, Tuple
 from contextlib import contextmanager
-from app.core.database import SessionLocal
+import base64
+import json
+import logging
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
 from app.models.expense import Expense
 from app.schemas.expense import ExpenseCreate
 from app.schemas.expense_filter import ExpenseFilter
-from datetime import datetime
-from sqlalchemy import text
+from app.services.expense_query import expense_query, expense_query_params, expense_sql, filter_shape
+from datetime import datetime, timezone
+from sqlalchemy import select, text
 from sqlalchemy.exc import SQLAlchemyError
 
+logger = logging.getLogger(__name__)
+
+# Folds freshly inserted rows (the "inserted" CTE) into the daily rollups and bumps their
+# users' data versions (invalidating cached reads) in the same statement
+UPDATE_ROLLUPS_SQL = """
+    rollup AS (
+        INSERT INTO expense_daily_rollups (user_id, category, day, total, count)
+        SELECT user_id, category, CAST(added_at AT TIME ZONE 'UTC' AS date), SUM(amount), COUNT(*)
+        FROM inserted
+        GROUP BY 1, 2, 3
+        ON CONFLICT (user_id, category, day) DO UPDATE
+        SET total = expense_daily_rollups.total + EXCLUDED.total,
+            count = expense_daily_rollups.count + EXCLUDED.count
+    ),
+    versions AS (
+        UPDATE users SET data_version = data_version + 1
+        WHERE id IN (SELECT user_id FROM inserted)
+    )
+"""
+
+# Raw SQL so the insert and the rollup update are one statement
+INSERT_EXPENSE_SQL = text(f"""
+    WITH inserted AS (
+        INSERT INTO expenses (user_id, description, amount, category, added_at)
+        VALUES (:user_id, :description, :amount, :category, :added_at)
+        RETURNING *
+    ), {UPDATE_ROLLUPS_SQL}
+    SELECT * FROM inserted
+""")
+
+
+# Adds COPY-loaded expenses to the daily rollups (COPY has no RETURNING to feed UPDATE_ROLLUPS_SQL)
+UPSERT_ROLLUPS_SQL = text("""
+    INSERT INTO expense_daily_rollups (user_id, category, day, total, count)
+    VALUES (:user_id, :category, :day, :total, :count)
+    ON CONFLICT (user_id, category, day) DO UPDATE
+    SET total = expense_daily_rollups.total + EXCLUDED.total,
+        count = expense_daily_rollups.count + EXCLUDED.count
+""")
+
+BUMP_DATA_VERSIONS_SQL = text("UPDATE users SET data_version = data_version + 1 WHERE id = ANY(:user_ids)")
+
+COPY_EXPENSES_SQL = "COPY expenses (user_id, description, amount, category, added_at) FROM STDIN"
+
+
+def encode_expense_cursor(expense: Expense) -> str:
+    """Encode the (added_at, id) keyset position of an expense as an opaque cursor."""
+    raw = json.dumps([expense.added_at.isoformat(), expense.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_expense_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_expense_cursor; raises ValueError if it is malformed."""
+    try:
+        added_at, expense_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(added_at), int(expense_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
 class ExpenseService:
     @staticmethod
     @contextmanager
@@ -20,11 +85,73 @@ class ExpenseService:
             db.close()
 
     @staticmethod
-    def _parse_money_amount(amount_str: str) -> float:
-        """Convert a money string to float by removing currency symbol and parsing."""
-        if isinstance(amount_str, (int, float)):
-            return float(amount_str)
-        return float(amount_str.replace('$', '').replace(',', ''))
+    def _row_to_expense(row) -> Expense:
+        """Convert a RETURNING row into a detached Expense model instance (psycopg decodes amounts to Decimal)."""
+        return Expense(
+            id=row.id,
+            user_id=row.user_id,
+            description=row.description,
+            amount=row.amount,
+            category=row.category,
+            added_at=row.added_at
+        )
+
+    @staticmethod
+    def _insert_params(expense: ExpenseCreate) -> dict:
+        """Bind parameters for INSERT_EXPENSE_SQL."""
+        return {
+            'user_id': expense.user_id,
+            'description': expense.description,
+            'amount': expense.amount,
+            'category': expense.category,
+            'added_at': datetime.utcnow()
+        }
+
+    @staticmethod
+    def _build_insert_many(expenses: List[ExpenseCreate]):
+        """
+        Build a single multi-row INSERT ... RETURNING statement (rollups included) and its bind parameters.
+        
+        RETURNING gives no ordering guarantee, so each input row carries its position (ord)
+        and the inserted rows are matched back to it on their values; rows with identical
+        values are interchangeable, so the nth copy is matched to the nth input. The result
+        comes back in input order.
+        """
+        values_sql = []
+        params = {'added_at': datetime.utcnow()}
+        for i, expense in enumerate(expenses):
+            values_sql.append(
+                f"({i}, CAST(:user_id_{i} AS INTEGER), CAST(:description_{i} AS VARCHAR), "
+                f"CAST(:amount_{i} AS NUMERIC(14, 2)), CAST(:category_{i} AS VARCHAR))"
+            )
+            params[f'user_id_{i}'] = expense.user_id
+            params[f'description_{i}'] = expense.description
+            params[f'amount_{i}'] = expense.amount
+            params[f'category_{i}'] = expense.category
+        
+        sql = text(f"""
+            WITH wanted (ord, user_id, description, amount, category) AS (
+                VALUES {", ".join(values_sql)}
+            ), inserted AS (
+                INSERT INTO expenses (user_id, description, amount, category, added_at)
+                SELECT user_id, description, amount, category, CAST(:added_at AS TIMESTAMPTZ) FROM wanted
+                RETURNING *
+            ), {UPDATE_ROLLUPS_SQL}
+            SELECT saved.id, saved.user_id, saved.description, saved.amount, saved.category, saved.added_at
+            FROM (
+                SELECT inserted.*, row_number() OVER (
+                    PARTITION BY user_id, description, amount, category ORDER BY id
+                ) AS copy FROM inserted
+            ) AS saved
+            JOIN (
+                SELECT wanted.*, row_number() OVER (
+                    PARTITION BY user_id, description, amount, category ORDER BY ord
+                ) AS copy FROM wanted
+            ) AS input
+            USING (user_id, description, amount, category, copy)
+            ORDER BY input.ord
+        """)
+        return sql, params
 
     @staticmethod
     def create_expense(expense: ExpenseCreate) -> Optional[Expense]:
@@ -39,51 +166,61 @@ class ExpenseService:
         """
         with ExpenseService.get_db_session() as db:
             try:
-                # Set isolation level for money transactions
-                db.execute(text("SET TRANSACTION ISOLATION LEVEL SERIALIZABLE"))
+                # The rollup upsert is an atomic row update, so READ COMMITTED is enough; under
+                # SERIALIZABLE two concurrent inserts for the same rollup row would fail with 40001
+                db.execute(text("SET TRANSACTION ISOLATION LEVEL READ COMMITTED"))
                 
-                # Use raw SQL to properly handle money type
-                sql = text("""
-                    INSERT INTO expenses (user_id, description, amount, category, added_at)
-                    VALUES (:user_id, :description, CAST(:amount AS money), :category, :added_at)
-                    RETURNING *
-                """)
-                result = db.execute(
-                    sql,
-                    {
-                        'user_id': expense.user_id,
-                        'description': expense.description,
-                        'amount': str(expense.amount),  # Convert float to string for casting
-                        'category': expense.category,
-                        'added_at': datetime.utcnow()
-                    }
-                )
+                result = db.execute(INSERT_EXPENSE_SQL, ExpenseService._insert_params(expense))
                 
                 # Convert the result to an Expense model instance
                 row = result.fetchone()
                 if row:
-                    # Parse the money amount back to float
-                    amount = ExpenseService._parse_money_amount(row.amount)
-                    expense_obj = Expense(
-                        id=row.id,
-                        user_id=row.user_id,
-                        description=row.description,
-                        amount=amount,  # Use the parsed float value
-                        category=row.category,
-                        added_at=row.added_at
-                    )
+                    expense_obj = ExpenseService._row_to_expense(row)
                     db.commit()
                     return expense_obj
                 return None
             except SQLAlchemyError as e:
                 db.rollback()
-                print(f"Database error: {str(e)}")
+                logger.error("database_error", extra={'error': str(e)})
                 return None
             except Exception as e:
                 db.rollback()
-                print(f"Unexpected error: {str(e)}")
+                logger.exception("unexpected_database_error")
                 return None
 
+    @staticmethod
+    def create_expenses(expenses: List[ExpenseCreate]) -> List[Expense]:
+        """
+        Create several expenses with a single multi-row INSERT in one transaction.
+        
+        Args:
+            expenses: The expense data to create
+            
+        Returns:
+            The created expenses in input order, or an empty list if the insert failed
+        """
+        if not expenses:
+            return []
+        
+        with ExpenseService.get_db_session() as db:
+            try:
+                # A blind multi-row insert reads nothing, so READ COMMITTED is enough and
+                # avoids serialization failures when many groups commit concurrently
+                db.execute(text("SET TRANSACTION ISOLATION LEVEL READ COMMITTED"))
+                
+                sql, params = ExpenseService._build_insert_many(expenses)
+                rows = db.execute(sql, params).fetchall()
+                db.commit()
+                return [ExpenseService._row_to_expense(row) for row in rows]
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error("database_error", extra={'error': str(e)})
+                return []
+            except Exception as e:
+                db.rollback()
+                logger.exception("unexpected_database_error")
+                return []
+
     @staticmethod
     def get_expenses_by_user(user_id: int, filters: Optional[ExpenseFilter] = None) -> List[Expense]:
         """
@@ -101,40 +238,233 @@ class ExpenseService:
                 # Set READ COMMITTED for consistent reads
                 db.execute(text("SET TRANSACTION ISOLATION LEVEL READ COMMITTED"))
                 
-                query = db.query(Expense).filter(Expense.user_id == user_id)
-                
-                if filters:
-                    if filters.start_date:
-                        query = query.filter(Expense.added_at >= filters.start_date)
-                    if filters.end_date:
-                        query = query.filter(Expense.added_at <= filters.end_date)
-                    if filters.category:
-                        query = query.filter(Expense.category == filters.category)
-                    if filters.min_amount is not None:
-                        query = query.filter(Expense.amount >= filters.min_amount)
-                    if filters.max_amount is not None:
-                        query = query.filter(Expense.amount <= filters.max_amount)
-                
-                return query.all()
+                rows = db.execute(
+                    expense_query(filter_shape(filters)), expense_query_params(user_id, filters)
+                ).fetchall()
+                return [ExpenseService._row_to_expense(row) for row in rows]
             except SQLAlchemyError as e:
-                print(f"Database error: {str(e)}")
+                logger.error("database_error", extra={'error': str(e)})
                 return []
     
     @staticmethod
-    def get_expenses_sql(user_id: int, filters: Optional[ExpenseFilter] = None) -> str:
+    def get_labeled_descriptions(user_id: Optional[int] = None, limit: Optional[int] = None) -> List[Tuple[int, str, str]]:
+        """
+        Get (user_id, description, category) for categorized expenses, newest first,
+        to train the local category classifier.
+        
+        Args:
+            user_id: Only return this user's expenses
+            limit: Return at most this many rows
+            
+        Returns:
+            List of (user_id, description, category) tuples
+        """
+        query = (
+            select(Expense.user_id, Expense.description, Expense.category)
+            .where(Expense.category != 'unknown')
+            .order_by(Expense.added_at.desc())
+            .limit(limit)
+        )
+        if user_id is not None:
+            query = query.where(Expense.user_id == user_id)
+        with ExpenseService.get_db_session() as db:
+            return [tuple(row) for row in db.execute(query)]
+    
+    @staticmethod
+    def get_expenses_sql(user_id: int, filters: Optional[ExpenseFilter] = None) -> Tuple[str, dict]:
         """
         Generate SQL query for expenses with filters.
         
+        The SQL is rendered from the same cached, parameterized statement the ORM path executes,
+        so values are never interpolated into the text.
+        
         Args:
             user_id: The ID of the user
             filters: Optional filters to apply
             
         Returns:
-            SQL query string
-        """
-        base_query = f"SELECT * FROM expenses WHERE user_id = {user_id}"
-        if filters:
-            where_clause = filters.to_sql_where_clause()
-            if where_clause != "1=1":
-                base_query += f" AND {where_clause}"
-        return base_query 
\ No newline at end of file
+            SQL query string with :named placeholders, and its bind parameters
+        """
+        return expense_sql(filter_shape(filters)), expense_query_params(user_id, filters)
+
+class AsyncExpenseService:
+    """Async counterpart of ExpenseService running on the AsyncSession engine."""
+
+    @staticmethod
+    async def create_expense(expense: ExpenseCreate) -> Optional[Expense]:
+        """
+        Create a new expense in the database.
+        
+        Args:
+            expense: The expense data to create
+            
+        Returns:
+            The created expense or None if creation failed
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                # READ COMMITTED for the same reason as ExpenseService.create_expense
+                await db.execute(text("SET TRANSACTION ISOLATION LEVEL READ COMMITTED"))
+                
+                result = await db.execute(INSERT_EXPENSE_SQL, ExpenseService._insert_params(expense))
+                row = result.fetchone()
+                if row:
+                    expense_obj = ExpenseService._row_to_expense(row)
+                    await db.commit()
+                    return expense_obj
+                return None
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.error("database_error", extra={'error': str(e)})
+                return None
+            except Exception as e:
+                await db.rollback()
+                logger.exception("unexpected_database_error")
+                return None
+
+    @staticmethod
+    async def create_expenses(expenses: List[ExpenseCreate]) -> List[Expense]:
+        """
+        Create several expenses with a single multi-row INSERT in one transaction.
+        
+        Args:
+            expenses: The expense data to create
+            
+        Returns:
+            The created expenses in input order, or an empty list if the insert failed
+        """
+        if not expenses:
+            return []
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(text("SET TRANSACTION ISOLATION LEVEL READ COMMITTED"))
+                
+                sql, params = ExpenseService._build_insert_many(expenses)
+                rows = (await db.execute(sql, params)).fetchall()
+                await db.commit()
+                return [ExpenseService._row_to_expense(row) for row in rows]
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.error("database_error", extra={'error': str(e)})
+                return []
+            except Exception as e:
+                await db.rollback()
+                logger.exception("unexpected_database_error")
+                return []
+
+    @staticmethod
+    async def copy_expenses(expenses: List[ExpenseCreate], added_at: Optional[List[Optional[datetime]]] = None) -> int:
+        """
+        Bulk-load expenses with PostgreSQL COPY, fold them into the daily rollups and bump
+        the users' data versions, in one transaction.
+        
+        Args:
+            expenses: The expense data to load
+            added_at: When each expense happened (None or missing entries: now)
+            
+        Returns:
+            The number of rows loaded
+            
+        Raises:
+            SQLAlchemyError, psycopg.Error: If the load failed; nothing is written in that case
+        """
+        now = datetime.now(timezone.utc)
+        rollups: dict[tuple, list] = {}
+        async with AsyncSessionLocal() as db:
+            try:
+                connection = await (await db.connection()).get_raw_connection()
+                async with connection.driver_connection.cursor() as cursor:
+                    async with cursor.copy(COPY_EXPENSES_SQL) as copy:
+                        for index, expense in enumerate(expenses):
+                            when = (added_at[index] if added_at else None) or now
+                            if when.tzinfo is None:
+                                when = when.replace(tzinfo=timezone.utc)
+                            await copy.write_row(
+                                (expense.user_id, expense.description, expense.amount, expense.category, when)
+                            )
+                            bucket = rollups.setdefault(
+                                (expense.user_id, expense.category, when.astimezone(timezone.utc).date()), [0, 0]
+                            )
+                            bucket[0] += expense.amount
+                            bucket[1] += 1
+                if rollups:
+                    await db.execute(UPSERT_ROLLUPS_SQL, [
+                        {'user_id': user_id, 'category': category, 'day': day, 'total': total, 'count': count}
+                        for (user_id, category, day), (total, count) in rollups.items()
+                    ])
+                    await db.execute(BUMP_DATA_VERSIONS_SQL, {'user_ids': sorted({key[0] for key in rollups})})
+                await db.commit()
+                return len(expenses)
+            except Exception:
+                await db.rollback()
+                raise
+
+    @staticmethod
+    async def get_expenses_by_user(user_id: int, filters: Optional[ExpenseFilter] = None) -> List[Expense]:
+        """
+        Get all expenses for a specific user with optional filters.
+        
+        Args:
+            user_id: The ID of the user
+            filters: Optional filters to apply to the query
+            
+        Returns:
+            List of expenses for the user matching the filters
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(text("SET TRANSACTION ISOLATION LEVEL READ COMMITTED"))
+                
+                rows = (await db.execute(
+                    expense_query(filter_shape(filters)), expense_query_params(user_id, filters)
+                )).fetchall()
+                return [ExpenseService._row_to_expense(row) for row in rows]
+            except SQLAlchemyError as e:
+                logger.error("database_error", extra={'error': str(e)})
+                return []
+
+    @staticmethod
+    async def get_expenses_page(
+        user_id: int,
+        filters: Optional[ExpenseFilter] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Expense], Optional[str]]:
+        """
+        Get one page of a user's expenses, newest first, using keyset pagination on (added_at, id).
+        
+        Args:
+            user_id: The ID of the user
+            filters: Optional filters to apply to the query
+            limit: Maximum number of expenses to return
+            cursor: The next_cursor of the previous page, if any
+            
+        Returns:
+            The expenses on this page and the cursor for the next page (None on the last page)
+        """
+        params = expense_query_params(user_id, filters)
+        params['limit'] = limit + 1
+        if cursor:
+            params['cursor_added_at'], params['cursor_id'] = decode_expense_cursor(cursor)
+        query = expense_query(filter_shape(filters), keyset=bool(cursor), limited=True)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query, params)).fetchall()
+        
+        expenses = [ExpenseService._row_to_expense(row) for row in rows[:limit]]
+        next_cursor = encode_expense_cursor(expenses[-1]) if len(rows) > limit else None
+        return expenses, next_cursor
+
+    @staticmethod
+    async def stream_expenses(user_id: int, filters: Optional[ExpenseFilter] = None) -> AsyncIterator[Expense]:
+        """
+        Yield all of a user's expenses, newest first, through a server-side cursor
+        so memory use does not grow with the number of rows.
+        """
+        query = expense_query(filter_shape(filters)).execution_options(
+            yield_per=settings.EXPENSES_STREAM_BATCH_SIZE
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query, expense_query_params(user_id, filters))
+            async for row in result:
+                yield ExpenseService._row_to_expense(row)
\ No newline at end of file
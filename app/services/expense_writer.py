@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from app.core.config import settings
+from app.models.expense import Expense
+from app.schemas.expense import ExpenseCreate
+from app.services.expense_service import AsyncExpenseService
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """
+    Group-commit front end for AsyncExpenseService.create_expense.
+
+    Concurrent calls are collected for up to max_delay_ms (or until max_batch_size
+    expenses are waiting) and written with one multi-row INSERT ... RETURNING in a
+    single transaction. Each caller still receives its own saved row.
+    """
+
+    def __init__(
+        self,
+        max_delay_ms: float = settings.EXPENSE_GROUP_COMMIT_MAX_DELAY_MS,
+        max_batch_size: int = settings.EXPENSE_GROUP_COMMIT_MAX_BATCH_SIZE,
+        insert_many: Callable[[List[ExpenseCreate]], Awaitable[List[Expense]]] = AsyncExpenseService.create_expenses,
+        insert_one: Callable[[ExpenseCreate], Awaitable[Optional[Expense]]] = AsyncExpenseService.create_expense,
+    ):
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._insert_many = insert_many
+        self._insert_one = insert_one
+        self._pending: list[tuple[ExpenseCreate, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._in_flight: set[asyncio.Task] = set()
+
+    async def create_expense(self, expense: ExpenseCreate) -> Optional[Expense]:
+        """
+        Queue an expense for the next group commit and wait for it to be saved.
+
+        Returns:
+            The created expense or None if creation failed
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((expense, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._start_flush()
+        elif self._flush_task is None:
+            self._flush_task = self._track(asyncio.create_task(self._flush_after_delay()))
+        return await future
+
+    def _track(self, task: asyncio.Task) -> asyncio.Task:
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+        return task
+
+    async def _flush_after_delay(self) -> None:
+        await asyncio.sleep(self.max_delay)
+        self._flush_task = None
+        await self._flush(self._take_pending())
+
+    def _start_flush(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._track(asyncio.create_task(self._flush(self._take_pending())))
+
+    def _take_pending(self) -> list[tuple[ExpenseCreate, asyncio.Future]]:
+        pending, self._pending = self._pending, []
+        return pending
+
+    async def _flush(self, pending: list[tuple[ExpenseCreate, asyncio.Future]]) -> None:
+        if not pending:
+            return
+        try:
+            saved = await self._insert_many([expense for expense, _ in pending])
+        except Exception as e:
+            logger.warning("group_commit_failed", extra={'error': str(e), 'size': len(pending)})
+            saved = []
+
+        if len(saved) == len(pending):
+            for (_, future), expense in zip(pending, saved):
+                if not future.done():
+                    future.set_result(expense)
+            return
+
+        # The group failed as a whole; retry individually so one bad row doesn't fail its neighbours
+        for expense_data, future in pending:
+            try:
+                expense = await self._insert_one(expense_data)
+            except Exception as e:
+                logger.exception("expense_save_failed")
+                expense = None
+            if not future.done():
+                future.set_result(expense)
+
+    async def aclose(self) -> None:
+        """Flush anything still waiting and wait for in-flight commits."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._flush(self._take_pending())
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
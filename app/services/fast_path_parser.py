@@ -0,0 +1,177 @@
+import re
+from typing import Optional
+
+from app.services.category_cache import CategorySnapshot
+
+# Keywords that unambiguously identify a category. A keyword is only used when
+# its category exists in the current catalog. Words with more than one common
+# reading ("gas" bill or fuel, "phone" bill or a new phone, bottled "water")
+# are left out and go to the LLM.
+KEYWORD_CATEGORIES: dict[str, str] = {
+    "breakfast": "Food",
+    "brunch": "Food",
+    "burger": "Food",
+    "cafe": "Food",
+    "coffee": "Food",
+    "dinner": "Food",
+    "groceries": "Food",
+    "lunch": "Food",
+    "pizza": "Food",
+    "restaurant": "Food",
+    "snack": "Food",
+    "supermarket": "Food",
+    "bus": "Transport",
+    "fuel": "Transport",
+    "metro": "Transport",
+    "parking": "Transport",
+    "subway": "Transport",
+    "taxi": "Transport",
+    "train": "Transport",
+    "uber": "Transport",
+    "cinema": "Entertainment",
+    "concert": "Entertainment",
+    "movie": "Entertainment",
+    "movies": "Entertainment",
+    "netflix": "Entertainment",
+    "spotify": "Entertainment",
+    "doctor": "Health",
+    "gym": "Health",
+    "medicine": "Health",
+    "pharmacy": "Health",
+    "electricity": "Utilities",
+    "internet": "Utilities",
+    "rent": "Housing",
+}
+
+_CURRENCY = r"[$€£]"
+_CURRENCY_WORD = r"usd|eur|gbp|dollars?|euros?|pounds?"
+_CURRENCY_CODES = {
+    "$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD", "bucks": "USD",
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "£": "GBP", "gbp": "GBP", "pound": "GBP", "pounds": "GBP",
+}
+_AMOUNT = r"\d+(?:[.,]\d{1,2})?"
+_DESCRIPTION = r"[^\W\d_][^\d$€£]*?"
+
+# "<description> <amount>" or "<amount> <description>", each with an optional currency.
+_SIMPLE_MESSAGE_PATTERNS = (
+    re.compile(
+        rf"^\s*(?P<description>{_DESCRIPTION})\s+(?P<currency>{_CURRENCY})?\s*(?P<amount>{_AMOUNT})"
+        rf"\s*(?P<currency_suffix>{_CURRENCY}|{_CURRENCY_WORD})?\s*$",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        rf"^\s*(?P<currency>{_CURRENCY})?\s*(?P<amount>{_AMOUNT})\s*(?P<currency_suffix>{_CURRENCY}|{_CURRENCY_WORD})?"
+        rf"\s+(?P<description>{_DESCRIPTION})\s*$",
+        re.IGNORECASE,
+    ),
+)
+_WORD_PATTERN = re.compile(r"[^\W\d_]+")
+_TRAILING_CONNECTOR_PATTERN = re.compile(r"\s+(?:for|on|at|of)$", re.IGNORECASE)
+_MAX_DESCRIPTION_WORDS = 4
+
+# One amount anywhere in a longer message, with its currency ("paid 45 bucks", "$12.30")
+_AMOUNT_IN_TEXT_PATTERN = re.compile(
+    rf"(?<![\w.,])(?P<currency>{_CURRENCY})?\s*(?P<amount>{_AMOUNT})(?![\w.,]*\d)"
+    rf"\s*(?P<currency_suffix>{_CURRENCY}|(?:{_CURRENCY_WORD}|bucks)\b)?",
+    re.IGNORECASE,
+)
+_LEFTOVER_PATTERN = re.compile(r"(?:[\s,;:.!-]+|\s+(?:for|on|at|of|paid|spent|cost|costs))+$", re.IGNORECASE)
+
+
+def _currencies_conflict(match: re.Match) -> bool:
+    """Whether the amount has a currency both before and after it, and they differ ("$4.5 €")."""
+    prefix, suffix = match.group("currency"), match.group("currency_suffix")
+    return bool(prefix and suffix) and _CURRENCY_CODES[prefix.lower()] != _CURRENCY_CODES[suffix.lower()]
+
+
+def split_amount(message: str) -> Optional[tuple[float, str]]:
+    """
+    Separate the amount from the rest of a free-text message.
+
+    Returns:
+        The amount and the message without it, or None unless the message contains exactly one number
+    """
+    matches = list(_AMOUNT_IN_TEXT_PATTERN.finditer(message))
+    if len(matches) != 1:
+        return None
+    match = matches[0]
+    if _currencies_conflict(match):
+        return None
+    description = " ".join(f"{message[:match.start()]} {message[match.end():]}".split())
+    description = _LEFTOVER_PATTERN.sub("", description)
+    if not _WORD_PATTERN.search(description):
+        return None
+    return float(match.group("amount").replace(",", ".")), description
+
+
+class FastPathParser:
+    """
+    Deterministic parser for short messages such as "coffee 4.5" or "uber $12,30".
+
+    Messages it cannot parse with certainty return None and are left to the LLM.
+    """
+
+    def __init__(self, keyword_categories: Optional[dict[str, str]] = None):
+        self.keyword_categories = keyword_categories if keyword_categories is not None else KEYWORD_CATEGORIES
+        self.hits = 0
+        self.misses = 0
+        self._keyword_map_version: Optional[str] = None
+        self._keyword_map: dict[str, str] = {}
+
+    def _keywords_for(self, categories: CategorySnapshot) -> dict[str, str]:
+        """Resolve keywords against the catalog, rebuilding only when the catalog changes."""
+        if self._keyword_map_version != categories.version:
+            by_lower_name = {name.lower(): name for name in categories.names}
+            keyword_map = {name.lower(): name for name in categories.names}
+            for keyword, category in self.keyword_categories.items():
+                if category.lower() in by_lower_name:
+                    keyword_map.setdefault(keyword, by_lower_name[category.lower()])
+            self._keyword_map = keyword_map
+            self._keyword_map_version = categories.version
+        return self._keyword_map
+
+    def match_category(self, text: str, categories: CategorySnapshot) -> Optional[str]:
+        """Return the category of the one keyword-bearing category named in `text`, or None."""
+        keyword_map = self._keywords_for(categories)
+        matched = {keyword_map[word] for word in _WORD_PATTERN.findall(text.lower()) if word in keyword_map}
+        return matched.pop() if len(matched) == 1 else None
+
+    def parse(self, message: str, categories: CategorySnapshot) -> Optional[dict]:
+        """
+        Extract amount, category and description from a simple message.
+
+        Returns:
+            A dictionary shaped like the LLM result, or None if the message is ambiguous
+        """
+        result = self._parse(message, categories)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def _parse(self, message: str, categories: CategorySnapshot) -> Optional[dict]:
+        for pattern in _SIMPLE_MESSAGE_PATTERNS:
+            match = pattern.match(message)
+            if match:
+                break
+        else:
+            return None
+        if _currencies_conflict(match):
+            return None
+
+        description = _TRAILING_CONNECTOR_PATTERN.sub("", match.group("description").strip())
+        words = _WORD_PATTERN.findall(description.lower())
+        if not words or len(words) > _MAX_DESCRIPTION_WORDS:
+            return None
+
+        category = self.match_category(description, categories)
+        if category is None:
+            return None
+
+        return {
+            'amount': float(match.group("amount").replace(",", ".")),
+            'category': category,
+            'description': description,
+        }
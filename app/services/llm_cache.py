@@ -0,0 +1,165 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _normalize_number(match: re.Match) -> str:
+    text = match.group(0)
+    # A last group of exactly three digits may be a thousands group ("1.200" is 1200 in much
+    # of Europe), so such numbers are kept as written rather than risk merging 1.200 with 1.2.
+    if re.search(r"[.,]\d{3}$", text):
+        return text
+    # A single comma followed by one or two digits is a decimal comma ("12,30");
+    # any other comma is a thousands separator ("1,200").
+    if re.fullmatch(r"\d+,\d{1,2}", text):
+        text = text.replace(",", ".")
+    else:
+        text = text.replace(",", "")
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return text
+    return format(value.normalize(), "f")
+
+
+def normalize_message(message: str) -> str:
+    """Normalize case, whitespace and number formatting so equivalent messages share a cache key."""
+    message = _WHITESPACE_PATTERN.sub(" ", message.strip().lower())
+    return _NUMBER_PATTERN.sub(_normalize_number, message)
+
+
+class SQLiteCacheBackend:
+    """On-disk store for cached LLM results that survives restarts."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS llm_results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[tuple[float, dict]]:
+        """Return (expires_at, value) for a live entry, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM llm_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._connection.execute("DELETE FROM llm_results WHERE key = ?", (key,))
+                self._connection.commit()
+                return None
+            return row[1], json.loads(row[0])
+
+    def set(self, key: str, value: dict, expires_at: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class LLMResultCache:
+    """
+    LRU/TTL cache of parsed LLM results keyed by normalized message.
+
+    Keys include the model name and the category catalog version, so entries
+    stop matching as soon as either changes. An optional SQLite backend keeps
+    results across restarts; the in-memory LRU sits in front of it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = settings.LLM_CACHE_TTL_SECONDS,
+        backend: Optional[SQLiteCacheBackend] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    @classmethod
+    def from_settings(cls) -> Optional["LLMResultCache"]:
+        """Build the cache configured in settings, or None when caching is disabled."""
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+        backend = SQLiteCacheBackend(settings.LLM_CACHE_SQLITE_PATH) if settings.LLM_CACHE_SQLITE_PATH else None
+        return cls(backend=backend)
+
+    @staticmethod
+    def make_key(message: str, model_name: str, categories_version: str) -> str:
+        """Build the cache key for a message under the given model and category catalog."""
+        raw = f"{model_name}\x1f{categories_version}\x1f{normalize_message(message)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Return a copy of the cached result, counting the lookup as a hit or miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(value)
+            del self._entries[key]
+
+        if self.backend is not None:
+            entry = await run_in_threadpool(self.backend.get, key)
+            if entry is not None:
+                # Keep the expiry stored on disk; a fresh TTL would outlive the entry itself
+                expires_at, value = entry
+                self._remember(key, value, expires_at)
+                self.hits += 1
+                return dict(value)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: dict) -> None:
+        """Store a result in memory and, if configured, on disk."""
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, dict(value), expires_at)
+        if self.backend is not None:
+            await run_in_threadpool(self.backend.set, key, value, expires_at)
+
+    def _remember(self, key: str, value: dict, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        if self.backend is not None:
+            self.backend.close()
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LLM_QUEUE_WAIT_SECONDS = metrics.histogram(
+    "llm_queue_wait_seconds", "Time LLM calls waited for a concurrency slot and rate-limit budget"
+)
+LLM_IN_FLIGHT = metrics.gauge("llm_in_flight", "LLM calls currently being sent to the provider")
+LLM_QUEUED = metrics.gauge("llm_queued", "LLM calls waiting for a concurrency slot")
+LLM_RETRIES = metrics.counter("llm_retries", "LLM calls retried after a retryable error", ("reason",))
+LLM_REJECTED = metrics.counter("llm_rejected", "LLM calls rejected because the queue was full")
+
+
+class LLMUnavailable(Exception):
+    """The LLM can't take this call now; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Continuous token bucket. Callers reserve budget up front and are told how long
+    to wait for it, so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` from the bucket and return the seconds to wait until it is covered."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= amount
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+def _retry_after_from(error: Exception) -> Optional[float]:
+    """Seconds requested by the provider in Retry-After (or retry-after-ms), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_reason(error: Exception) -> Optional[str]:
+    """Why an error is worth retrying ('rate_limit', 'server_error', 'connection'), or None."""
+    import openai
+
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.InternalServerError):
+        return "server_error"
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return "connection"
+    if isinstance(error, openai.APIStatusError) and error.status_code in (408, 409):
+        return "server_error"
+    return None
+
+
+class LLMScheduler:
+    """
+    Dispatch queue in front of ChatOpenAI.
+
+    At most `max_concurrency` calls are sent at once, and calls are paced by optional
+    requests- and tokens-per-minute buckets so traffic stays within the provider quota.
+    Retryable errors are retried with jittered exponential backoff; a Retry-After from
+    the provider pauses every call, not just the one that got it. When `max_queue`
+    calls are already waiting, new calls fail fast with LLMUnavailable.
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+        max_queue: int = settings.LLM_MAX_QUEUE,
+        requests_per_minute: Optional[int] = settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: Optional[int] = settings.LLM_TOKENS_PER_MINUTE,
+        max_retries: int = settings.OPENAI_MAX_RETRIES,
+        backoff_base: float = settings.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = settings.LLM_BACKOFF_MAX_SECONDS,
+        completion_tokens_estimate: int = settings.LLM_COMPLETION_TOKENS_ESTIMATE,
+    ):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.completion_tokens_estimate = completion_tokens_estimate
+        burst = settings.LLM_RATE_BURST_SECONDS
+        self._requests = TokenBucket(requests_per_minute, burst) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, burst) if tokens_per_minute else None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._queued = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._latency = 1.0  # moving average of call latency, used to estimate Retry-After
+
+    @property
+    def model_name(self) -> str:
+        return self.llm.model_name
+
+    def estimate_tokens(self, messages: list, tools: Optional[list] = None) -> int:
+        """Rough token count of a call: ~4 characters per prompt token plus the expected completion."""
+        prompt_characters = sum(len(str(getattr(message, "content", ""))) for message in messages)
+        if tools:
+            prompt_characters += len(json.dumps(tools))
+        return prompt_characters // 4 + self.completion_tokens_estimate
+
+    def retry_after(self) -> float:
+        """Seconds after which a rejected call is likely to find room."""
+        backlog = (self._queued + self._in_flight) / self.max_concurrency
+        return max(self._paused_until - time.monotonic(), backlog * self._latency, 1.0)
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads retries out so throttled callers don't retry in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _wait_for_budget(self, messages: list, tools: Optional[list]) -> None:
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        wait = 0.0
+        if self._requests is not None:
+            wait = self._requests.reserve(1)
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.reserve(self.estimate_tokens(messages, tools)))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def ainvoke(self, messages: list, **kwargs) -> Any:
+        """Queue, pace and send one call; same signature as ChatOpenAI.ainvoke."""
+        if self._slots.locked() and self._queued >= self.max_queue:
+            LLM_REJECTED.inc()
+            raise LLMUnavailable("LLM is overloaded, please retry later", self.retry_after())
+
+        queued_at = time.perf_counter()
+        self._queued += 1
+        LLM_QUEUED.set(self._queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+            LLM_QUEUED.set(self._queued)
+        self._in_flight += 1
+        LLM_IN_FLIGHT.set(self._in_flight)
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._wait_for_budget(messages, kwargs.get("tools"))
+                if attempt == 0:
+                    LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+                started = time.monotonic()
+                try:
+                    response = await self.llm.ainvoke(messages, **kwargs)
+                except Exception as e:
+                    reason = _retry_reason(e)
+                    if reason is None:
+                        raise
+                    retry_after = _retry_after_from(e)
+                    if retry_after is not None:
+                        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                    if attempt == self.max_retries:
+                        raise LLMUnavailable(
+                            "LLM rate limit exceeded, please retry later" if reason == "rate_limit"
+                            else "LLM is unavailable, please retry later",
+                            max(retry_after or 0.0, self.retry_after()),
+                        ) from e
+                    LLM_RETRIES.labels(reason).inc()
+                    # With a Retry-After the pause set above delays the retry (and everyone else)
+                    delay = retry_after if retry_after is not None else self._backoff(attempt)
+                    logger.info("llm_retry", extra={'reason': reason, 'attempt': attempt + 1, 'delay': round(delay, 3)})
+                    if retry_after is None:
+                        await asyncio.sleep(delay)
+                    continue
+                self._latency = 0.8 * self._latency + 0.2 * (time.monotonic() - started)
+                return response
+        finally:
+            self._in_flight -= 1
+            LLM_IN_FLIGHT.set(self._in_flight)
+            self._slots.release()
@@ -0,0 +1,41 @@
+import logging
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+LLM_TOKENS = metrics.counter("llm_tokens", "Tokens reported by the LLM provider", ("kind",))
+_PROMPT_TOKENS = LLM_TOKENS.labels("prompt")
+_COMPLETION_TOKENS = LLM_TOKENS.labels("completion")
+LLM_CALL_TOKENS = metrics.histogram(
+    "llm_call_tokens", "Tokens used by a single LLM call", ("kind",),
+    buckets=(25, 50, 100, 200, 300, 500, 750, 1000, 2000, 4000, 8000),
+)
+_PROMPT_TOKENS_PER_CALL = LLM_CALL_TOKENS.labels("prompt")
+_COMPLETION_TOKENS_PER_CALL = LLM_CALL_TOKENS.labels("completion")
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """
+    Count the prompt and completion tokens of every LLM call, in total and per call.
+
+    Runs inline on the event loop: it only adds a few numbers, which is cheaper
+    than langchain's default hop through a thread pool for sync handlers.
+    """
+
+    run_inline = True
+
+    def on_llm_end(self, response: LLMResult, **kwargs) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        _PROMPT_TOKENS.inc(prompt_tokens)
+        _COMPLETION_TOKENS.inc(completion_tokens)
+        if not usage:
+            return
+        _PROMPT_TOKENS_PER_CALL.observe(prompt_tokens)
+        _COMPLETION_TOKENS_PER_CALL.observe(completion_tokens)
+        logger.debug("llm_call_tokens", extra={'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens})
@@ -0,0 +1,77 @@
+from app.schemas.expense import ExpenseBase
+
+EXPENSE_TOOL_NAME = "record_expense"
+
+
+def build_expense_system_prompt(categories: str) -> str:
+    """Build the system prompt used to extract a single expense from a message."""
+    return (
+        "You are an assistant that extracts structured expense data from user messages. "
+        "Given a message like 'Bought coffee for 4.5 dollars', extract and return a JSON object "
+        "with the fields: amount (number), category (string), and description (string).\n\n"
+        f"Available categories are: {categories}\n"
+        "If the message cannot be analyzed as an expense, set category to 'unknown'. "
+        "But only if you can't extract an expense, otherwise use a category from the list above. "
+        "Respond only with the JSON structure, for example:\n"
+        '{"amount": 4.5, "category": "Food", "description": "Bought coffee"}'
+    )
+
+
+def build_compact_expense_system_prompt(categories: str) -> str:
+    """Short variant of build_expense_system_prompt, for models that don't need the explanation."""
+    return (
+        'Extract the expense as JSON {"amount": number, "category": string, "description": string}. '
+        f"Categories: {categories}. Use category unknown if it is not an expense."
+    )
+
+
+def build_tool_system_prompt(compact: bool = False) -> str:
+    """
+    Build the system prompt used when the model answers through the record_expense tool.
+
+    The categories are listed in the tool schema, so the prompt doesn't repeat them.
+    """
+    if compact:
+        return f"Call {EXPENSE_TOOL_NAME} for the expense in the message; category unknown if it is not one."
+    return (
+        "You are an assistant that extracts structured expense data from user messages. "
+        f"Call {EXPENSE_TOOL_NAME} with the amount, the category and a short description of the expense "
+        "in the message. If the message cannot be analyzed as an expense, set category to 'unknown'."
+    )
+
+
+def build_expense_tool(categories: list[str]) -> dict:
+    """
+    Build the OpenAI tool definition for record_expense from the ExpenseBase schema,
+    with the category restricted to the catalog (plus 'unknown').
+    """
+    schema = ExpenseBase.model_json_schema()
+    # Titles only repeat the field names and would cost prompt tokens on every call
+    properties = {
+        name: {key: value for key, value in field.items() if key != "title"}
+        for name, field in schema["properties"].items()
+    }
+    properties["category"]["enum"] = [*categories, "unknown"]
+    return {
+        "type": "function",
+        "function": {
+            "name": EXPENSE_TOOL_NAME,
+            "description": "Record the expense described in the message",
+            "parameters": {"type": "object", "properties": properties, "required": schema["required"]},
+        },
+    }
+
+
+def build_batch_system_prompt(categories: str) -> str:
+    """Build the system prompt used to extract expenses from a numbered list of messages."""
+    return (
+        "You are an assistant that extracts structured expense data from user messages. "
+        "You will receive a JSON array of objects with the fields index (number) and message (string). "
+        "For every message return one JSON object with the fields: index (the same number), "
+        "amount (number), category (string), and description (string).\n\n"
+        f"Available categories are: {categories}\n"
+        "If a message cannot be analyzed as an expense, set its category to 'unknown'. "
+        "But only if you can't extract an expense, otherwise use a category from the list above. "
+        "Respond only with a JSON array containing one object per input message, for example:\n"
+        '[{"index": 0, "amount": 4.5, "category": "Food", "description": "Bought coffee"}]'
+    )
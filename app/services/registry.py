@@ -0,0 +1,166 @@
+import logging
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.analysis_job_worker import AnalysisJobWorker
+from app.services.category_cache import CategoryCache
+from app.services.category_classifier import CategoryClassifier
+from app.services.expense_partition_maintainer import PartitionMaintainer
+from app.services.expense_read_cache import ExpenseReadCache
+from app.services.expense_writer import GroupCommitWriter
+from app.services.llm_cache import LLMResultCache
+from app.services.llm_scheduler import LLMScheduler
+from app.services.user_resolver import UserResolver
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the keep-alive connection pool used for all OpenAI calls."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=settings.OPENAI_REQUEST_TIMEOUT,
+    )
+
+
+def create_chat_model(http_client: httpx.AsyncClient) -> "ChatOpenAI":
+    """Create a ChatOpenAI whose async calls go through the shared connection pool."""
+    # Imported here so that importing the app does not pay for loading openai/langchain
+    import openai
+    from langchain_openai import ChatOpenAI
+
+    # The scheduler retries with backoff and honours Retry-After itself; the client must not retry on top
+    max_retries = 0 if settings.LLM_SCHEDULER_ENABLED else settings.OPENAI_MAX_RETRIES
+    async_client = openai.AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        timeout=settings.OPENAI_REQUEST_TIMEOUT,
+        max_retries=max_retries,
+        http_client=http_client,
+    )
+    return ChatOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        model_name=settings.OPENAI_MODEL_NAME,
+        temperature=settings.OPENAI_TEMPERATURE,
+        request_timeout=settings.OPENAI_REQUEST_TIMEOUT,
+        max_retries=max_retries,
+        async_client=async_client.chat.completions,
+        # An explicit value keeps langchain_core from importing the whole legacy langchain package here
+        verbose=False,
+    )
+
+
+def preload_langchain() -> None:
+    """
+    Import the modules langchain loads on its first call (the legacy package is
+    consulted for global debug/verbose flags). Meant to run in a worker thread.
+    """
+    from langchain_core.globals import get_debug
+
+    get_debug()
+
+
+def load_classifier(path: Optional[str] = settings.CATEGORY_CLASSIFIER_PATH) -> Optional[CategoryClassifier]:
+    """Load the trained category classifier; without one every non-trivial message goes to the LLM."""
+    if not path:
+        return None
+    try:
+        classifier = CategoryClassifier.load(path)
+    except (OSError, ValueError) as e:
+        logger.warning("classifier_load_failed", extra={'path': path, 'error': str(e)})
+        return None
+    logger.info("classifier_loaded", extra={'path': path, **classifier.metadata})
+    return classifier
+
+
+class ServiceRegistry:
+    """
+    Services that live for the whole lifetime of the application process.
+
+    Built once in the FastAPI lifespan hook and handed to routes through
+    dependencies, so the LLM client and its connections are reused across requests.
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        llm: "ChatOpenAI",
+        llm_scheduler: Optional[LLMScheduler],
+        category_cache: CategoryCache,
+        result_cache: Optional[LLMResultCache],
+        expense_writer: Optional[GroupCommitWriter],
+        ai_service: AIService,
+        job_worker: Optional[AnalysisJobWorker] = None,
+        user_resolver: Optional[UserResolver] = None,
+        partition_maintainer: Optional[PartitionMaintainer] = None,
+        expense_read_cache: Optional[ExpenseReadCache] = None,
+    ):
+        self.http_client = http_client
+        self.llm = llm
+        self.llm_scheduler = llm_scheduler
+        self.category_cache = category_cache
+        self.result_cache = result_cache
+        self.expense_writer = expense_writer
+        self.ai_service = ai_service
+        self.job_worker = job_worker
+        self.user_resolver = user_resolver or UserResolver()
+        self.partition_maintainer = partition_maintainer
+        self.expense_read_cache = expense_read_cache or ExpenseReadCache()
+
+    @classmethod
+    def build(cls, http_client: Optional[httpx.AsyncClient] = None) -> "ServiceRegistry":
+        """Construct the shared services."""
+        http_client = http_client or create_http_client()
+        llm = create_chat_model(http_client)
+        llm_scheduler = LLMScheduler(llm) if settings.LLM_SCHEDULER_ENABLED else None
+        category_cache = CategoryCache()
+        result_cache = LLMResultCache.from_settings()
+        expense_writer = GroupCommitWriter() if settings.EXPENSE_GROUP_COMMIT_ENABLED else None
+        ai_service = AIService(
+            llm=llm_scheduler or llm,
+            category_cache=category_cache,
+            result_cache=result_cache,
+            expense_writer=expense_writer,
+            classifier=load_classifier(),
+        )
+        return cls(
+            http_client=http_client,
+            llm=llm,
+            llm_scheduler=llm_scheduler,
+            category_cache=category_cache,
+            result_cache=result_cache,
+            expense_writer=expense_writer,
+            ai_service=ai_service,
+            job_worker=AnalysisJobWorker(ai_service) if settings.ANALYSIS_JOBS_ENABLED else None,
+            partition_maintainer=PartitionMaintainer() if settings.EXPENSE_PARTITIONING_ENABLED else None,
+        )
+
+    def start(self) -> None:
+        """Start background workers; call from the running event loop."""
+        if self.job_worker is not None:
+            self.job_worker.start()
+        if self.partition_maintainer is not None:
+            self.partition_maintainer.start()
+
+    async def aclose(self) -> None:
+        """Stop background workers, flush pending writes and release pooled connections and cache storage."""
+        if self.job_worker is not None:
+            await self.job_worker.aclose()
+        if self.partition_maintainer is not None:
+            await self.partition_maintainer.aclose()
+        if self.expense_writer is not None:
+            await self.expense_writer.aclose()
+        await self.http_client.aclose()
+        if self.result_cache is not None:
+            self.result_cache.close()
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from app.core.config import settings
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller starts the work in its own task; callers arriving while it
+    runs await the same task. A caller that is cancelled (e.g. the client went
+    away) does not cancel the work the others are waiting for.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+
+class IdempotencyKeyReused(Exception):
+    """An idempotency key was sent again with a different request than the one it answered."""
+
+
+class IdempotencyCache:
+    """
+    Results of completed requests by client-supplied idempotency key, kept for a
+    short window so replays get the original answer instead of repeating the work.
+    Each result is stored with a fingerprint of the request that produced it, so a
+    key reused for a different request is refused instead of answered with the
+    original result.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = settings.IDEMPOTENCY_TTL_SECONDS,
+        max_entries: int = settings.IDEMPOTENCY_MAX_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.replays = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Hashable, dict]] = OrderedDict()
+
+    def get(self, key: Hashable, fingerprint: Hashable) -> Optional[dict]:
+        """
+        Return a copy of the stored result, or None if the key is unknown or expired.
+
+        Raises:
+            IdempotencyKeyReused: If the result was stored for a request with another fingerprint
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, stored_fingerprint, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        if stored_fingerprint != fingerprint:
+            raise IdempotencyKeyReused("Idempotency key was already used for a different request")
+        self.replays += 1
+        return dict(result)
+
+    def set(self, key: Hashable, fingerprint: Hashable, result: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, fingerprint, dict(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
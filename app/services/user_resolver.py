@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.request_dedup import SingleFlight
+from app.services.user_service import AsyncUserService
+
+USER_ID_LOOKUPS = metrics.counter("user_id_lookups", "Telegram ID to user ID resolutions", ("result",))
+_CACHE_HITS = USER_ID_LOOKUPS.labels("hit")
+_CACHE_MISSES = USER_ID_LOOKUPS.labels("miss")
+
+
+class UserResolver:
+    """
+    In-process LRU cache of telegram_id -> user ID.
+
+    The mapping never changes once a user exists, so entries don't expire; the
+    cache is only bounded in size. Misses for the same telegram_id that arrive
+    together share one database round trip.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.USER_CACHE_MAX_ENTRIES,
+        get_or_create: Callable[[str], Awaitable[int]] = AsyncUserService.get_or_create_id,
+        get: Callable[[str], Awaitable[Optional[int]]] = AsyncUserService.get_id,
+    ):
+        self.max_entries = max_entries
+        self._get_or_create = get_or_create
+        self._get = get
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._single_flight = SingleFlight()
+
+    def _cached(self, telegram_id: str) -> Optional[int]:
+        user_id = self._entries.get(telegram_id)
+        if user_id is None:
+            _CACHE_MISSES.inc()
+            return None
+        self._entries.move_to_end(telegram_id)
+        _CACHE_HITS.inc()
+        return user_id
+
+    def _remember(self, telegram_id: str, user_id: Optional[int]) -> Optional[int]:
+        if user_id is not None:
+            self._entries[telegram_id] = user_id
+            self._entries.move_to_end(telegram_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user_id
+
+    async def resolve(self, telegram_id: str) -> int:
+        """Return the user ID for a Telegram account, registering the account on first sight."""
+        user_id = self._cached(telegram_id)
+        if user_id is not None:
+            return user_id
+
+        async def upsert() -> int:
+            return self._remember(telegram_id, await self._get_or_create(telegram_id))
+
+        return await self._single_flight.run(('upsert', telegram_id), upsert)
+
+    async def lookup(self, telegram_id: str) -> Optional[int]:
+        """Return the user ID for a Telegram account without registering it, or None if it is unknown."""
+        user_id = self._cached(telegram_id)
+        if user_id is not None:
+            return user_id
+
+        async def select() -> Optional[int]:
+            return self._remember(telegram_id, await self._get(telegram_id))
+
+        return await self._single_flight.run(('lookup', telegram_id), select)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,38 @@
+from typing import Optional
+
+from sqlalchemy import select, text
+
+from app.core.database import AsyncSessionLocal
+from app.models.user import User
+
+# The no-op update makes RETURNING report the existing row on conflict (DO NOTHING returns nothing),
+# so a first-time user costs one round trip, as does a concurrent insert of the same telegram_id
+UPSERT_USER_SQL = text("""
+    INSERT INTO users (telegram_id) VALUES (:telegram_id)
+    ON CONFLICT (telegram_id) DO UPDATE SET telegram_id = EXCLUDED.telegram_id
+    RETURNING id
+""")
+
+
+class AsyncUserService:
+    """Mapping between Telegram accounts and internal user IDs."""
+
+    @staticmethod
+    async def get_or_create_id(telegram_id: str) -> int:
+        """Return the user ID for a Telegram account, registering the account if it is new."""
+        async with AsyncSessionLocal() as db:
+            user_id = (await db.execute(UPSERT_USER_SQL, {'telegram_id': telegram_id})).scalar_one()
+            await db.commit()
+            return user_id
+
+    @staticmethod
+    async def get_id(telegram_id: str) -> Optional[int]:
+        """Return the user ID for a Telegram account, or None if it has never been seen."""
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(select(User.id).where(User.telegram_id == telegram_id))).scalar()
+
+    @staticmethod
+    async def get_data_version(user_id: int) -> int:
+        """Return the version of a user's expense data (0 for users without a row yet)."""
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(select(User.data_version).where(User.id == user_id))).scalar() or 0
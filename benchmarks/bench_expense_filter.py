@@ -0,0 +1,134 @@
+"""
+Micro-benchmark: per-call filter SQL vs. the shape-cached, parameterized statements.
+
+Usage:
+    python -m benchmarks.bench_expense_filter [--iterations N]
+
+Reports the Python-side cost of producing a statement for a random ExpenseFilter,
+both built and compiled the way Session.execute compiles it (through SQLAlchemy's
+compiled-statement cache, so repeated structures skip the full compile), and how
+many distinct SQL texts each approach sends to PostgreSQL (every distinct text is a
+separate plan the server has to build).
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql.psycopg import PGDialect_psycopg
+from sqlalchemy.util import LRUCache
+
+from app.models.expense import Expense
+from app.schemas.expense_filter import ExpenseFilter
+from app.services.expense_query import expense_query, expense_query_params, expense_sql, filter_shape
+
+DIALECT = PGDialect_psycopg()
+CATEGORIES = ["Food", "Transport", "Entertainment", "Health", "Other"]
+
+
+def random_filter(rng: random.Random) -> ExpenseFilter:
+    start = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 300))
+    return ExpenseFilter(
+        start_date=start if rng.random() < 0.5 else None,
+        end_date=start + timedelta(days=rng.randint(1, 60)) if rng.random() < 0.5 else None,
+        category=rng.choice(CATEGORIES) if rng.random() < 0.5 else None,
+        min_amount=round(rng.uniform(0, 50), 2) if rng.random() < 0.5 else None,
+        max_amount=round(rng.uniform(50, 500), 2) if rng.random() < 0.5 else None,
+    )
+
+
+def legacy_fstring_sql(user_id: int, filters: ExpenseFilter) -> str:
+    """The interpolated SQL the raw path used to build."""
+    conditions = [f"user_id = {user_id}"]
+    if filters.start_date:
+        conditions.append(f"added_at >= '{filters.start_date.isoformat()}'")
+    if filters.end_date:
+        conditions.append(f"added_at <= '{filters.end_date.isoformat()}'")
+    if filters.category:
+        conditions.append(f"category = '{filters.category}'")
+    if filters.min_amount is not None:
+        conditions.append(f"amount >= {filters.min_amount}")
+    if filters.max_amount is not None:
+        conditions.append(f"amount <= {filters.max_amount}")
+    return "SELECT * FROM expenses WHERE " + " AND ".join(conditions)
+
+
+def legacy_orm_statement(user_id: int, filters: ExpenseFilter):
+    """The ORM path's per-call query construction."""
+    query = select(Expense.__table__).where(Expense.user_id == user_id)
+    if filters.start_date:
+        query = query.where(Expense.added_at >= filters.start_date)
+    if filters.end_date:
+        query = query.where(Expense.added_at <= filters.end_date)
+    if filters.category:
+        query = query.where(Expense.category == filters.category)
+    if filters.min_amount is not None:
+        query = query.where(Expense.amount >= filters.min_amount)
+    if filters.max_amount is not None:
+        query = query.where(Expense.amount <= filters.max_amount)
+    return query.order_by(Expense.added_at.desc(), Expense.id.desc())
+
+
+def legacy_fstring_statement(user_id: int, filters: ExpenseFilter):
+    return text(legacy_fstring_sql(user_id, filters)), {}
+
+
+def legacy_orm(user_id: int, filters: ExpenseFilter):
+    # The values are bound inside the statement
+    return legacy_orm_statement(user_id, filters), {}
+
+
+def cached_statement(user_id: int, filters: ExpenseFilter):
+    return expense_query(filter_shape(filters)), expense_query_params(user_id, filters)
+
+
+def cached_sql(user_id: int, filters: ExpenseFilter):
+    return text(expense_sql(filter_shape(filters))), expense_query_params(user_id, filters)
+
+
+def execute_compile(statement, cache: LRUCache):
+    """
+    Compile `statement` the way Session.execute does before calling the driver
+    (SQLAlchemy's internal compiled-cache lookup, with a full compile on a miss).
+    """
+    compiled, *_ = statement._compile_w_cache(
+        dialect=DIALECT, compiled_cache=cache, column_keys=[], for_executemany=False, schema_translate_map=None
+    )
+    return compiled
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    filters = [random_filter(rng) for _ in range(args.iterations)]
+    user_ids = [rng.randint(1, 1000) for _ in range(args.iterations)]
+    pairs = list(zip(user_ids, filters))
+
+    approaches = {
+        "legacy f-string SQL": legacy_fstring_statement,
+        "legacy ORM build": legacy_orm,
+        "cached statement": cached_statement,
+        "cached SQL text": cached_sql,
+    }
+    print(f"{'approach':<22} {'build us/call':>14} {'build+compile us/call':>22} {'distinct SQL texts':>19}")
+    for name, build in approaches.items():
+        build_seconds = timeit.timeit(lambda: [build(user_id, f) for user_id, f in pairs], number=1)
+        cache = LRUCache(500)
+
+        def build_and_compile(user_id: int, f: ExpenseFilter):
+            statement, params = build(user_id, f)
+            return execute_compile(statement, cache), params
+
+        compile_seconds = timeit.timeit(lambda: [build_and_compile(user_id, f) for user_id, f in pairs], number=1)
+        texts = {str(build_and_compile(user_id, f)[0]) for user_id, f in pairs}
+        print(
+            f"{name:<22} {build_seconds / args.iterations * 1e6:>14.1f} "
+            f"{compile_seconds / args.iterations * 1e6:>22.1f} {len(texts):>19}"
+        )
+
+if __name__ == "__main__":
+    main()
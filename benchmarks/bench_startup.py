@@ -0,0 +1,60 @@
+"""
+Startup benchmark: import time, lifespan startup and the first request.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs N]
+
+Each run starts a fresh interpreter so module caches don't hide import cost.
+Reports the median of: `import app.main`, running the lifespan startup, and
+serving the first GET /api/v1/ through a TestClient. Requires the same
+environment (OPENAI_API_KEY, DATABASE_URL) as the application itself.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app.main.app)
+before_startup = time.perf_counter()
+client.__enter__()
+started = time.perf_counter()
+response = client.get("/api/v1/")
+served = time.perf_counter()
+client.__exit__(None, None, None)
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (started - before_startup) * 1000,
+    "first_request_ms": (served - started) * 1000,
+    "status": response.status_code,
+    "langchain_loaded": "langchain_openai" in sys.modules,
+}))
+"""
+
+
+def run_once() -> dict:
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    print(f"{'stage':<20}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for stage in ("import_ms", "startup_ms", "first_request_ms"):
+        values = [run[stage] for run in runs]
+        print(f"{stage:<20}{statistics.median(values):>12.1f}{min(values):>10.1f}{max(values):>10.1f}")
+    print(f"first request status: {runs[-1]['status']}")
+
+
+if __name__ == "__main__":
+    main()
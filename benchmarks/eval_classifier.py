@@ -0,0 +1,151 @@
+"""
+Offline evaluation: the local category classifier vs. the LLM on held-out expenses.
+
+Usage:
+    python -m benchmarks.eval_classifier [--csv expenses.csv] [--model PATH] [--per-user]
+                                         [--min-confidence 0.9] [--llm N]
+
+Labeled expenses come from the expenses table, or from a CSV file with
+user_id, description and category columns. Without --model a classifier is
+trained on 90% of them; the rest is the evaluation set. --llm N also sends
+the first N evaluation descriptions to the configured model (OPENAI_* settings;
+point OPENAI_BASE_URL at benchmarks.fake_openai for a dry run) with the
+production prompt, and reports the accuracy of the LLM alone and of the
+classifier-then-LLM pipeline on the same rows.
+
+Note that stored categories were mostly chosen by the LLM in the first place,
+so "accuracy" is agreement with past labels rather than ground truth.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.commands.train_classifier import split_holdout
+from app.core.config import settings
+from app.services.category_classifier import CategoryClassifier, evaluate
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def load_examples(csv_path: Optional[str]) -> list[tuple[Optional[int], str, str]]:
+    if csv_path is None:
+        from app.services.expense_service import ExpenseService
+
+        return ExpenseService.get_labeled_descriptions()
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        return [
+            (int(row["user_id"]) if row.get("user_id") else None, row["description"], row["category"])
+            for row in csv.DictReader(file)
+        ]
+
+
+async def ask_llm(examples: list, categories: list[str]) -> tuple[list[Optional[str]], float]:
+    """Categorize descriptions with the production prompt; returns the answers and mean latency."""
+    from langchain_core.messages import HumanMessage
+
+    from app.services.ai_service import _parse_llm_json
+    from app.services.category_cache import CategorySnapshot
+    from app.services.registry import create_chat_model, create_http_client
+
+    snapshot = CategorySnapshot.from_names(categories)
+    http_client = create_http_client()
+    llm = create_chat_model(http_client)
+    options = {'response_format': {'type': 'json_object'}} if settings.LLM_OUTPUT_MODE == "json" else {}
+    if settings.LLM_OUTPUT_MODE == "tools":
+        options = {
+            'tools': [snapshot.expense_tool],
+            'tool_choice': {'type': 'function', 'function': {'name': snapshot.expense_tool['function']['name']}},
+        }
+    semaphore = asyncio.Semaphore(8)
+
+    async def categorize(description: str) -> tuple[Optional[str], float]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await llm.ainvoke([snapshot.system_message, HumanMessage(content=description)], **options)
+                category = _parse_llm_json(response).get('category')
+            except Exception as e:
+                print(f"LLM call failed: {e}")
+                category = None
+            return category, time.perf_counter() - started
+
+    try:
+        answers = await asyncio.gather(*(categorize(description) for _, description, _ in examples))
+    finally:
+        await http_client.aclose()
+    latencies = [latency for _, latency in answers]
+    return [category for category, _ in answers], sum(latencies) / max(len(latencies), 1)
+
+
+def compare_with_llm(classifier: CategoryClassifier, examples: list, min_confidence: float) -> dict:
+    answers, latency = asyncio.run(ask_llm(examples, classifier.categories))
+    llm_correct = pipeline_correct = 0
+    for (user_id, description, category), llm_category in zip(examples, answers):
+        llm_correct += llm_category == category
+        predicted, confidence = classifier.predict(description, user_id)
+        pipeline_correct += (predicted if confidence >= min_confidence else llm_category) == category
+    total = len(examples) or 1
+    return {
+        'examples': len(examples),
+        'llm_accuracy': llm_correct / total,
+        'pipeline_accuracy': pipeline_correct / total,
+        'llm_mean_latency_ms': latency * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="Labeled expenses (user_id, description, category) instead of the database")
+    parser.add_argument("--model", help="Evaluate this trained model on every example instead of training one")
+    parser.add_argument("--per-user", action="store_true")
+    parser.add_argument("--holdout", type=float, default=0.1)
+    parser.add_argument("--min-confidence", type=float, default=settings.CATEGORY_CLASSIFIER_MIN_CONFIDENCE)
+    parser.add_argument("--llm", type=int, default=0, metavar="N", help="Also ask the LLM about N held-out expenses")
+    parser.add_argument("--output", help="Report file (default: benchmarks/results/eval_classifier-<timestamp>.json)")
+    args = parser.parse_args()
+
+    examples = load_examples(args.csv)
+    if args.model:
+        classifier, evaluation_set = CategoryClassifier.load(args.model), examples
+    else:
+        train, evaluation_set = split_holdout(examples, args.holdout)
+        started = time.perf_counter()
+        classifier = CategoryClassifier.train(train, args.per_user)
+        print(f"Trained on {len(train)} expenses in {time.perf_counter() - started:.1f}s")
+
+    report = {'classifier': evaluate(classifier, evaluation_set, args.min_confidence)}
+    result = report['classifier']
+    print(
+        f"Classifier: {result['accuracy']:.1%} accuracy on {result['examples']} expenses, "
+        f"{result['predict_microseconds']:.0f} µs per prediction"
+    )
+    if result['confident_accuracy'] is not None:
+        print(
+            f"  confidence >= {args.min_confidence}: answers {result['coverage']:.1%} without the LLM, "
+            f"{result['confident_accuracy']:.1%} of them correct"
+        )
+
+    if args.llm:
+        report['llm'] = compare_with_llm(classifier, evaluation_set[:args.llm], args.min_confidence)
+        llm = report['llm']
+        print(
+            f"LLM: {llm['llm_accuracy']:.1%} accuracy on {llm['examples']} expenses, "
+            f"{llm['llm_mean_latency_ms']:.0f} ms per call"
+        )
+        print(f"Classifier, then LLM below the threshold: {llm['pipeline_accuracy']:.1%} accuracy")
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"eval_classifier-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Saved report to {output}")
+
+
+if __name__ == "__main__":
+    main()
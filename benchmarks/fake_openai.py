@@ -0,0 +1,137 @@
+"""
+A local OpenAI-compatible chat completions server for benchmarks and load tests.
+
+Usage:
+    python -m benchmarks.fake_openai [--port 8900] [--latency-ms 300] [--jitter-ms 50] [--error-rate 0] [--prose-rate 0]
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1. Every call
+sleeps for the configured latency (like a real model would) and answers with
+canned expense JSON: a single object for /messages/analyze prompts, and an array
+with one item per input for batch prompts. Calls that pass tools get the answer
+as a tool call. --prose-rate wraps a fraction of plain-text answers in prose, the
+way real models sometimes do unless JSON mode or tool calling is used.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+CANNED_EXPENSES = [
+    {"amount": 45, "category": "Food", "description": "Dinner with friends"},
+    {"amount": 12.5, "category": "Transport", "description": "Taxi to the airport"},
+    {"amount": 30, "category": "Entertainment", "description": "Concert tickets"},
+    {"amount": 60, "category": "Health", "description": "Doctor appointment"},
+    {"amount": 80, "category": "Utilities", "description": "Electricity bill"},
+]
+
+
+def _canned_for(text: str) -> dict:
+    """Pick a canned answer deterministically, so the same message always gets the same result."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=2).digest()
+    return dict(CANNED_EXPENSES[int.from_bytes(digest, "big") % len(CANNED_EXPENSES)])
+
+
+def _answer(user_content: str) -> str:
+    try:
+        items = json.loads(user_content)
+    except ValueError:
+        items = None
+    if isinstance(items, list):
+        return json.dumps([
+            {"index": item.get("index"), **_canned_for(str(item.get("message", "")))}
+            for item in items
+            if isinstance(item, dict)
+        ])
+    return json.dumps(_canned_for(user_content))
+
+
+def create_app(
+    latency_ms: float = 300.0, jitter_ms: float = 0.0, error_rate: float = 0.0, prose_rate: float = 0.0
+) -> Starlette:
+    """Build the fake server; latency is latency_ms ± jitter_ms per call."""
+    stats = {"requests": 0, "errors": 0}
+
+    async def chat_completions(request: Request) -> JSONResponse:
+        body = await request.json()
+        stats["requests"] += 1
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0.0) / 1000
+        await asyncio.sleep(delay)
+
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                {"error": {"message": "Simulated overload", "type": "server_error"}}, status_code=503
+            )
+
+        messages = body.get("messages", [])
+        user_content = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        content = _answer(user_content)
+        message = {"role": "assistant", "content": content}
+        tools = body.get("tools")
+        if tools:
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{stats['requests']}",
+                "type": "function",
+                "function": {"name": tools[0]["function"]["name"], "arguments": content},
+            }]}
+        elif body.get("response_format") is None and prose_rate and random.random() < prose_rate:
+            message["content"] = f"Sure! Here is the expense:\n```json\n{content}\n```"
+        prompt_characters = sum(len(str(m.get("content", ""))) for m in messages)
+        if tools:
+            prompt_characters += len(json.dumps(tools))
+        prompt_tokens = prompt_characters // 4
+        completion_tokens = len(content) // 4
+        return JSONResponse({
+            "id": f"chatcmpl-fake-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tools else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    async def get_stats(request: Request) -> JSONResponse:
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/stats", get_stats),
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503")
+    parser.add_argument("--prose-rate", type=float, default=0.0, help="Fraction of text answers wrapped in prose")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.prose_rate),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Load test: drive POST /api/v1/messages/analyze on the real app at fixed concurrency levels.
+
+Usage:
+    python -m benchmarks.load_test [--concurrency 1 8 32 64] [--requests 400]
+                                   [--llm-latency-ms 300] [--llm-jitter-ms 50]
+                                   [--database-url postgresql://...] [--workers N]
+                                   [--baseline results.json]
+
+The app runs under the production launcher (app.commands.serve, --workers
+processes, 1 by default), talking to benchmarks.fake_openai (also its own
+process) instead of OpenAI. Storage is either a real database
+(--database-url; the schema is created and categories are seeded) or, by default,
+an in-memory stand-in for the expense and category services with a configurable
+write latency. Messages are distinct, so every request takes the LLM path unless
+--distinct-messages limits them.
+
+Reports p50/p95/p99 latency and requests per second per concurrency level, and
+saves the results as JSON. With --baseline, the run is compared against an
+earlier results file and exits 1 when p95 or throughput regressed by more than
+--max-regression percent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+CATEGORIES = ["Food", "Transport", "Entertainment", "Health", "Utilities", "Housing", "Other"]
+_THINGS = ["dinner", "a taxi", "concert tickets", "the doctor", "the electricity bill", "groceries", "a gift"]
+_PEOPLE = ["friends", "my sister", "the team", "a client", "my parents"]
+
+
+def message_for(index: int) -> str:
+    """A message the rule-based parser can't handle, distinct for every index."""
+    return (
+        f"Paid {10 + index % 490}.{index % 100:02d} for {_THINGS[index % len(_THINGS)]} "
+        f"with {_PEOPLE[index % len(_PEOPLE)]}, ref {index}"
+    )
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class InMemoryExpenseStore:
+    """
+    Stand-in for the database behind AsyncExpenseService and AsyncExpenseCategoryService,
+    so the load test measures the app and not a particular database server.
+    """
+
+    def __init__(self, write_latency_ms: float = 2.0):
+        self.write_latency = write_latency_ms / 1000
+        self._next_id = 0
+
+    def _saved(self, expense_data):
+        from app.models.expense import Expense
+
+        self._next_id += 1
+        return Expense(
+            id=self._next_id,
+            user_id=expense_data.user_id,
+            description=expense_data.description,
+            amount=expense_data.amount,
+            category=expense_data.category,
+            added_at=datetime.utcnow(),
+        )
+
+    async def create_expense(self, expense_data):
+        await asyncio.sleep(self.write_latency)
+        return self._saved(expense_data)
+
+    async def create_expenses(self, expenses):
+        await asyncio.sleep(self.write_latency)
+        return [self._saved(expense_data) for expense_data in expenses]
+
+    async def get_all_categories(self):
+        from app.models.expense_category import ExpenseCategory
+
+        return [ExpenseCategory(id=index, name=name) for index, name in enumerate(CATEGORIES, start=1)]
+
+    def install(self) -> None:
+        """Route the async services to this store. Must run before app.main is imported."""
+        from app.services.expense_category_service import AsyncExpenseCategoryService
+        from app.services.expense_service import AsyncExpenseService
+
+        AsyncExpenseService.create_expense = self.create_expense
+        AsyncExpenseService.create_expenses = self.create_expenses
+        AsyncExpenseCategoryService.get_all_categories = self.get_all_categories
+
+
+def prepare_database() -> None:
+    """Create the schema and seed the category catalog if it is empty."""
+    from app.core.database import SessionLocal, create_schema
+    from app.models.expense_category import ExpenseCategory
+
+    create_schema()
+    db = SessionLocal()
+    try:
+        if db.query(ExpenseCategory).count() == 0:
+            db.add_all([ExpenseCategory(name=name) for name in CATEGORIES])
+            db.commit()
+    finally:
+        db.close()
+
+
+def create_app():
+    """App factory for serve-app; runs in every worker process, so each one gets its own store."""
+    if os.environ.get("LOAD_TEST_STORE", "memory") == "memory":
+        InMemoryExpenseStore(float(os.environ.get("LOAD_TEST_WRITE_LATENCY_MS", "2"))).install()
+    from app.main import app
+
+    return app
+
+
+def serve_app(args: argparse.Namespace) -> None:
+    """Run the application with the production launcher (the "serve-app" subcommand used by the harness)."""
+    from app.commands.serve import serve
+
+    if args.store == "db":
+        prepare_database()
+    os.environ['LOAD_TEST_STORE'] = args.store
+    os.environ['LOAD_TEST_WRITE_LATENCY_MS'] = str(args.write_latency_ms)
+    serve(
+        "benchmarks.load_test:create_app", host="127.0.0.1", port=args.port, workers=args.workers,
+        factory=True, access_log=False, log_level="warning",
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, log_path: Path, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}; see {log_path}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s; see {log_path}")
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, requests: int, offset: int, distinct: int) -> dict:
+    """Send `requests` analyze calls from `concurrency` concurrent workers."""
+    latencies: list[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = offset + next_index
+            next_index += 1
+            body = {"message": message_for(index % distinct if distinct else index), "user_id": 1 + index % 50}
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/messages/analyze", json=body)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def drive(base_url: str, args: argparse.Namespace) -> list[dict]:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        # Warm up connections, the category cache and the LLM client before measuring
+        await run_level(client, min(8, max(args.concurrency)), args.warmup, 10_000_000, args.distinct_messages)
+        results = []
+        offset = 0
+        for concurrency in args.concurrency:
+            result = await run_level(client, concurrency, args.requests, offset, args.distinct_messages)
+            offset += args.requests
+            results.append(result)
+            print(
+                f"{result['concurrency']:>11} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} "
+                f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['errors']:>7}",
+                flush=True,
+            )
+        return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> bool:
+    """Print the change against a baseline run; return False if any level regressed too much."""
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    ok = True
+    print(f"\nvs. baseline {baseline.get('git_commit')} ({baseline.get('timestamp')}):")
+    for level in results['levels']:
+        before = previous.get(level['concurrency'])
+        if before is None:
+            continue
+        p95_change = (level['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+        rps_change = (level['rps'] - before['rps']) / before['rps'] * 100
+        regressed = p95_change > max_regression or -rps_change > max_regression
+        ok = ok and not regressed
+        print(
+            f"  concurrency {level['concurrency']:>4}: p95 {p95_change:+.1f}%, rps {rps_change:+.1f}%"
+            + ("  REGRESSION" if regressed else "")
+        )
+    return ok
+
+
+def run(args: argparse.Namespace) -> int:
+    fake_port, app_port = _free_port(), _free_port()
+    log_dir = Path(tempfile.mkdtemp(prefix="load_test_"))
+    env = {
+        **os.environ,
+        'OPENAI_API_KEY': 'sk-load-test',
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{fake_port}/v1",
+        'DATABASE_URL': args.database_url or f"sqlite:///{log_dir / 'unused.db'}",
+        'LLM_CACHE_ENABLED': 'true' if args.llm_cache else 'false',
+        'LOG_LEVEL': 'WARNING',
+    }
+    processes: list[subprocess.Popen] = []
+    try:
+        fake_log = log_dir / "fake_openai.log"
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(fake_port),
+             "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms)],
+            stdout=fake_log.open("w"), stderr=subprocess.STDOUT,
+        ))
+        _wait_until_ready(f"http://127.0.0.1:{fake_port}/stats", processes[-1], fake_log)
+
+        app_log = log_dir / "app.log"
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.load_test", "serve-app", "--port", str(app_port),
+             "--store", "db" if args.database_url else "memory", "--write-latency-ms", str(args.write_latency_ms),
+             "--workers", str(args.workers)],
+            stdout=app_log.open("w"), stderr=subprocess.STDOUT, env=env,
+        ))
+        _wait_until_ready(f"http://127.0.0.1:{app_port}/api/v1/", processes[-1], app_log)
+
+        print(f"LLM latency {args.llm_latency_ms}±{args.llm_jitter_ms} ms, "
+              f"storage: {'database' if args.database_url else f'in-memory ({args.write_latency_ms} ms writes)'}, "
+              f"{args.workers} app worker(s), {args.requests} requests per level")
+        print(f"{'concurrency':>11} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        levels = asyncio.run(drive(f"http://127.0.0.1:{app_port}", args))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+        'git_commit': _git_commit(),
+        'config': {
+            'requests_per_level': args.requests,
+            'llm_latency_ms': args.llm_latency_ms,
+            'llm_jitter_ms': args.llm_jitter_ms,
+            'storage': 'database' if args.database_url else 'memory',
+            'write_latency_ms': None if args.database_url else args.write_latency_ms,
+            'llm_cache': args.llm_cache,
+            'distinct_messages': args.distinct_messages,
+            'workers': args.workers,
+        },
+        'levels': levels,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load_test-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"\nSaved results to {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if not compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "serve-app":
+        parser = argparse.ArgumentParser(prog="load_test serve-app")
+        parser.add_argument("serve_app")
+        parser.add_argument("--port", type=int, required=True)
+        parser.add_argument("--store", choices=["memory", "db"], default="memory")
+        parser.add_argument("--write-latency-ms", type=float, default=2.0)
+        parser.add_argument("--workers", type=int, default=1)
+        serve_app(parser.parse_args())
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=400, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--database-url", help="Use this database instead of the in-memory stand-in")
+    parser.add_argument("--write-latency-ms", type=float, default=2.0, help="Latency of the in-memory store")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM result cache enabled")
+    parser.add_argument("--workers", type=int, default=1, help="App worker processes (python -m app.commands.serve)")
+    parser.add_argument("--distinct-messages", type=int, default=0, help="Cycle through N messages (0 = all distinct)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load_test-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed p95/RPS regression in percent")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
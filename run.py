@@ -6,6 +6,9 @@ if __name__ == "__main__":
     
     Use this script as an entry point to run the API server directly:
     python run.py
+    
+    This is a single auto-reloading process meant for development;
+    production uses python -m app.commands.serve.
     """
     uvicorn.run(
         "app.main:app",
@@ -0,0 +1,339 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.models.expense import Expense
+from app.services.ai_service import AIService
+from app.services.category_cache import CategoryCache, CategorySnapshot
+from app.services.category_classifier import CategoryClassifier
+from app.services.llm_cache import LLMResultCache
+
+
+async def _categories():
+    return ["Food", "Transport"]
+
+
+def _saved_expense(expense_data):
+    return Expense(
+        id=1,
+        user_id=expense_data.user_id,
+        description=expense_data.description,
+        amount=expense_data.amount,
+        category=expense_data.category,
+        added_at=datetime.utcnow(),
+    )
+
+
+class SlowLLM:
+    """Stand-in for ChatOpenAI whose async call takes a fixed amount of time."""
+
+    model_name = "fake-model"
+
+    def __init__(self, content: str, delay: float = 0.2):
+        self.content = content
+        self.delay = delay
+        self.calls = []
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(content=self.content)
+
+    def invoke(self, messages):
+        raise AssertionError("process_message must not call the blocking invoke()")
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_process_message_uses_async_llm(mock_create):
+    """
+    process_message awaits the LLM and returns the saved expense.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM('{"amount": 45, "category": "Food", "description": "Dinner with friends"}', delay=0)
+
+    result = await service.process_message("Had dinner with friends, paid 45 bucks", 1)
+
+    assert result == {"amount": 45, "category": "Food", "description": "Dinner with friends", "source": "llm"}
+    mock_create.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_process_message_runs_concurrently(mock_create):
+    """
+    Concurrent messages overlap their LLM round-trips instead of queueing behind each other.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM('{"amount": 12, "category": "Transport", "description": "Uber"}', delay=0.2)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(service.process_message("Took an uber home after the party, 12 bucks", 1) for _ in range(5))
+    )
+    elapsed = time.perf_counter() - start
+
+    assert all(result["category"] == "Transport" for result in results)
+    assert elapsed < 0.6
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_process_message_fast_path_skips_llm(mock_create):
+    """
+    Simple messages are handled by the rule-based parser without calling the LLM.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM("not used")
+    service.llm.ainvoke = None
+
+    result = await service.process_message("uber $12,30", 1)
+
+    assert result == {"amount": 12.3, "category": "Transport", "description": "uber", "source": "rules"}
+    assert service.fast_path.hits == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_process_message_reuses_cached_llm_result(mock_create):
+    """
+    A repeated message is answered from the result cache, and cached calls pin the temperature.
+    """
+    service = AIService(
+        category_cache=CategoryCache(loader=_categories),
+        result_cache=LLMResultCache(),
+    )
+    service.llm = SlowLLM('{"amount": 45, "category": "Food", "description": "Dinner with friends"}', delay=0)
+
+    first = await service.process_message("Had dinner with friends, paid 45 bucks", 1)
+    second = await service.process_message("  had DINNER with friends,   paid 45.00 bucks", 1)
+
+    assert first["source"] == "llm"
+    assert second["source"] == "cache"
+    assert len(service.llm.calls) == 1
+    assert service.llm.calls[0]["temperature"] == 0.0
+    assert service.stats()["llm_cache"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_identical_concurrent_messages_share_one_analysis(mock_create):
+    """
+    Concurrent identical (user_id, message) requests share one LLM call and one insert.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM('{"amount": 12, "category": "Transport", "description": "Uber"}', delay=0.05)
+    message = "Took an uber home after the party, 12 bucks"
+
+    results = await asyncio.gather(
+        *(service.process_message(message, 1) for _ in range(4)),
+        service.process_message(message, 2),
+    )
+
+    assert all(result["category"] == "Transport" for result in results)
+    assert len(service.llm.calls) == 2
+    assert mock_create.call_count == 2
+    assert service.stats()["dedup"]["in_flight_shared"] == 3
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_idempotency_key_replays_original_result(mock_create):
+    """
+    A retry with the same idempotency key returns the original result without new work;
+    failed attempts are not remembered.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM("not json", delay=0)
+
+    failed = await service.process_message("Had dinner with friends, paid 45 bucks", 1, idempotency_key="update-7")
+    service.llm.content = '{"amount": 45, "category": "Food", "description": "Dinner with friends"}'
+    first = await service.process_message("Had dinner with friends, paid 45 bucks", 1, idempotency_key="update-7")
+    replay = await service.process_message("Had dinner with friends, paid 45 bucks", 1, idempotency_key="update-7")
+
+    assert "error" in failed
+    assert replay == first
+    assert len(service.llm.calls) == 2
+    mock_create.assert_called_once()
+    assert service.stats()["dedup"]["idempotent_replays"] == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_idempotency_key_reused_for_another_message_is_refused(mock_create):
+    """
+    The same key sent with a different message is flagged as a conflict instead of replaying the first result.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM('{"amount": 45, "category": "Food", "description": "Dinner with friends"}', delay=0)
+
+    await service.process_message("Had dinner with friends, paid 45 bucks", 1, idempotency_key="update-7")
+    reused = await service.process_message("Took an uber home, 12 bucks", 1, idempotency_key="update-7")
+    other_user = await service.process_message("Took an uber home, 12 bucks", 2, idempotency_key="update-7")
+
+    assert reused["idempotency_conflict"] is True
+    assert "error" not in other_user
+    assert mock_create.call_count == 2
+    assert service.stats()["dedup"]["idempotent_replays"] == 0
+
+
+class BatchLLM:
+    """Stand-in for ChatOpenAI that answers batch prompts with one item per input message."""
+
+    model_name = "fake-model"
+
+    def __init__(self, wrap: str = "{}"):
+        self.calls = 0
+        self.wrap = wrap
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        items = json.loads(messages[-1].content)
+        answers = [
+            {"index": item["index"], "amount": 20, "category": "Food", "description": item["message"]}
+            for item in items
+            if "gibberish" not in item["message"]
+        ]
+        return SimpleNamespace(content=self.wrap.format(json.dumps(answers)))
+
+
+def _saved_expenses(expenses):
+    return [_saved_expense(expense) for expense in expenses]
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.settings.BATCH_ANALYZE_CHUNK_SIZE", 2)
+@patch("app.services.ai_service.AsyncExpenseService.create_expenses", side_effect=_saved_expenses)
+async def test_process_batch_chunks_llm_calls_and_inserts_once(mock_create):
+    """
+    A batch sends one prompt per chunk, saves every valid expense in one insert and reports per-item errors.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = BatchLLM()
+    messages = [
+        "coffee 4.5",
+        "Dinner with the team downtown",
+        "",
+        "Groceries for the whole week",
+        "gibberish text",
+        "Snacks at the cinema",
+    ]
+
+    results = await service.process_batch(messages, 1)
+
+    assert service.llm.calls == 2
+    mock_create.assert_called_once()
+    assert len(mock_create.call_args.args[0]) == 4
+    assert [result["success"] for result in results] == [True, True, False, True, False, True]
+    assert results[0]["expense"]["source"] == "rules"
+    assert results[1]["expense"]["source"] == "llm"
+    assert results[2]["error"] == "Message cannot be empty"
+    assert results[4]["error"] == "Could not analyze message as expense"
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expenses", side_effect=_saved_expenses)
+async def test_process_batch_reads_array_wrapped_in_prose(mock_create):
+    """
+    A batch reply with prose or a code fence around the JSON array is still used.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = BatchLLM(wrap="Here are the expenses:\n```json\n{}\n```")
+
+    results = await service.process_batch(["Dinner with the team downtown", "Groceries for the whole week"], 1)
+
+    assert [result["success"] for result in results] == [True, True]
+    assert results[0]["expense"]["source"] == "llm"
+
+
+class ToolCallLLM(SlowLLM):
+    """Stand-in for ChatOpenAI that answers through a tool call, like OpenAI does with tool_choice."""
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls.append(kwargs)
+        name = kwargs['tool_choice']['function']['name']
+        call = {'id': 'call_1', 'type': 'function', 'function': {'name': name, 'arguments': self.content}}
+        return SimpleNamespace(content='', additional_kwargs={'tool_calls': [call]})
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_process_message_reads_json_wrapped_in_prose(mock_create):
+    """
+    In text mode a JSON object surrounded by prose or a code fence is still used.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories), output_mode="text")
+    service.llm = SlowLLM(
+        'Sure! Here is the expense:\n```json\n{"amount": 45, "category": "Food", "description": "Dinner"}\n```',
+        delay=0,
+    )
+
+    result = await service.process_message("Had dinner with friends, paid 45 bucks", 1)
+
+    assert result["category"] == "Food"
+    assert "response_format" not in service.llm.calls[0]
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_process_message_structured_output_modes(mock_create):
+    """
+    JSON mode asks for a JSON object; tool mode forces record_expense with the categories as an enum.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories), output_mode="json")
+    service.llm = SlowLLM('{"amount": 45, "category": "Food", "description": "Dinner"}', delay=0)
+    await service.process_message("Had dinner with friends, paid 45 bucks", 1)
+    assert service.llm.calls[0]["response_format"] == {"type": "json_object"}
+
+    service = AIService(category_cache=CategoryCache(loader=_categories), output_mode="tools")
+    service.llm = ToolCallLLM('{"amount": 12, "category": "Transport", "description": "Uber"}', delay=0)
+    result = await service.process_message("Took an uber home after the party, 12 bucks", 1)
+
+    assert result == {"amount": 12, "category": "Transport", "description": "Uber", "source": "llm"}
+    tool = service.llm.calls[0]["tools"][0]["function"]
+    assert tool["name"] == "record_expense"
+    assert tool["parameters"]["properties"]["category"]["enum"] == ["Food", "Transport", "unknown"]
+    assert tool["parameters"]["properties"]["amount"] == {"type": "number", "minimum": 0, "maximum": 999999999999.99}
+    assert set(tool["parameters"]["required"]) == {"amount", "category", "description"}
+
+
+def test_compact_and_tool_prompts_are_shorter():
+    """
+    The compact prompt is a fraction of the default one, and the tool prompt leaves the categories to the schema.
+    """
+    names = ["Food", "Transport", "Entertainment", "Health", "Utilities", "Other"]
+    default = CategorySnapshot.from_names(names, "text", compact=False).system_message.content
+    compact = CategorySnapshot.from_names(names, "json", compact=True).system_message.content
+    tools = CategorySnapshot.from_names(names, "tools", compact=True).system_message.content
+
+    assert len(compact) < len(default) / 2
+    assert "JSON" in compact
+    assert "Transport" not in tools
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_process_message_uses_confident_classifier(mock_create):
+    """
+    The local classifier answers messages it is confident about; the rest still go to the LLM.
+    """
+    classifier = CategoryClassifier.train(
+        [(1, "dinner with friends", "Food"), (1, "taxi to the airport", "Transport")] * 20
+    )
+    service = AIService(
+        category_cache=CategoryCache(loader=_categories), classifier=classifier, classifier_min_confidence=0.8
+    )
+    service.llm = SlowLLM('{"amount": 9, "category": "Transport", "description": "Tolls"}', delay=0)
+
+    result = await service.process_message("Had dinner with friends, paid 45 bucks", 1)
+    assert result == {"amount": 45.0, "category": "Food", "description": "Had dinner with friends", "source": "classifier"}
+    assert service.llm.calls == []
+
+    result = await service.process_message("Highway tolls on the way back, 9 dollars", 1)
+    assert result["source"] == "llm"
+    assert service.stats()["classifier"] == {"hits": 1, "misses": 1}
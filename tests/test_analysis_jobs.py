@@ -0,0 +1,252 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_job_worker
+from app.services.ai_service import AIService
+from app.services.analysis_job_worker import AnalysisJobWorker
+from app.services.category_cache import CategoryCache
+from tests.test_ai_service import SlowLLM, _categories, _saved_expense
+
+
+def _job(job_id: str, message: str, attempts: int = 1, result=None):
+    return SimpleNamespace(
+        id=job_id, user_id=1, message=message, idempotency_key=None,
+        attempts=attempts, created_at=datetime.now(timezone.utc), result=result,
+    )
+
+
+class InMemoryQueue:
+    """Stand-in for AsyncAnalysisJobService's claim/finish/retry/fail_exhausted/save_expense."""
+
+    def __init__(self, jobs):
+        self.jobs = list(jobs)
+        self.finished = {}
+        self.retried = {}
+        self.saved = {}
+        self.sweeps = 0
+        self.claims = {}
+
+    async def claim(self, limit, lease_seconds, max_attempts):
+        claimed, self.jobs = self.jobs[:limit], self.jobs[limit:]
+        for job in claimed:
+            self.claims[job.id] = job.attempts
+        return claimed
+
+    def _holds_claim(self, job_id, attempts):
+        return self.claims.get(job_id, attempts) == attempts
+
+    async def finish(self, job_id, attempts, result=None, error=None):
+        if not self._holds_claim(job_id, attempts):
+            return False
+        self.finished[job_id] = (result, error)
+        return True
+
+    async def retry(self, job_id, attempts, delay_seconds, error):
+        if not self._holds_claim(job_id, attempts):
+            return False
+        self.retried[job_id] = (delay_seconds, error)
+        return True
+
+    async def fail_exhausted(self, max_attempts):
+        self.sweeps += 1
+        return 0
+
+    async def save_expense(self, job_id, attempts, expense, source):
+        if not self._holds_claim(job_id, attempts) or job_id in self.saved:
+            return None
+        self.saved[job_id] = (expense, source)
+        return _saved_expense(expense)
+
+
+def _worker(service, queue, **kwargs):
+    return AnalysisJobWorker(
+        service, concurrency=2, poll_interval=0.01,
+        claim=queue.claim, finish=queue.finish, retry=queue.retry,
+        fail_exhausted=queue.fail_exhausted, save_expense=queue.save_expense, **kwargs
+    )
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_worker_runs_queued_jobs(mock_create):
+    """
+    Workers claim queued jobs, analyze them, save their expenses through the job and record their results.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM('{"amount": 45, "category": "Food", "description": "Dinner with friends"}', delay=0.01)
+    queue = InMemoryQueue([_job("a", "Had dinner with friends, paid 45 bucks"), _job("b", "Dinner with friends 45")])
+    worker = _worker(service, queue)
+
+    worker.start()
+    for _ in range(100):
+        if len(queue.finished) == 2:
+            break
+        await asyncio.sleep(0.01)
+    await worker.aclose()
+
+    assert queue.finished["a"][0]["category"] == "Food"
+    assert queue.finished["a"][1] is None
+    assert queue.finished["b"][0]["amount"] == 45
+    assert queue.saved["a"][1] == "llm"
+    assert queue.saved["b"][0].amount == 45
+    mock_create.assert_not_called()
+    assert queue.sweeps == 1
+
+
+@pytest.mark.asyncio
+async def test_reclaimed_job_with_saved_expense_is_not_analyzed_again():
+    """
+    When an attempt saved the expense but lost its lease before finishing, the next claim
+    records the saved result instead of inserting the expense a second time.
+    """
+    service = MagicMock()
+    service.process_message = AsyncMock()
+    queue = InMemoryQueue([])
+    worker = _worker(service, queue)
+    saved = {'amount': 45.0, 'category': 'Food', 'description': 'Dinner with friends', 'source': 'llm'}
+
+    await worker.run_job(_job("a", "Dinner 45", attempts=2, result=saved))
+
+    service.process_message.assert_not_called()
+    assert queue.finished["a"] == (saved, None)
+
+
+@pytest.mark.asyncio
+async def test_worker_requeues_when_llm_is_unavailable():
+    """
+    A job that hit an overloaded LLM goes back to the queue until it runs out of attempts;
+    other errors fail the job straight away.
+    """
+    service = MagicMock()
+    service.process_message = AsyncMock(return_value={
+        'amount': 0, 'category': 'unknown', 'description': 'x', 'error': 'LLM is overloaded', 'retry_after': 2.0
+    })
+    queue = InMemoryQueue([])
+    worker = _worker(service, queue, max_attempts=3)
+
+    await worker.run_job(_job("early", "Dinner", attempts=1))
+    await worker.run_job(_job("last", "Dinner", attempts=3))
+
+    assert queue.retried["early"][0] >= 2.0
+    assert queue.finished["last"] == (None, "LLM is overloaded")
+
+    service.process_message = AsyncMock(side_effect=RuntimeError("boom"))
+    await worker.run_job(_job("crashed", "Dinner", attempts=1))
+    assert queue.finished["crashed"] == (None, "boom")
+
+
+@pytest.mark.asyncio
+async def test_worker_does_not_record_outcome_after_losing_its_lease():
+    """
+    A run whose lease expired while it worked doesn't overwrite the outcome of the claim that took the job over.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.process_message = AsyncMock(return_value={'amount': 5, 'category': 'Food', 'description': 'x'})
+    queue = InMemoryQueue([])
+    queue.claims["slow"] = 2
+    worker = _worker(service, queue)
+
+    await worker.run_job(_job("slow", "Coffee 5", attempts=1))
+
+    assert "slow" not in queue.finished
+
+
+def test_exhausted_jobs_are_failed_instead_of_claimed_again():
+    """
+    An expired lease is only reclaimed while attempts are left, and the outcome of a run
+    only counts if the job is still held by that run's claim.
+    """
+    from app.services.analysis_job_service import (
+        CLAIM_JOBS_SQL, FAIL_EXHAUSTED_JOBS_SQL, FINISH_JOB_SQL, RETRY_JOB_SQL, SAVE_EXPENSE_SQL,
+    )
+
+    assert "lease_expires_at < now() AND attempts < :max_attempts" in str(CLAIM_JOBS_SQL)
+    assert "attempts >= :max_attempts" in str(FAIL_EXHAUSTED_JOBS_SQL)
+    assert "AND status = 'running' AND attempts = :attempts AND expense_id IS NULL" in str(SAVE_EXPENSE_SQL)
+    for sql in (FINISH_JOB_SQL, RETRY_JOB_SQL):
+        assert "AND status = 'running' AND attempts = :attempts" in str(sql)
+
+
+def test_async_analyze_disabled_by_default(client: TestClient):
+    """
+    Without ANALYSIS_JOBS_ENABLED the async mode is refused.
+    """
+    response = client.post("/api/v1/messages/analyze?async=true", json={"message": "Dinner 45", "user_id": 1})
+    assert response.status_code == 400
+
+
+@patch("app.api.routes.message.AsyncAnalysisJobService.enqueue", new_callable=AsyncMock)
+def test_async_analyze_returns_job(mock_enqueue, client: TestClient):
+    """
+    In async mode the message is queued and the client gets 202 with the job location.
+    """
+    mock_enqueue.return_value = SimpleNamespace(
+        id="0f1e", status="queued", message="Had dinner with friends, paid 45 bucks"
+    )
+    worker = MagicMock()
+    client.app.dependency_overrides[get_job_worker] = lambda: worker
+    try:
+        response = client.post(
+            "/api/v1/messages/analyze?async=true",
+            json={"message": "Had dinner with friends, paid 45 bucks", "user_id": 1},
+            headers={"Idempotency-Key": "update-9"},
+        )
+    finally:
+        client.app.dependency_overrides.clear()
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == "0f1e"
+    assert response.headers["location"] == "/api/v1/messages/jobs/0f1e"
+    mock_enqueue.assert_awaited_once_with(1, "Had dinner with friends, paid 45 bucks", "update-9")
+    worker.notify.assert_called_once()
+
+
+@patch("app.api.routes.message.AsyncAnalysisJobService.enqueue", new_callable=AsyncMock)
+def test_async_analyze_rejects_key_reused_for_another_message(mock_enqueue, client: TestClient):
+    """
+    An Idempotency-Key that already queued a different message is answered with 422.
+    """
+    mock_enqueue.return_value = SimpleNamespace(id="0f1e", status="queued", message="Coffee 5")
+    client.app.dependency_overrides[get_job_worker] = lambda: MagicMock()
+    try:
+        response = client.post(
+            "/api/v1/messages/analyze?async=true",
+            json={"message": "Dinner 45", "user_id": 1},
+            headers={"Idempotency-Key": "update-9"},
+        )
+    finally:
+        client.app.dependency_overrides.clear()
+
+    assert response.status_code == 422
+
+
+@patch("app.api.routes.message.AsyncAnalysisJobService.get", new_callable=AsyncMock)
+def test_get_job_reports_result(mock_get, client: TestClient):
+    """
+    The job endpoint reports status and, once done, the analysis result.
+    """
+    mock_get.return_value = SimpleNamespace(
+        id="0f1e", status="succeeded", attempts=1,
+        created_at=datetime(2024, 5, 1, tzinfo=timezone.utc), finished_at=datetime(2024, 5, 1, tzinfo=timezone.utc),
+        result={"amount": 45.0, "category": "Food", "description": "Dinner with friends", "source": "llm"},
+        error=None,
+    )
+
+    response = client.get("/api/v1/messages/jobs/0f1e")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "succeeded"
+    assert response.json()["result"]["category"] == "Food"
+
+
+@patch("app.api.routes.message.AsyncAnalysisJobService.get", new_callable=AsyncMock, return_value=None)
+def test_get_unknown_job(mock_get, client: TestClient):
+    """
+    Unknown job IDs are reported as 404.
+    """
+    assert client.get("/api/v1/messages/jobs/missing").status_code == 404
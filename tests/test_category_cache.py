@@ -0,0 +1,75 @@
+import pytest
+
+from app.services.category_cache import CategoryCache
+
+
+class CountingLoader:
+    def __init__(self, names):
+        self.names = names
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return list(self.names)
+
+
+@pytest.mark.asyncio
+async def test_category_cache_hits_database_once_within_ttl():
+    """
+    Repeated lookups within the TTL reuse the cached catalog and prebuilt prompt.
+    """
+    loader = CountingLoader(["Food", "Transport"])
+    cache = CategoryCache(ttl_seconds=60, loader=loader)
+
+    first = await cache.get()
+    second = await cache.get()
+
+    assert loader.calls == 1
+    assert first is second
+    assert "Food" in first.names
+    assert "Food, Transport" in first.system_message.content
+
+
+@pytest.mark.asyncio
+async def test_category_cache_invalidate_and_reload():
+    """
+    Invalidation forces a reload, and a changed catalog gets a new version.
+    """
+    loader = CountingLoader(["Food"])
+    cache = CategoryCache(ttl_seconds=60, loader=loader)
+    original = await cache.get()
+
+    loader.names = ["Food", "Health"]
+    cache.invalidate()
+    refreshed = await cache.get()
+    reloaded = await cache.reload()
+
+    assert loader.calls == 3
+    assert "Health" in refreshed.names
+    assert refreshed.version != original.version
+    assert reloaded.version == refreshed.version
+
+
+@pytest.mark.asyncio
+async def test_category_version_ignores_load_order():
+    """
+    The same catalog loaded in a different order keeps its version (and its LLM cache entries).
+    """
+    first = await CategoryCache(loader=CountingLoader(["Food", "Transport"])).get()
+    second = await CategoryCache(loader=CountingLoader(["Transport", "Food"])).get()
+
+    assert first.version == second.version
+
+
+@pytest.mark.asyncio
+async def test_category_cache_expires_after_ttl():
+    """
+    A zero TTL reloads on every lookup.
+    """
+    loader = CountingLoader(["Food"])
+    cache = CategoryCache(ttl_seconds=0, loader=loader)
+
+    await cache.get()
+    await cache.get()
+
+    assert loader.calls == 2
@@ -0,0 +1,62 @@
+import pytest
+
+from app.services.category_classifier import CategoryClassifier, evaluate
+
+EXAMPLES = [
+    (1, description, category)
+    for category, descriptions in {
+        "Food": ["dinner with friends", "lunch at work", "groceries at the supermarket", "pizza delivery"],
+        "Transport": ["uber home", "taxi to the airport", "train ticket", "fuel for the car"],
+        "Health": ["doctor appointment", "pharmacy medicine", "dentist visit", "gym membership"],
+    }.items()
+    for description in descriptions
+] * 5
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return CategoryClassifier.train(EXAMPLES)
+
+
+def test_classifier_predicts_known_and_similar_descriptions(classifier):
+    """
+    Training descriptions and close variants (typos, extra words) get their category with high confidence.
+    """
+    assert classifier.predict("taxi to the airport")[0] == "Transport"
+    category, confidence = classifier.predict("dinner with my friends")
+    assert category == "Food"
+    assert confidence > 0.8
+    assert classifier.predict("dentst visit")[0] == "Health"
+
+
+def test_classifier_is_unsure_about_unseen_text(classifier):
+    """
+    Text without known features stays below the default confidence threshold.
+    """
+    _, confidence = classifier.predict("quarterly tax filing")
+    assert confidence < 0.9
+
+
+def test_classifier_learns_per_user_habits():
+    """
+    A per-user model follows each user's own labels for the same words.
+    """
+    examples = EXAMPLES + [(2, "market", "Food")] * 10 + [(3, "market", "Other")] * 10
+    classifier = CategoryClassifier.train(examples, per_user=True)
+
+    assert classifier.predict("market", 2)[0] == "Food"
+    assert classifier.predict("market", 3)[0] == "Other"
+
+
+def test_classifier_round_trips_through_file(classifier, tmp_path):
+    """
+    A saved model loads with the same predictions and metadata.
+    """
+    path = str(tmp_path / "classifier.json.gz")
+    classifier.save(path)
+    loaded = CategoryClassifier.load(path)
+
+    assert loaded.categories == classifier.categories
+    assert loaded.metadata["examples"] == len(EXAMPLES)
+    assert loaded.predict("uber home")[0] == "Transport"
+    assert evaluate(loaded, EXAMPLES, 0.5)["accuracy"] == 1.0
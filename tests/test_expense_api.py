@@ -0,0 +1,374 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.models.expense import Expense
+from app.schemas.expense import ExpenseCreate
+from app.schemas.expense_filter import ExpenseFilter
+from app.services.expense_query import expense_query, filter_shape
+from app.services.expense_read_cache import ExpenseReadCache
+from app.services.expense_rollup_service import AsyncExpenseRollupService
+from app.services.expense_service import (
+    INSERT_EXPENSE_SQL,
+    AsyncExpenseService,
+    ExpenseService,
+    decode_expense_cursor,
+    encode_expense_cursor,
+)
+
+
+def _expense(expense_id: int) -> Expense:
+    return Expense(
+        id=expense_id,
+        user_id=1,
+        description=f"expense {expense_id}",
+        amount=float(expense_id),
+        category="Food",
+        added_at=datetime(2024, 1, expense_id, tzinfo=timezone.utc),
+    )
+
+
+@pytest.fixture
+def data_versions(client: TestClient):
+    """
+    A fresh read cache for the test, reading data versions from this dict instead of the users table.
+    """
+    versions = {}
+
+    async def get_version(user_id):
+        return versions.get(user_id, 0)
+
+    with patch.object(client.app.state.services, "expense_read_cache", ExpenseReadCache(get_version=get_version)):
+        yield versions
+
+
+def test_cursor_round_trip():
+    """
+    A cursor encodes the (added_at, id) keyset position of the last row.
+    """
+    expense = _expense(3)
+    assert decode_expense_cursor(encode_expense_cursor(expense)) == (expense.added_at, 3)
+
+
+def test_listing_query_uses_keyset_condition():
+    """
+    Pages after the first continue strictly after the cursor row instead of using OFFSET.
+    """
+    query = expense_query(filter_shape(None), keyset=True, limited=True)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "(expenses.added_at, expenses.id) < (" in sql
+    assert "ORDER BY expenses.added_at DESC, expenses.id DESC" in sql
+    assert "OFFSET" not in sql
+
+
+def test_filter_statements_are_cached_per_shape():
+    """
+    Filters with the same shape share one statement object, whatever their values.
+    """
+    first = ExpenseFilter(category="Food", min_amount=1)
+    second = ExpenseFilter(category="Transport", min_amount=99)
+
+    assert first.shape() == second.shape()
+    assert expense_query(first.shape()) is expense_query(second.shape())
+    assert expense_query(first.shape()) is not expense_query(ExpenseFilter(category="Food").shape())
+
+
+def test_expenses_sql_binds_values_instead_of_interpolating():
+    """
+    The raw-SQL path renders placeholders and returns the values separately.
+    """
+    filters = ExpenseFilter(category="x' OR '1'='1", max_amount=10)
+    sql, params = ExpenseService.get_expenses_sql(7, filters)
+
+    assert "OR '1'='1" not in sql
+    assert ":category" in sql and ":max_amount" in sql and ":user_id" in sql
+    assert params == {"user_id": 7, "category": "x' OR '1'='1", "max_amount": Decimal("10.0")}
+    assert "OR '1'='1" not in filters.to_sql_where_clause()
+
+
+def test_amounts_are_exact_numerics_end_to_end():
+    """
+    Amounts are rounded to cents as Decimals, bound without casts, read back as-is and shown as JSON numbers.
+    """
+    expense = ExpenseCreate(user_id=1, description="coffee", amount=4.005, category="Food")
+    assert expense.amount == Decimal("4.01")
+    assert json.loads(expense.model_dump_json())["amount"] == 4.01
+    assert ExpenseService._insert_params(expense)["amount"] == Decimal("4.01")
+    assert "money" not in str(INSERT_EXPENSE_SQL).lower()
+
+    row = _expense(1)
+    row.amount = Decimal("1234.50")
+    assert ExpenseService._row_to_expense(row).amount == Decimal("1234.50")
+
+    sql = str(expense_query(ExpenseFilter(min_amount=5).shape()).compile(dialect=postgresql.dialect()))
+    assert "expenses.amount >= %(min_amount)s" in sql
+
+
+def test_amounts_beyond_the_column_range_are_rejected():
+    """
+    NUMERIC(14, 2) holds at most 999999999999.99; larger amounts fail validation instead of the insert.
+    """
+    from pydantic import ValidationError
+
+    assert ExpenseCreate(user_id=1, description="car", amount="999999999999.99", category="Transport")
+    for amount in ("999999999999.995", 1e12, "99999999999999999"):
+        with pytest.raises(ValidationError):
+            ExpenseCreate(user_id=1, description="car", amount=amount, category="Transport")
+
+
+def test_list_expenses_returns_page_and_cursor(client: TestClient, data_versions):
+    """
+    The JSON format returns one page and the cursor of the next one.
+    """
+    async def fake_page(user_id, filters, limit, cursor):
+        assert filters.category == "Food"
+        return [_expense(2), _expense(1)], "next-page"
+
+    with patch.object(AsyncExpenseService, "get_expenses_page", side_effect=fake_page):
+        response = client.get("/api/v1/expenses", params={"user_id": 1, "category": "Food", "limit": 2})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [2, 1]
+    assert data["next_cursor"] == "next-page"
+
+
+def test_list_expenses_rejects_bad_cursor(client: TestClient, data_versions):
+    """
+    A malformed cursor is a client error.
+    """
+    response = client.get("/api/v1/expenses", params={"user_id": 1, "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_list_expenses_streams_ndjson(client: TestClient, data_versions):
+    """
+    The NDJSON format streams one expense per line.
+    """
+    async def fake_stream(user_id, filters):
+        for expense_id in (3, 2, 1):
+            yield _expense(expense_id)
+
+    with patch.object(AsyncExpenseService, "stream_expenses", side_effect=fake_stream):
+        response = client.get("/api/v1/expenses", params={"user_id": 1, "format": "ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.strip().split("\n")
+    assert len(lines) == 3
+
+
+def test_summary_reads_rollups(client: TestClient, data_versions):
+    """
+    The summary endpoint totals the buckets returned by the rollup service.
+    """
+    async def fake_summarize(user_id, group_by, start_date, end_date, category):
+        assert group_by == "category"
+        return [{"key": "Food", "total": 30.5, "count": 3}, {"key": "Transport", "total": 12.0, "count": 1}]
+
+    with patch.object(AsyncExpenseRollupService, "summarize", side_effect=fake_summarize):
+        response = client.get("/api/v1/expenses/summary", params={"user_id": 1, "group_by": "category"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 42.5
+    assert data["count"] == 4
+    assert [bucket["key"] for bucket in data["buckets"]] == ["Food", "Transport"]
+
+
+def test_summary_rejects_unknown_grouping(client: TestClient):
+    """
+    Only day, week, month and category groupings are supported.
+    """
+    response = client.get("/api/v1/expenses/summary", params={"user_id": 1, "group_by": "year"})
+    assert response.status_code == 422
+
+
+def test_expense_inserts_maintain_rollups():
+    """
+    Single and multi-row inserts update the rollups in the same statement.
+    """
+    from app.schemas.expense import ExpenseCreate
+    from app.services.expense_service import INSERT_EXPENSE_SQL, ExpenseService
+
+    many_sql, _ = ExpenseService._build_insert_many(
+        [ExpenseCreate(user_id=1, description="a", amount=1, category="Food")]
+    )
+    for sql in (str(INSERT_EXPENSE_SQL), str(many_sql)):
+        assert "INSERT INTO expense_daily_rollups" in sql
+        assert "ON CONFLICT (user_id, category, day) DO UPDATE" in sql
+        assert "UPDATE users SET data_version = data_version + 1" in sql
+
+
+def test_multi_row_insert_returns_rows_in_input_order():
+    """
+    Each input row carries its position and the RETURNING rows are matched back to it,
+    instead of assuming ids follow the VALUES order.
+    """
+    from app.schemas.expense import ExpenseCreate
+    from app.services.expense_service import ExpenseService
+
+    sql, params = ExpenseService._build_insert_many([
+        ExpenseCreate(user_id=1, description="a", amount=1, category="Food"),
+        ExpenseCreate(user_id=2, description="b", amount=2, category="Transport"),
+    ])
+    sql = str(sql)
+
+    assert "(0, CAST(:user_id_0 AS INTEGER)" in sql
+    assert "(1, CAST(:user_id_1 AS INTEGER)" in sql
+    assert "USING (user_id, description, amount, category, copy)" in sql
+    assert sql.rstrip().endswith("ORDER BY input.ord")
+    assert params["user_id_1"] == 2
+
+
+class _RecordingSession:
+    """Async session stand-in that records SQL and answers the insert with one row."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        row = SimpleNamespace(
+            id=1, user_id=1, description="a", amount=Decimal("1.00"), category="Food",
+            added_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+        return MagicMock(fetchone=lambda: row)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_single_insert_runs_under_read_committed():
+    """
+    The insert's rollup and data version updates are atomic row updates; SERIALIZABLE would
+    make concurrent inserts for the same user fail with serialization errors.
+    """
+    session = _RecordingSession()
+    with patch("app.services.expense_service.AsyncSessionLocal", return_value=session):
+        expense = await AsyncExpenseService.create_expense(
+            ExpenseCreate(user_id=1, description="a", amount=1, category="Food")
+        )
+
+    assert expense is not None
+    assert session.statements[0] == "SET TRANSACTION ISOLATION LEVEL READ COMMITTED"
+    assert not any("SERIALIZABLE" in statement for statement in session.statements)
+
+
+def test_repeat_reads_are_cached_until_the_data_version_changes(client: TestClient, data_versions):
+    """
+    A repeated listing is served from the cache; If-None-Match with the current ETag gets a 304;
+    a write (a new data version) changes the ETag and recomputes the page.
+    """
+    calls = []
+
+    async def fake_page(user_id, filters, limit, cursor):
+        calls.append(user_id)
+        return [_expense(len(calls))], None
+
+    params = {"user_id": 1, "category": "Food"}
+    with patch.object(AsyncExpenseService, "get_expenses_page", side_effect=fake_page):
+        first = client.get("/api/v1/expenses", params=params)
+        second = client.get("/api/v1/expenses", params=params)
+        etag = first.headers["etag"]
+        not_modified = client.get("/api/v1/expenses", params=params, headers={"If-None-Match": etag})
+        other_filter = client.get("/api/v1/expenses", params={"user_id": 1, "category": "Travel"})
+
+        data_versions[1] = 1
+        after_write = client.get("/api/v1/expenses", params=params, headers={"If-None-Match": etag})
+
+    assert second.content == first.content
+    assert second.headers["etag"] == etag
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert other_filter.headers["etag"] != etag
+    assert after_write.status_code == 200
+    assert after_write.headers["etag"] != etag
+    assert after_write.json()["items"][0]["id"] == 3
+    assert len(calls) == 3
+
+
+def test_reads_bypass_the_cache_when_the_version_cannot_be_read(client: TestClient):
+    """
+    A failing data version lookup doesn't fail the read: it is served without the cache or an ETag.
+    """
+    from sqlalchemy.exc import OperationalError
+
+    async def broken(user_id):
+        raise OperationalError("SELECT", {}, Exception("connection refused"))
+
+    async def fake_page(user_id, filters, limit, cursor):
+        return [_expense(1)], None
+
+    cache = ExpenseReadCache(get_version=broken)
+    with patch.object(client.app.state.services, "expense_read_cache", cache), \
+            patch.object(AsyncExpenseService, "get_expenses_page", side_effect=fake_page) as get_page:
+        first = client.get("/api/v1/expenses", params={"user_id": 1})
+        second = client.get("/api/v1/expenses", params={"user_id": 1})
+
+    assert first.status_code == second.status_code == 200
+    assert first.json()["items"][0]["id"] == 1
+    assert "etag" not in first.headers
+    assert get_page.call_count == 2
+    assert len(cache) == 0
+
+
+def test_summary_and_stream_answer_conditional_requests(client: TestClient, data_versions):
+    """
+    The summary and the NDJSON stream carry ETags too and skip the query when the client's is current.
+    """
+    async def fake_summarize(user_id, group_by, start_date, end_date, category):
+        return [{"key": "Food", "total": 1, "count": 1}]
+
+    async def fake_stream(user_id, filters):
+        yield _expense(1)
+
+    with patch.object(AsyncExpenseRollupService, "summarize", side_effect=fake_summarize) as summarize, \
+            patch.object(AsyncExpenseService, "stream_expenses", side_effect=fake_stream) as stream:
+        summary = client.get("/api/v1/expenses/summary", params={"user_id": 1})
+        summary_again = client.get(
+            "/api/v1/expenses/summary", params={"user_id": 1}, headers={"If-None-Match": summary.headers["etag"]}
+        )
+        lines = client.get("/api/v1/expenses", params={"user_id": 1, "format": "ndjson"})
+        lines_again = client.get(
+            "/api/v1/expenses", params={"user_id": 1, "format": "ndjson"},
+            headers={"If-None-Match": lines.headers["etag"]},
+        )
+
+    assert summary_again.status_code == 304
+    assert lines_again.status_code == 304
+    assert lines.headers["etag"] != summary.headers["etag"]
+    assert summarize.call_count == 1
+    assert stream.call_count == 1
+
+
+def test_list_expenses_rejects_unknown_telegram_id(client: TestClient):
+    """
+    Listing by telegram_id looks the user up without registering it.
+    """
+    resolver = client.app.state.services.user_resolver
+
+    async def unknown(telegram_id):
+        return None
+
+    with patch.object(resolver, "_get", side_effect=unknown):
+        response = client.get("/api/v1/expenses", params={"telegram_id": "999"})
+
+    assert response.status_code == 404
@@ -0,0 +1,217 @@
+import asyncio
+import json
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.ai_service import AIService
+from app.services.category_cache import CategoryCache
+from app.services.expense_import import CsvStreamParser, ExpenseImporter, parse_amount
+from tests.test_ai_service import SlowLLM
+
+STATEMENT = (
+    "Date,Description,Amount,Category\n"
+    "2024-05-01,Uber to the office,-12.30,\n"
+    '2024-05-02,"Dinner at Luigi\'s, with the team",\n'
+    "2024-05-03,Weekly groceries,\"-1,045.10\",food\n"
+    "2024-05-04,Something odd,abc,\n"
+    "not-a-date,Gym,-30,\n"
+    "2024-05-06,Hardware store,(25.00),\n"
+    "2024-05-07,Salary,\"2,500.00\",\n"
+)
+
+
+async def _categories():
+    return ["Food", "Transport", "Health", "Other"]
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def _importer(copied: list, batch_size: int = 2) -> ExpenseImporter:
+    async def copy(expenses, added_at):
+        copied.extend(zip(expenses, added_at))
+        return len(expenses)
+
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM('[{"index": 0, "amount": 25, "category": "Home improvement", "description": "Hardware"}]', delay=0)
+    return ExpenseImporter(service, batch_size=batch_size, copy=copy)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("-12.30", Decimal("-12.30")),
+        ("1,045.10", Decimal("1045.10")),
+        ("1.045,10 €", Decimal("1045.10")),
+        ("(8,5)", Decimal("-8.5")),
+        ("$ 7", Decimal("7")),
+        ("USD 1 234,50", Decimal("1234.50")),
+        ("12.30-", Decimal("-12.30")),
+    ],
+)
+def test_parse_amount(text, expected):
+    """
+    Statement amounts in the usual formats parse with their sign.
+    """
+    assert parse_amount(text) == expected
+
+
+@pytest.mark.parametrize("text", ["1e20", "12abc34", "abc", "1.2.3", "(-5)", "4 $ 5"])
+def test_parse_amount_rejects_malformed_values(text):
+    """
+    Only a leading or trailing currency is stripped; anything else in the field makes it invalid.
+    """
+    with pytest.raises(ValueError):
+        parse_amount(text)
+
+
+def test_csv_stream_parser_handles_records_split_across_chunks():
+    """
+    Records, including quoted fields with newlines, are returned once complete, with their line numbers.
+    """
+    data = 'description,amount\n"Dinner,\nwith friends",45\nTaxi,12\n'
+    parser = CsvStreamParser()
+    records = []
+    for start in range(0, len(data), 7):
+        records.extend(parser.feed(data[start:start + 7].encode()))
+    records.extend(parser.feed(b"", final=True))
+
+    assert records == [
+        (1, ["description", "amount"]),
+        (2, ["Dinner,\nwith friends", "45"]),
+        (4, ["Taxi", "12"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_importer_categorizes_and_copies_in_batches():
+    """
+    Rows are categorized from the file, keywords or the LLM, saved in batches, and bad rows are reported by line.
+    """
+    copied = []
+    job = await _importer(copied).start(1, _chunks(STATEMENT.encode(), 16))
+    report = await job.wait()
+
+    assert report["status"] == "succeeded"
+    assert (report["rows"], report["imported"], report["skipped"], report["failed"]) == (7, 3, 1, 3)
+    assert [error["line"] for error in report["errors"]] == [3, 5, 6]
+    assert [(expense.description, expense.amount, expense.category) for expense, _ in copied] == [
+        ("Uber to the office", Decimal("12.30"), "Transport"),
+        ("Weekly groceries", Decimal("1045.10"), "Food"),
+        ("Hardware store", Decimal("25.00"), "Other"),
+    ]
+    assert copied[0][1].day == 1
+
+
+@pytest.mark.asyncio
+async def test_importer_skips_credits_by_expense_sign():
+    """
+    Amounts with the sign opposite to expenses' (income, refunds) are skipped; a debit column holds positive expenses.
+    """
+    statement = b"description,amount\nTaxi,-12\nRefund,5\n"
+    copied = []
+    report = await (await _importer(copied).start(1, _chunks(statement, 64))).wait()
+    assert (report["imported"], report["skipped"]) == (1, 1)
+    assert copied[0][0].amount == Decimal("12")
+
+    copied = []
+    report = await (await _importer(copied).start(1, _chunks(statement, 64), expense_sign="positive")).wait()
+    assert (report["imported"], report["skipped"]) == (1, 1)
+    assert copied[0][0].description == "Refund"
+
+    copied = []
+    report = await (await _importer(copied).start(1, _chunks(b"payee,debit\nTaxi,12\n", 64))).wait()
+    assert (report["imported"], report["skipped"]) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_oversized_amount_fails_only_its_row():
+    """
+    An amount too large for the column is a row error; the rest of the batch is still saved.
+    """
+    copied = []
+    statement = b"description,amount,category\nTaxi,-12,Transport\nYacht,-10000000000000,Transport\n"
+    report = await (await _importer(copied).start(1, _chunks(statement, 64))).wait()
+
+    assert (report["imported"], report["failed"]) == (1, 1)
+    assert report["errors"][0]["line"] == 3
+
+
+@pytest.mark.asyncio
+async def test_importer_rejects_files_without_required_columns():
+    """
+    A header without description and amount columns fails before anything is imported.
+    """
+    with pytest.raises(ValueError):
+        await _importer([]).start(1, _chunks(b"date,total\n2024-05-01,3\n", 64))
+
+
+@pytest.mark.asyncio
+async def test_importer_stops_reading_when_saving_fails():
+    """
+    If a batch can't be processed (here the category catalog fails to load), the import
+    fails instead of blocking on the batch queue, and the rest of the upload is not read.
+    """
+    importer = _importer([], batch_size=1)
+    importer.ai_service.category_cache.get = AsyncMock(side_effect=RuntimeError("database is down"))
+    chunks_read = 0
+
+    async def chunks():
+        nonlocal chunks_read
+        for index in range(100):
+            chunks_read += 1
+            yield b"description,amount\n" if index == 0 else f"Taxi {index},-12\n".encode()
+
+    job = await asyncio.wait_for(importer.start(1, chunks()), timeout=5)
+    report = await asyncio.wait_for(job.wait(), timeout=5)
+
+    assert report["status"] == "failed"
+    assert chunks_read < 100
+
+
+@pytest.mark.asyncio
+async def test_importer_reports_progress_while_the_upload_is_read():
+    """
+    start() returns once the header is checked; progress for saved batches arrives before the upload ends.
+    """
+    copied = []
+    first_report_seen = asyncio.Event()
+
+    async def chunks():
+        yield b"description,amount,category\nTaxi,-12,Transport\nBus,-2,Transport\n"
+        await first_report_seen.wait()
+        yield b"Lunch,-9,Food\n"
+
+    job = await asyncio.wait_for(_importer(copied).start(1, chunks()), timeout=5)
+    progress = job.progress()
+    first = await asyncio.wait_for(progress.__anext__(), timeout=5)
+    first_report_seen.set()
+    reports = [report async for report in progress]
+
+    assert (first["status"], first["imported"]) == ("running", 2)
+    assert (reports[-1]["status"], reports[-1]["imported"]) == ("succeeded", 3)
+
+
+def test_import_endpoint_streams_progress(client: TestClient):
+    """
+    POST /expenses/import reads the CSV body and can stream a progress report per batch.
+    """
+    copied = []
+    with patch("app.api.routes.expense.ExpenseImporter", lambda ai_service: _importer(copied)):
+        response = client.post(
+            "/api/v1/expenses/import?user_id=1&format=ndjson",
+            content=STATEMENT.encode(),
+            headers={"Content-Type": "text/csv"},
+        )
+        rejected = client.post("/api/v1/expenses/import?user_id=1", content=b"foo,bar\n1,2\n")
+
+    reports = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == 200
+    assert reports[-1]["status"] == "succeeded"
+    assert reports[-1]["imported"] == 3
+    assert rejected.status_code == 400
@@ -0,0 +1,112 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.schemas.expense_filter import ExpenseFilter
+from app.services.expense_partition_maintainer import PartitionMaintainer
+from app.services.expense_partition_service import (
+    Partition,
+    missing_partitions,
+    month_start,
+    parse_partition_bound,
+    partition_name,
+    partitions_to_archive,
+)
+from app.services.expense_query import expense_query, filter_shape
+
+
+def _utc(year: int, month: int) -> datetime:
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+
+def test_month_arithmetic_wraps_years():
+    """
+    Monthly bounds are UTC midnights and cross year boundaries in both directions.
+    """
+    assert month_start(date(2024, 11, 20), 2) == _utc(2025, 1)
+    assert month_start(date(2024, 1, 5), -1) == _utc(2023, 12)
+    assert partition_name(_utc(2025, 1)) == "expenses_y2025m01"
+
+
+def test_parse_partition_bound():
+    """
+    Ranges come back from pg_get_expr, with MINVALUE for the converted table.
+    """
+    legacy = parse_partition_bound(
+        "expenses_legacy", "FOR VALUES FROM (MINVALUE) TO ('2024-03-01 00:00:00+00')"
+    )
+    assert legacy == Partition("expenses_legacy", None, _utc(2024, 3))
+    monthly = parse_partition_bound(
+        "expenses_y2024m03", "FOR VALUES FROM ('2024-03-01 01:00:00+01') TO ('2024-04-01 00:00:00+00')"
+    )
+    assert (monthly.start, monthly.end) == (_utc(2024, 3), _utc(2024, 4))
+
+
+def test_missing_partitions_skip_covered_months():
+    """
+    Months covered by the converted table or an existing partition are not created again.
+    """
+    existing = [
+        Partition("expenses_legacy", None, _utc(2024, 3)),
+        Partition("expenses_y2024m03", _utc(2024, 3), _utc(2024, 4)),
+    ]
+
+    missing = missing_partitions(existing, date(2024, 2, 15), months_ahead=3)
+
+    assert [partition.name for partition in missing] == ["expenses_y2024m04", "expenses_y2024m05"]
+    assert missing[0].end == missing[1].start
+
+
+def test_partitions_to_archive_only_takes_whole_months_before_cutoff():
+    """
+    A partition is archived only once all of its range is older than the cutoff.
+    """
+    existing = [
+        Partition("expenses_y2024m02", _utc(2024, 2), _utc(2024, 3)),
+        Partition("expenses_legacy", None, _utc(2024, 2)),
+        Partition("expenses_y2024m03", _utc(2024, 3), _utc(2024, 4)),
+    ]
+
+    old = partitions_to_archive(existing, _utc(2024, 3))
+
+    assert [partition.name for partition in old] == ["expenses_legacy", "expenses_y2024m02"]
+
+
+@pytest.mark.asyncio
+async def test_maintainer_survives_database_errors():
+    """
+    A failed check is logged and retried on the next interval instead of stopping the task.
+    """
+    calls = []
+
+    def ensure(months_ahead):
+        calls.append(months_ahead)
+        if len(calls) == 1:
+            raise RuntimeError("database is down")
+        return ["expenses_y2024m05"]
+
+    maintainer = PartitionMaintainer(months_ahead=2, interval=60, ensure=ensure)
+
+    assert await maintainer.run_once() == []
+    assert await maintainer.run_once() == ["expenses_y2024m05"]
+    assert calls == [2, 2]
+
+
+def test_date_filters_bind_aware_timestamps():
+    """
+    Naive filter dates are bound as UTC so the planner can prune partitions.
+    """
+    params = ExpenseFilter(start_date=datetime(2024, 3, 1), end_date=datetime(2024, 3, 31)).to_sql_params()
+
+    assert params['start_date'] == _utc(2024, 3)
+    assert params['end_date'].tzinfo is not None
+
+
+def test_keyset_pages_bound_added_at_directly():
+    """
+    Later pages repeat the cursor as a plain added_at bound, which partition pruning understands.
+    """
+    sql = str(expense_query(filter_shape(None), keyset=True, limited=True).compile(dialect=postgresql.dialect()))
+
+    assert "expenses.added_at <= %(cursor_added_at)s" in sql
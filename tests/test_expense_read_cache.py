@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.services.expense_read_cache import ExpenseReadCache, etag_matches
+
+
+async def _version_zero(user_id):
+    return 0
+
+
+def test_etag_matching():
+    """
+    If-None-Match may list several tags, use weak tags, or be "*".
+    """
+    etag = ExpenseReadCache.etag(1, 3, ("page",))
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(ExpenseReadCache.etag(1, 4, ("page",)), etag)
+    assert ExpenseReadCache.etag(2, 3, ("page",)) != etag
+
+
+def test_entries_are_tagged_with_the_data_version():
+    """
+    An entry only answers reads at the version it was computed at, and an older result never replaces a newer one.
+    """
+    cache = ExpenseReadCache(max_bytes=1000, get_version=_version_zero)
+    cache.put(1, 2, "q", b"v2")
+    assert cache.get(1, 2, "q") == b"v2"
+    assert cache.get(1, 3, "q") is None
+
+    cache.put(1, 1, "q", b"v1")
+    assert cache.get(1, 2, "q") == b"v2"
+    cache.put(1, 3, "q", b"v3")
+    assert cache.get(1, 3, "q") == b"v3"
+    assert len(cache) == 1
+    assert cache.size == 2
+
+
+def test_memory_is_bounded_by_body_size():
+    """
+    The least recently used bodies are evicted once the total size exceeds max_bytes,
+    and bodies too large to share the cache are not stored.
+    """
+    cache = ExpenseReadCache(max_bytes=80, get_version=_version_zero)
+    for user_id in range(1, 5):
+        cache.put(user_id, 0, "q", b"x" * 10)
+    cache.get(1, 0, "q")
+    for user_id in range(5, 11):
+        cache.put(user_id, 0, "q", b"x" * 10)
+
+    assert cache.size <= 80
+    assert cache.get(1, 0, "q") is not None
+    assert cache.get(2, 0, "q") is None
+
+    cache.put(11, 0, "q", b"x" * 11)
+    assert cache.get(11, 0, "q") is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    """
+    Identical reads that miss together run the query once.
+    """
+    cache = ExpenseReadCache(get_version=_version_zero)
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0)
+        return b"body"
+
+    bodies = await asyncio.gather(*(cache.get_or_load(1, 0, "q", load) for _ in range(5)))
+    assert bodies == [b"body"] * 5
+    assert await cache.get_or_load(1, 0, "q", load) == b"body"
+    assert loads == 1
+
+
+@pytest.mark.asyncio
+async def test_unreadable_version_bypasses_the_cache():
+    """
+    If the version lookup fails, reads skip the cache instead of failing.
+    """
+    async def broken(user_id):
+        raise OperationalError("SELECT", {}, Exception("connection refused"))
+
+    assert await ExpenseReadCache(get_version=broken).version(1) is None
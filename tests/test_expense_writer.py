@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.models.expense import Expense
+from app.schemas.expense import ExpenseCreate
+from app.services.expense_writer import GroupCommitWriter
+
+
+class FakeStore:
+    def __init__(self, fail_groups: bool = False):
+        self.fail_groups = fail_groups
+        self.group_calls = []
+        self.single_calls = []
+        self.next_id = 1
+
+    def _save(self, expense):
+        saved = Expense(id=self.next_id, added_at=datetime.utcnow(), **expense.model_dump())
+        self.next_id += 1
+        return saved
+
+    async def insert_many(self, expenses):
+        self.group_calls.append(len(expenses))
+        if self.fail_groups:
+            return []
+        return [self._save(expense) for expense in expenses]
+
+    async def insert_one(self, expense):
+        self.single_calls.append(expense)
+        return self._save(expense)
+
+
+def _expense(i: int) -> ExpenseCreate:
+    return ExpenseCreate(user_id=1, description=f"expense {i}", amount=i, category="Food")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_creates_share_one_insert():
+    """
+    Calls arriving within the delay window are written together, and each caller gets its own row.
+    """
+    store = FakeStore()
+    writer = GroupCommitWriter(max_delay_ms=20, max_batch_size=100, insert_many=store.insert_many, insert_one=store.insert_one)
+
+    saved = await asyncio.gather(*(writer.create_expense(_expense(i)) for i in range(10)))
+
+    assert store.group_calls == [10]
+    assert [expense.description for expense in saved] == [f"expense {i}" for i in range(10)]
+    assert len({expense.id for expense in saved}) == 10
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting():
+    """
+    Reaching max_batch_size flushes immediately instead of waiting for the delay.
+    """
+    store = FakeStore()
+    writer = GroupCommitWriter(max_delay_ms=10_000, max_batch_size=3, insert_many=store.insert_many, insert_one=store.insert_one)
+
+    saved = await asyncio.wait_for(asyncio.gather(*(writer.create_expense(_expense(i)) for i in range(3))), timeout=1)
+
+    assert store.group_calls == [3]
+    assert all(expense is not None for expense in saved)
+    await writer.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_group_falls_back_to_individual_inserts():
+    """
+    When the grouped insert fails, each expense is retried on its own.
+    """
+    store = FakeStore(fail_groups=True)
+    writer = GroupCommitWriter(max_delay_ms=5, max_batch_size=100, insert_many=store.insert_many, insert_one=store.insert_one)
+
+    saved = await asyncio.gather(*(writer.create_expense(_expense(i)) for i in range(3)))
+
+    assert store.group_calls == [3]
+    assert len(store.single_calls) == 3
+    assert all(expense is not None for expense in saved)
@@ -0,0 +1,66 @@
+import pytest
+
+from app.services.category_cache import CategorySnapshot
+from app.services.fast_path_parser import FastPathParser, split_amount
+
+CATEGORIES = CategorySnapshot.from_names(["Food", "Transport", "Utilities", "Other"])
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("coffee 4.5", {"amount": 4.5, "category": "Food", "description": "coffee"}),
+        ("uber $12,30", {"amount": 12.3, "category": "Transport", "description": "uber"}),
+        ("12 € taxi", {"amount": 12.0, "category": "Transport", "description": "taxi"}),
+        ("coffee $4.5 usd", {"amount": 4.5, "category": "Food", "description": "coffee"}),
+        (
+            "Bought coffee for 4.5 dollars",
+            {"amount": 4.5, "category": "Food", "description": "Bought coffee"},
+        ),
+    ],
+)
+def test_fast_path_parses_simple_messages(message, expected):
+    """
+    Short "<description> <amount>" messages are parsed without the LLM.
+    """
+    assert FastPathParser().parse(message, CATEGORIES) == expected
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "hello",
+        "1,200 rent",  # thousands separator vs. decimal comma is ambiguous
+        "netflix 15.99",  # keyword category missing from the catalog
+        "coffee and uber 5",  # more than one candidate category
+        "paid 30 for stuff",  # no known keyword
+        "gas 40",  # fuel or the gas bill
+        "phone 300",  # a phone bill or a new phone
+        "coffee $4.5 €",  # two different currencies
+    ],
+)
+def test_fast_path_leaves_ambiguous_messages_to_llm(message):
+    """
+    Anything the rules cannot parse with certainty returns None.
+    """
+    parser = FastPathParser()
+    assert parser.parse(message, CATEGORIES) is None
+    assert parser.misses == 1
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("Had dinner with friends, paid 45 bucks", (45.0, "Had dinner with friends")),
+        ("Took an uber home after the party, $12,30", (12.3, "Took an uber home after the party")),
+        ("concert 30 EUR yesterday", (30.0, "concert yesterday")),
+        ("2 tickets for 30", None),  # two numbers: which one is the amount?
+        ("dinner $45 euros", None),  # two different currencies
+        ("45", None),  # nothing left to describe
+    ],
+)
+def test_split_amount(message, expected):
+    """
+    Free-text messages with exactly one number are split into amount and description.
+    """
+    assert split_amount(message) == expected
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm_cache import LLMResultCache, SQLiteCacheBackend, normalize_message
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("  Lunch   10 ", "lunch 10"),
+        ("Netflix 15.99", "netflix 15.99"),
+        ("coffee 1.200", "coffee 1.200"),
+        ("coffee 1.20", "coffee 1.2"),
+        ("rent 1,200", "rent 1,200"),
+        ("uber 12,30", "uber 12.3"),
+        ("rent 1,200.00", "rent 1200"),
+    ],
+)
+def test_normalize_message(message, expected):
+    """
+    Case, whitespace and number formatting do not affect the cache key.
+    """
+    assert normalize_message(message) == expected
+
+
+def test_three_digit_groups_are_not_merged_with_decimals():
+    """
+    "1.200" may mean 1200, so it does not share a key with "1.2".
+    """
+    assert LLMResultCache.make_key("coffee 1.200", "gpt-4", "v1") != LLMResultCache.make_key("coffee 1.2", "gpt-4", "v1")
+
+
+def test_cache_key_depends_on_model_and_categories():
+    """
+    Changing the model or the category catalog version yields a different key.
+    """
+    key = LLMResultCache.make_key("lunch 10", "gpt-3.5-turbo", "v1")
+    assert key == LLMResultCache.make_key("LUNCH 10.00", "gpt-3.5-turbo", "v1")
+    assert key != LLMResultCache.make_key("lunch 10", "gpt-4", "v1")
+    assert key != LLMResultCache.make_key("lunch 10", "gpt-3.5-turbo", "v2")
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used():
+    """
+    The in-memory tier keeps at most max_entries results.
+    """
+    cache = LLMResultCache(max_entries=2, ttl_seconds=60)
+    await cache.set("a", {"amount": 1})
+    await cache.set("b", {"amount": 2})
+    await cache.get("a")
+    await cache.set("c", {"amount": 3})
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == {"amount": 1}
+    assert cache.stats()["size"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_expires_entries():
+    """
+    Entries older than the TTL are misses.
+    """
+    cache = LLMResultCache(ttl_seconds=-1)
+    await cache.set("a", {"amount": 1})
+
+    assert await cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_survives_restart(tmp_path):
+    """
+    Results stored on disk are visible to a fresh cache instance.
+    """
+    path = str(tmp_path / "llm_cache.sqlite")
+    cache = LLMResultCache(backend=SQLiteCacheBackend(path))
+    await cache.set("a", {"amount": 1})
+    cache.close()
+
+    restarted = LLMResultCache(backend=SQLiteCacheBackend(path))
+    assert await restarted.get("a") == {"amount": 1}
+    assert restarted.stats()["hits"] == 1
+    restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_hit_keeps_its_stored_expiry(tmp_path):
+    """
+    A result read from disk expires in memory when it was due to expire on disk, not a full TTL later.
+    """
+    path = str(tmp_path / "llm_cache.sqlite")
+    backend = SQLiteCacheBackend(path)
+    backend.set("a", {"amount": 1}, time.time() + 0.05)
+    cache = LLMResultCache(ttl_seconds=3600, backend=backend)
+
+    assert await cache.get("a") == {"amount": 1}
+    await asyncio.sleep(0.1)
+    assert await cache.get("a") is None
+    cache.close()
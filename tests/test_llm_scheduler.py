@@ -0,0 +1,120 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.services.llm_scheduler import LLMScheduler, LLMUnavailable, TokenBucket
+
+
+class CountingLLM:
+    """Stand-in for ChatOpenAI that records how many calls overlap."""
+
+    model_name = "fake-model"
+
+    def __init__(self, delay: float = 0.05, failures: list = None):
+        self.delay = delay
+        self.failures = list(failures or [])
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return SimpleNamespace(content="{}")
+
+
+def _rate_limit_error(retry_after: str = None) -> openai.RateLimitError:
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://llm.test/v1/chat/completions"))
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_caps_concurrency():
+    """
+    No more than max_concurrency calls reach the provider at once.
+    """
+    llm = CountingLLM(delay=0.02)
+    scheduler = LLMScheduler(llm, max_concurrency=3, max_queue=100)
+
+    await asyncio.gather(*(scheduler.ainvoke([]) for _ in range(10)))
+
+    assert llm.calls == 10
+    assert llm.max_active == 3
+
+
+@pytest.mark.asyncio
+async def test_scheduler_fails_fast_when_queue_is_full():
+    """
+    Calls beyond the concurrency cap and the queue are rejected immediately with a retry hint.
+    """
+    scheduler = LLMScheduler(CountingLLM(delay=0.1), max_concurrency=1, max_queue=1)
+
+    results = await asyncio.gather(*(scheduler.ainvoke([]) for _ in range(3)), return_exceptions=True)
+
+    rejected = [result for result in results if isinstance(result, LLMUnavailable)]
+    assert len(rejected) == 1
+    assert rejected[0].retry_after >= 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_retries_after_provider_retry_after():
+    """
+    A 429 is retried after the provider's Retry-After instead of failing the request.
+    """
+    llm = CountingLLM(delay=0, failures=[_rate_limit_error("0.1")])
+    scheduler = LLMScheduler(llm, max_retries=2)
+
+    start = time.perf_counter()
+    response = await scheduler.ainvoke([])
+
+    assert response.content == "{}"
+    assert llm.calls == 2
+    assert time.perf_counter() - start >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_gives_up_with_llm_unavailable():
+    """
+    When retries are exhausted the caller gets LLMUnavailable, not the raw provider error.
+    """
+    llm = CountingLLM(delay=0, failures=[_rate_limit_error() for _ in range(3)])
+    scheduler = LLMScheduler(llm, max_retries=2, backoff_base=0.001)
+
+    with pytest.raises(LLMUnavailable, match="rate limit"):
+        await scheduler.ainvoke([])
+    assert llm.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_scheduler_does_not_retry_client_errors():
+    """
+    Errors that won't go away on retry are raised immediately.
+    """
+    llm = CountingLLM(delay=0, failures=[ValueError("bad request")])
+    scheduler = LLMScheduler(llm, max_retries=2)
+
+    with pytest.raises(ValueError):
+        await scheduler.ainvoke([])
+    assert llm.calls == 1
+
+
+def test_token_bucket_paces_after_burst():
+    """
+    Once the burst is spent, each reservation waits for the refill.
+    """
+    bucket = TokenBucket(per_minute=60, burst_seconds=2)
+
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(1) == pytest.approx(2.0, abs=0.05)
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock
 from fastapi.testclient import TestClient
 
 def test_message_endpoint_empty_message(client: TestClient):
@@ -8,30 +8,137 @@ def test_message_endpoint_empty_message(client: TestClient):
     """
     response = client.post(
         "/api/v1/messages/analyze",
-        json={"message": ""}
+        json={"message": "", "user_id": 1}
     )
     assert response.status_code == 400
     assert "empty" in response.json()["detail"].lower()
 
-@pytest.mark.asyncio
-@patch("app.services.ai_service.AIService.analyze_message")
-async def test_message_endpoint_valid_message(mock_analyze, client: TestClient):
+@patch("app.services.ai_service.AIService.process_message", new_callable=AsyncMock)
+def test_message_endpoint_valid_message(mock_process, client: TestClient):
     """
     Test the message analysis endpoint with a valid message.
     """
     # Set up the mock
-    mock_analyze.return_value = "This is a test response"
+    mock_process.return_value = {
+        "amount": 45.0,
+        "category": "Food",
+        "description": "Dinner with friends",
+        "source": "llm"
+    }
     
     # Make the request
     response = client.post(
         "/api/v1/messages/analyze",
-        json={"message": "Hello, AI!"}
+        json={"message": "Had dinner with friends, paid 45 bucks", "user_id": 1}
     )
     
     # Verify the response
     assert response.status_code == 200
-    data = response.json()
-    assert data["response"] == "This is a test response"
+    assert response.json() == mock_process.return_value
     
-    # Verify the mock was called with the correct argument
-    mock_analyze.assert_called_once_with("Hello, AI!") 
\ No newline at end of file
+    # Verify the mock was called with the correct arguments
+    mock_process.assert_awaited_once_with("Had dinner with friends, paid 45 bucks", 1, None)
+
+@patch("app.services.ai_service.AIService.process_message", new_callable=AsyncMock)
+def test_message_endpoint_analysis_error(mock_process, client: TestClient):
+    """
+    Test that analysis errors are reported as a server error.
+    """
+    mock_process.return_value = {
+        "amount": 0,
+        "category": "unknown",
+        "description": "???",
+        "error": "Could not parse AI response"
+    }
+    
+    response = client.post(
+        "/api/v1/messages/analyze",
+        json={"message": "???", "user_id": 1}
+    )
+    
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Could not parse AI response"
+
+@patch("app.services.ai_service.AIService.process_message", new_callable=AsyncMock)
+def test_message_endpoint_passes_idempotency_key(mock_process, client: TestClient):
+    """
+    Test that the Idempotency-Key header is handed to the AI service.
+    """
+    mock_process.return_value = {"amount": 4.5, "category": "Food", "description": "coffee", "source": "rules"}
+    
+    response = client.post(
+        "/api/v1/messages/analyze",
+        json={"message": "coffee 4.5", "user_id": 1},
+        headers={"Idempotency-Key": "update-42"}
+    )
+    
+    assert response.status_code == 200
+    mock_process.assert_awaited_once_with("coffee 4.5", 1, "update-42")
+
+@patch("app.services.ai_service.AIService.process_message", new_callable=AsyncMock)
+def test_message_endpoint_rejects_reused_idempotency_key(mock_process, client: TestClient):
+    """
+    Test that an Idempotency-Key reused for a different message is answered with 422.
+    """
+    mock_process.return_value = {
+        "amount": 0,
+        "category": "unknown",
+        "description": "coffee 5",
+        "error": "Idempotency key was already used for a different request",
+        "idempotency_conflict": True
+    }
+    
+    response = client.post(
+        "/api/v1/messages/analyze",
+        json={"message": "coffee 5", "user_id": 1},
+        headers={"Idempotency-Key": "update-42"}
+    )
+    
+    assert response.status_code == 422
+
+@patch("app.services.ai_service.AIService.process_message", new_callable=AsyncMock)
+def test_message_endpoint_llm_unavailable(mock_process, client: TestClient):
+    """
+    Test that an overloaded LLM is reported as 503 with a Retry-After header.
+    """
+    mock_process.return_value = {
+        "amount": 0,
+        "category": "unknown",
+        "description": "Dinner",
+        "error": "LLM is overloaded, please retry later",
+        "retry_after": 2.4
+    }
+    
+    response = client.post(
+        "/api/v1/messages/analyze",
+        json={"message": "Dinner", "user_id": 1}
+    )
+    
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+
+@patch("app.services.ai_service.AIService.process_message", new_callable=AsyncMock)
+def test_message_endpoint_resolves_telegram_id(mock_process, client: TestClient):
+    """
+    Test that a telegram_id is turned into the user ID the expense is stored under.
+    """
+    mock_process.return_value = {"amount": 4.5, "category": "Food", "description": "coffee", "source": "rules"}
+    resolver = client.app.state.services.user_resolver
+    
+    with patch.object(resolver, "_get_or_create", new_callable=AsyncMock, return_value=7) as mock_upsert:
+        response = client.post(
+            "/api/v1/messages/analyze",
+            json={"message": "coffee 4.5", "telegram_id": "123456789"}
+        )
+    
+    assert response.status_code == 200
+    mock_upsert.assert_awaited_once_with("123456789")
+    mock_process.assert_awaited_once_with("coffee 4.5", 7, None)
+
+def test_message_endpoint_requires_one_user_reference(client: TestClient):
+    """
+    Test that exactly one of user_id and telegram_id must be given.
+    """
+    for body in ({"message": "coffee 4.5"}, {"message": "coffee 4.5", "user_id": 1, "telegram_id": "1"}):
+        response = client.post("/api/v1/messages/analyze", json=body)
+        assert response.status_code == 422
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.outputs import LLMResult
+
+from app.core import metrics
+from app.core.observability import JsonFormatter, request_id_var
+from app.services.ai_service import AIService
+from app.services.category_cache import CategoryCache
+from app.services.llm_usage import LLM_TOKENS, TokenUsageCallback
+from tests.test_ai_service import SlowLLM, _categories, _saved_expense
+
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    Histograms render cumulative buckets plus sum and count in the Prometheus text format.
+    """
+    histogram = metrics.Histogram("test_seconds", "Test histogram", ("stage",), buckets=(0.1, 1.0))
+    child = histogram.labels("llm")
+    for value in (0.05, 0.5, 2.0):
+        child.observe(value)
+
+    lines = histogram.render().splitlines()
+
+    assert lines[1] == "# TYPE test_seconds histogram"
+    assert 'test_seconds_bucket{stage="llm",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="llm",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="llm",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{stage="llm"} 2.55' in lines
+    assert 'test_seconds_count{stage="llm"} 3' in lines
+
+
+def test_registry_labels_samples_with_worker_pid():
+    """
+    Each worker process renders only its own values, so every sample carries the worker's PID.
+    """
+    registry = metrics.MetricsRegistry()
+    registry.register(metrics.Counter("test_events", "Test counter")).inc()
+    histogram = registry.register(metrics.Histogram("test_worker_seconds", "Test histogram", buckets=(1.0,)))
+    histogram.observe(0.5)
+
+    lines = registry.render().splitlines()
+
+    worker = f'worker="{os.getpid()}"'
+    assert f"test_events_total{{{worker}}} 1" in lines
+    assert f'test_worker_seconds_bucket{{{worker},le="1"}} 1' in lines
+    assert f"test_worker_seconds_count{{{worker}}} 1" in lines
+
+
+def test_instrumentation_overhead_is_microseconds():
+    """
+    Recording a histogram observation and a counter increment costs a few microseconds at most.
+    """
+    histogram = metrics.Histogram("overhead_seconds", "Overhead histogram", ("stage",)).labels("llm")
+    counter = metrics.Counter("overhead", "Overhead counter", ("source",)).labels("llm")
+    iterations = 10000
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        histogram.observe(time.perf_counter() - started)
+        counter.inc()
+    per_call = (time.perf_counter() - start) / iterations
+
+    assert per_call < 20e-6
+
+
+def test_token_usage_callback_counts_tokens():
+    """
+    Token counts reported by the provider are added to the token counters.
+    """
+    prompt, completion = LLM_TOKENS.labels("prompt"), LLM_TOKENS.labels("completion")
+    before = (prompt.value, completion.value)
+
+    TokenUsageCallback().on_llm_end(
+        LLMResult(generations=[], llm_output={"token_usage": {"prompt_tokens": 120, "completion_tokens": 30}})
+    )
+
+    assert (prompt.value - before[0], completion.value - before[1]) == (120, 30)
+
+
+def test_json_log_carries_request_id():
+    """
+    Log lines are JSON objects with the current request ID and the extra fields.
+    """
+    record = logging.makeLogRecord({"name": "app.test", "levelname": "WARNING", "msg": "llm_call_failed", "error": "boom"})
+    token = request_id_var.set("abc123")
+    try:
+        entry = json.loads(JsonFormatter().format(record))
+    finally:
+        request_id_var.reset(token)
+
+    assert entry["event"] == "llm_call_failed"
+    assert entry["request_id"] == "abc123"
+    assert entry["error"] == "boom"
+
+
+@pytest.mark.asyncio
+@patch("app.services.ai_service.AsyncExpenseService.create_expense", side_effect=_saved_expense)
+async def test_process_message_records_stage_latencies(mock_create):
+    """
+    Each stage of process_message is timed into the stage histogram.
+    """
+    service = AIService(category_cache=CategoryCache(loader=_categories))
+    service.llm = SlowLLM('{"amount": 45, "category": "Food", "description": "Dinner with friends"}', delay=0)
+
+    await service.process_message("Had dinner with friends, paid 45 bucks", 1)
+
+    rendered = metrics.REGISTRY.render()
+    worker = f'worker="{os.getpid()}"'
+    for stage in ("categories", "lookup", "llm", "parse", "save"):
+        assert f'analysis_stage_seconds_count{{stage="{stage}",{worker}}}' in rendered
+    assert f'analysis_results_total{{source="llm",{worker}}}' in rendered
+
+
+def test_metrics_endpoint_and_request_id(client: TestClient):
+    """
+    /metrics serves the Prometheus text format and every response carries a request ID.
+    """
+    response = client.get("/api/v1/metrics", headers={"X-Request-ID": "req-1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert response.headers["x-request-id"] == "req-1"
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert client.get("/api/v1/").headers["x-request-id"]
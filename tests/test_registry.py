@@ -0,0 +1,27 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_ai_service
+from app.services.registry import ServiceRegistry
+
+
+def test_lifespan_builds_shared_registry(client: TestClient):
+    """
+    The application lifespan builds one registry whose AI service reuses the pooled LLM client
+    through the dispatch scheduler.
+    """
+    services = client.app.state.services
+    assert isinstance(services, ServiceRegistry)
+    assert services.ai_service.llm is services.llm_scheduler
+    assert services.llm_scheduler.llm is services.llm
+    assert get_ai_service(services) is get_ai_service(services)
+
+
+@pytest.mark.asyncio
+async def test_registry_closes_http_pool():
+    """
+    Closing the registry releases the pooled HTTP connections.
+    """
+    services = ServiceRegistry.build()
+    await services.aclose()
+    assert services.http_client.is_closed
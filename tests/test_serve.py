@@ -0,0 +1,52 @@
+import pytest
+
+from app.commands import serve
+from app.commands.serve import pool_sizes, worker_count
+
+
+def test_worker_count_prefers_configuration():
+    """
+    An explicit worker count wins over the CPU count.
+    """
+    assert worker_count(3) == 3
+    assert worker_count(None) >= 1
+
+
+def test_pool_sizes_unchanged_without_connection_budget():
+    """
+    Without DB_MAX_CONNECTIONS every worker keeps the configured pool.
+    """
+    assert pool_sizes(8, None, pool_size=5, max_overflow=10) == (5, 10)
+
+
+def test_pool_sizes_stay_within_connection_budget():
+    """
+    Overflow shrinks before the pool, and one connection per worker is left for the sync engine.
+    """
+    assert pool_sizes(4, 100, pool_size=5, max_overflow=10) == (5, 10)
+    assert pool_sizes(4, 40, pool_size=5, max_overflow=10) == (5, 4)
+    assert pool_sizes(8, 40, pool_size=5, max_overflow=10) == (4, 0)
+    for workers in (1, 2, 3, 8, 16):
+        size, overflow = pool_sizes(workers, 97, pool_size=5, max_overflow=10)
+        assert workers * (size + overflow + 1) <= 97
+
+
+def test_pool_sizes_reject_too_many_workers():
+    """
+    A budget that leaves a worker no connection is a configuration error.
+    """
+    with pytest.raises(ValueError):
+        pool_sizes(16, 20)
+
+
+def test_worker_environment_splits_account_quotas(monkeypatch):
+    """
+    Per-minute OpenAI quotas are shared by the account, so each worker gets a share.
+    """
+    monkeypatch.setattr(serve.settings, "LLM_REQUESTS_PER_MINUTE", 3000)
+    monkeypatch.setattr(serve.settings, "LLM_TOKENS_PER_MINUTE", None)
+
+    environment = serve.worker_environment(4)
+
+    assert environment['LLM_REQUESTS_PER_MINUTE'] == "750"
+    assert "LLM_TOKENS_PER_MINUTE" not in environment
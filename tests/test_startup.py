@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_import_does_not_load_langchain_or_connect():
+    """
+    Importing the application loads neither langchain nor a database engine.
+    """
+    probe = (
+        "import sys, app.main, app.core.database as db; "
+        "assert 'langchain_openai' not in sys.modules and 'openai' not in sys.modules; "
+        "assert db._engine is None and db._async_engine is None"
+    )
+    subprocess.run([sys.executable, "-c", probe], check=True, env=os.environ.copy())
+
+
+@patch("app.main.settings.DB_CREATE_SCHEMA_ON_STARTUP", True)
+@patch("app.main.create_schema", return_value=["expenses"])
+def test_lifespan_creates_schema_when_enabled(mock_create_schema):
+    """
+    Schema creation is an opt-in startup step.
+    """
+    with TestClient(app):
+        pass
+    mock_create_schema.assert_called_once()
+
+
+@patch("app.main.missing_tables")
+@patch("app.main.create_schema")
+def test_lifespan_skips_schema_by_default(mock_create_schema, mock_missing_tables):
+    """
+    By default startup neither creates nor inspects the schema.
+    """
+    with TestClient(app):
+        pass
+    mock_create_schema.assert_not_called()
+    mock_missing_tables.assert_not_called()
+
+
+def test_prepare_threshold_can_be_disabled():
+    """
+    DB_PREPARE_THRESHOLD=-1 turns server-side prepares off (psycopg's prepare_threshold=None).
+    """
+    from app.core.config import Settings
+    from app.core.database import engine_options
+
+    with patch.dict(os.environ, {"DB_PREPARE_THRESHOLD": "-1"}):
+        disabled = Settings()
+    url = "postgresql+psycopg://localhost/expenses"
+    with patch("app.core.database.settings", disabled):
+        assert engine_options(url)['connect_args']['prepare_threshold'] is None
+    with patch("app.core.database.settings", Settings()):
+        assert engine_options(url)['connect_args']['prepare_threshold'] == 5
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.services.user_resolver import UserResolver
+
+
+class FakeUsers:
+    def __init__(self, known=None):
+        self.ids = dict(known or {})
+        self.calls = 0
+
+    async def get_or_create(self, telegram_id):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.ids.setdefault(telegram_id, len(self.ids) + 1)
+
+    async def get(self, telegram_id):
+        self.calls += 1
+        return self.ids.get(telegram_id)
+
+
+@pytest.mark.asyncio
+async def test_resolve_registers_once_and_caches():
+    """
+    The first resolve upserts the account; later ones are answered from memory.
+    """
+    users = FakeUsers()
+    resolver = UserResolver(get_or_create=users.get_or_create, get=users.get)
+
+    assert await resolver.resolve("100") == 1
+    assert await resolver.resolve("100") == 1
+    assert await resolver.lookup("100") == 1
+    assert users.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_query():
+    """
+    Messages from a new user that arrive together register the account once.
+    """
+    users = FakeUsers()
+    resolver = UserResolver(get_or_create=users.get_or_create, get=users.get)
+
+    results = await asyncio.gather(*(resolver.resolve("100") for _ in range(5)))
+
+    assert results == [1] * 5
+    assert users.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded():
+    """
+    The least recently used account is evicted once the cache is full.
+    """
+    users = FakeUsers()
+    resolver = UserResolver(max_entries=2, get_or_create=users.get_or_create, get=users.get)
+
+    await resolver.resolve("a")
+    await resolver.resolve("b")
+    await resolver.resolve("a")
+    await resolver.resolve("c")
+
+    assert len(resolver) == 2
+    calls = users.calls
+    await resolver.resolve("a")
+    assert users.calls == calls
+    await resolver.resolve("b")
+    assert users.calls == calls + 1
+
+
+@pytest.mark.asyncio
+async def test_lookup_does_not_register_or_cache_unknown_accounts():
+    """
+    Read endpoints don't create users, and a user registered later is still found.
+    """
+    users = FakeUsers()
+    resolver = UserResolver(get_or_create=users.get_or_create, get=users.get)
+
+    assert await resolver.lookup("200") is None
+    assert "200" not in users.ids
+    await resolver.resolve("200")
+    assert await resolver.lookup("200") == 1